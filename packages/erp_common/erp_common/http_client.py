@@ -0,0 +1,219 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Métodos que se pueden reintentar sin riesgo de duplicar efectos
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+
+class CircuitOpenError(httpx.RequestError):
+    """El circuito del servicio destino está abierto: se rechaza la llamada sin tocar la red."""
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker simple por servicio destino.
+
+    - CERRADO: las llamadas pasan normalmente.
+    - ABIERTO: tras `failure_threshold` fallos consecutivos se rechazan las llamadas
+      durante `reset_timeout` segundos.
+    - SEMI-ABIERTO: vencido el plazo se deja pasar una llamada de prueba;
+      si funciona se cierra, si falla se vuelve a abrir.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "CLOSED"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "HALF_OPEN"
+        return "OPEN"
+
+    def allow_request(self) -> bool:
+        state = self.state
+        if state == "CLOSED":
+            return True
+        if state == "HALF_OPEN" and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+    def release_probe(self):
+        """Libera la llamada de prueba aunque no haya terminado (p. ej. cancelada)."""
+        self._probe_in_flight = False
+
+
+class RetryBudget:
+    """
+    Presupuesto de reintentos (token bucket).
+
+    Cada petición deposita `ratio` tokens y cada reintento consume uno, de modo que
+    los reintentos nunca superan ~`ratio` del tráfico y no amplifican una caída.
+    """
+
+    def __init__(self, ratio: float = 0.2, max_tokens: float = 10.0):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+
+    def deposit(self):
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def try_withdraw(self) -> bool:
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class ServiceTarget:
+    """Configuración de un microservicio destino (URL base, timeout, reintentos y breaker)."""
+
+    def __init__(
+        self,
+        name: str,
+        base_url: str,
+        timeout: float = 5.0,
+        max_retries: int = 2,
+        retry_ratio: float = 0.2,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+    ):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.timeout = httpx.Timeout(timeout, connect=min(timeout, 2.0))
+        self.max_retries = max_retries
+        self.retry_budget = RetryBudget(ratio=retry_ratio)
+        self.breaker = CircuitBreaker(failure_threshold=failure_threshold, reset_timeout=reset_timeout)
+
+
+class ServiceHttpClient:
+    """
+    Pool HTTP compartido para llamadas entre microservicios.
+
+    Mantiene un único `httpx.AsyncClient` con keep-alive (y HTTP/2 cuando el destino
+    lo negocia) por proceso, en lugar de abrir un cliente por llamada. Se arranca y
+    cierra en el `lifespan` de FastAPI; si se usa antes (p. ej. desde un worker)
+    se inicializa de forma perezosa.
+
+    Uso:
+        http_client = ServiceHttpClient()
+        http_client.register("inventory", INVENTORY_SERVICE_URL, timeout=3.0)
+        resp = await http_client.request("inventory", "GET", "/api/inventory/products/1")
+    """
+
+    def __init__(self, max_connections: int = 100, max_keepalive: int = 20, keepalive_expiry: float = 30.0):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.targets: Dict[str, ServiceTarget] = {}
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def register(self, name: str, base_url: str, **options) -> ServiceTarget:
+        """Registra (o reemplaza) un servicio destino."""
+        target = ServiceTarget(name, base_url, **options)
+        self.targets[name] = target
+        return target
+
+    async def start(self):
+        """Abre el pool (llamar en el arranque del `lifespan`)."""
+        self.client
+
+    async def close(self):
+        """Cierra las conexiones abiertas (llamar en el apagado del `lifespan`)."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(http2=True, limits=self.limits)
+        return self._client
+
+    async def request(self, target_name: str, method: str, path: str, **kwargs) -> httpx.Response:
+        """
+        Ejecuta una petición contra un servicio registrado.
+
+        Reintenta (con backoff) errores de red y respuestas 5xx solo en métodos
+        idempotentes (o con `idempotent=True`, p. ej. consultas por POST) y mientras
+        haya presupuesto. Lanza `CircuitOpenError` si el
+        circuito del destino está abierto, o el `httpx.RequestError` original si
+        se agotan los reintentos.
+        """
+        target = self.targets[target_name]
+        method = method.upper()
+        idempotent = kwargs.pop("idempotent", method in IDEMPOTENT_METHODS)
+        kwargs.setdefault("timeout", target.timeout)
+        url = f"{target.base_url}{path}"
+
+        target.retry_budget.deposit()
+        retries_left = target.max_retries if idempotent else 0
+        attempt = 0
+
+        while True:
+            if not target.breaker.allow_request():
+                raise CircuitOpenError(f"Circuito abierto para '{target.name}'")
+
+            try:
+                response = await self.client.request(method, url, **kwargs)
+            except httpx.RequestError as e:
+                target.breaker.record_failure()
+                if retries_left > 0 and target.retry_budget.try_withdraw():
+                    retries_left -= 1
+                    attempt += 1
+                    logger.warning(f"Reintentando {method} {url} ({attempt}) tras error: {e}")
+                    await asyncio.sleep(0.05 * (2 ** attempt))
+                    continue
+                raise
+            except Exception:
+                # Error inesperado (no de red): cuenta como fallo del destino
+                target.breaker.record_failure()
+                raise
+            finally:
+                # Cancelaciones (CancelledError, timeout de wait_for) no deben dejar
+                # la prueba del SEMI-ABIERTO tomada para siempre
+                target.breaker.release_probe()
+
+            if response.status_code >= 500:
+                target.breaker.record_failure()
+                if retries_left > 0 and target.retry_budget.try_withdraw():
+                    retries_left -= 1
+                    attempt += 1
+                    logger.warning(f"Reintentando {method} {url} ({attempt}) tras HTTP {response.status_code}")
+                    await asyncio.sleep(0.05 * (2 ** attempt))
+                    continue
+            else:
+                target.breaker.record_success()
+            return response
+
+    async def get(self, target_name: str, path: str, **kwargs) -> httpx.Response:
+        return await self.request(target_name, "GET", path, **kwargs)
+
+    async def post(self, target_name: str, path: str, **kwargs) -> httpx.Response:
+        return await self.request(target_name, "POST", path, **kwargs)
@@ -0,0 +1,183 @@
+import base64
+import json
+import logging
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Sequence
+
+from fastapi import HTTPException, status
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+logger = logging.getLogger(__name__)
+
+COUNT_EXACT = "exact"
+COUNT_ESTIMATE = "estimate"
+
+
+# --- CURSOR OPACO ---
+def _dump_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    if isinstance(value, date):
+        return {"d": value.isoformat()}
+    if isinstance(value, Decimal):
+        return {"n": str(value)}
+    return value
+
+def _load_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        if "dt" in value:
+            return datetime.fromisoformat(value["dt"])
+        if "d" in value:
+            return date.fromisoformat(value["d"])
+        if "n" in value:
+            return Decimal(value["n"])
+    return value
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Serializa los valores de la clave de orden de la última fila en un token opaco."""
+    raw = json.dumps([_dump_value(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """Inverso de `encode_cursor`. Lanza 400 si el token está corrupto o no corresponde al listado."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = [_load_value(v) for v in json.loads(base64.urlsafe_b64decode(padded))]
+    except (ValueError, TypeError):
+        values = None
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor de paginación inválido")
+    return values
+
+
+# --- FILTRO KEYSET ---
+def keyset_condition(columns: Sequence[Any], values: Sequence[Any], descending: Sequence[bool]):
+    """
+    Condición "después de la fila (v1, v2, ...)" para el orden dado.
+    Se expande como (c1 > v1) OR (c1 = v1 AND c2 > v2) ... para admitir
+    direcciones mixtas; las columnas de la clave deben ser NOT NULL.
+    """
+    clauses = []
+    for i, (column, value, desc) in enumerate(zip(columns, values, descending)):
+        step = column < value if desc else column > value
+        equals = [columns[j] == values[j] for j in range(i)]
+        clauses.append(and_(*equals, step) if equals else step)
+    return or_(*clauses)
+
+
+# --- CONTEO ---
+class _Explain(Executable, ClauseElement):
+    """`EXPLAIN (FORMAT JSON) <consulta>` conservando los parámetros enlazados."""
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+@compiles(_Explain, "postgresql")
+def _compile_explain(element, compiler, **kw):
+    return f"EXPLAIN (FORMAT JSON) {compiler.process(element.statement, **kw)}"
+
+async def estimate_count(db: AsyncSession, query) -> Optional[int]:
+    """
+    Filas estimadas por el planificador (EXPLAIN) para la consulta filtrada.
+    No recorre la tabla; retorna None si la consulta no se puede explicar.
+
+    Los filtros (p. ej. el texto de búsqueda) viajan como parámetros, y el
+    EXPLAIN corre en un SAVEPOINT para que un error no aborte la transacción.
+    """
+    try:
+        async with db.begin_nested():
+            result = await db.execute(_Explain(query.order_by(None)))
+            plan = result.scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+    except Exception as e:
+        logger.warning(f"No se pudo estimar el conteo, se usa el exacto: {e}")
+        return None
+
+async def exact_count(db: AsyncSession, query, count_query=None) -> int:
+    if count_query is None:
+        count_query = select(func.count()).select_from(query.order_by(None).subquery())
+    return (await db.execute(count_query)).scalar() or 0
+
+
+# --- PAGINADOR ---
+async def paginate(
+    db: AsyncSession,
+    query,
+    order_by: Sequence[Any],
+    page: int = 1,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    count_mode: str = COUNT_EXACT,
+    count_query=None,
+    descending: Any = False,
+) -> Dict[str, Any]:
+    """
+    Pagina una consulta ORM ya filtrada y retorna `{"data": [...], "meta": {...}}`.
+
+    - Sin `cursor` se comporta como siempre (OFFSET por `page`).
+    - Con `cursor` ignora `page` y continúa justo después de la última fila vista
+      usando la clave `order_by` (p. ej. `(created_at, id)`), en tiempo constante
+      sin importar la profundidad.
+    - `meta.next_cursor` se incluye en ambos modos cuando hay más filas, así el
+      cliente puede pasar a modo cursor desde la primera página.
+    - `count_mode="estimate"` reemplaza el COUNT(*) por la estimación del
+      planificador (`meta.estimated=True`). Las páginas con `cursor` siempre
+      usan la estimación: el total ya se mostró en la primera página.
+
+    Args:
+        query: `select(...)` con filtros (y options) pero sin order/offset/limit.
+        order_by: Columnas de la clave de orden; la última debe ser única (id).
+        descending: Un bool para todas las columnas o una lista por columna.
+        count_query: Conteo propio (p. ej. `count(id)`); por defecto se deriva de `query`.
+    """
+    if count_mode not in (COUNT_EXACT, COUNT_ESTIMATE):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Modo de conteo inválido: {count_mode}")
+
+    directions = list(descending) if isinstance(descending, (list, tuple)) else [descending] * len(order_by)
+    page = max(page, 1)
+
+    # Conteo
+    total = None
+    estimated = False
+    if count_mode == COUNT_ESTIMATE or cursor:
+        total = await estimate_count(db, query)
+        estimated = total is not None
+    if total is None:
+        total = await exact_count(db, query, count_query)
+
+    # Datos (una fila extra para saber si hay página siguiente)
+    data_query = query.order_by(*[c.desc() if d else c.asc() for c, d in zip(order_by, directions)])
+    if cursor:
+        values = decode_cursor(cursor, len(order_by))
+        data_query = data_query.filter(keyset_condition(order_by, values, directions))
+    else:
+        data_query = data_query.offset((page - 1) * limit)
+
+    rows = (await db.execute(data_query.limit(limit + 1))).scalars().all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = None
+    if has_more and rows:
+        last_values = [getattr(rows[-1], c.key) for c in order_by]
+        if all(v is not None for v in last_values):
+            next_cursor = encode_cursor(last_values)
+
+    return {
+        "data": rows,
+        "meta": {
+            "total": total,
+            "page": page,
+            "limit": limit,
+            "total_pages": (total + limit - 1) // limit if limit > 0 else 0,
+            "next_cursor": next_cursor,
+            "estimated": estimated
+        }
+    }
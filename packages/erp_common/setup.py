@@ -11,6 +11,7 @@ setup(
         "sqlalchemy",
         "asyncpg",
         "pydantic",
-        "tenacity"
+        "tenacity",
+        "httpx[http2]"
     ],
 )
\ No newline at end of file
@@ -0,0 +1,8 @@
+import os
+from erp_common.http_client import ServiceHttpClient
+
+AUTH_SERVICE_URL = os.getenv("AUTH_SERVICE_URL", "http://auth-service:8000")
+
+# Pool HTTP compartido por todo el proceso (se abre/cierra en el lifespan)
+http_client = ServiceHttpClient()
+http_client.register("auth", AUTH_SERVICE_URL, timeout=3.0)
@@ -6,10 +6,9 @@ from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
 from sqlalchemy import func, text
 from . import models, schemas
-import httpx
-import os
-
-AUTH_SERVICE_URL = os.getenv("AUTH_SERVICE_URL", "http://auth-service:8000")
+from .services import period_balances
+from .services.account_tree import account_tree_cache
+from .clients import http_client
 
 async def get_tenant_data(token: str) -> Optional[Dict[str, Any]]:
     """
@@ -21,16 +20,15 @@ async def get_tenant_data(token: str) -> Optional[Dict[str, Any]]:
     Returns:
         Optional[Dict[str, Any]]: Datos de la empresa (nombre, rif) o None si falla.
     """
-    async with httpx.AsyncClient() as client:
-        try:
-            resp = await client.get(
-                f"{AUTH_SERVICE_URL}/tenant/me", 
-                headers={"Authorization": f"Bearer {token}"}
-            )
-            return resp.json() if resp.status_code == 200 else None
-        except Exception as e:
-            print(f"Error contactando Auth: {e}")
-            return None
+    try:
+        resp = await http_client.get(
+            "auth", "/tenant/me", 
+            headers={"Authorization": f"Bearer {token}"}
+        )
+        return resp.json() if resp.status_code == 200 else None
+    except Exception as e:
+        print(f"Error contactando Auth: {e}")
+        return None
 
 async def create_transaction(
     db: AsyncSession, 
@@ -150,10 +148,11 @@ async def create_account(
     try:
         await db.commit()
         await db.refresh(db_account)
-        return db_account
     except Exception as e:
         await db.rollback()
         raise ValueError(f"Error creando cuenta. (Posible código duplicado): {str(e)}")
+    await account_tree_cache.changed(db, tenant_id)
+    return db_account
     
 async def update_account(
     db: AsyncSession,
@@ -177,6 +176,7 @@ async def update_account(
     
     await db.commit()
     await db.refresh(db_account)
+    await account_tree_cache.changed(db, tenant_id)
     return db_account
 
 async def get_all_accounts(
@@ -235,6 +235,9 @@ async def create_ledger_entry(
             credit=line.credit
         )
         db.add(db_line)
+    
+    # 4. Actualizar snapshots mensuales de saldos
+    await period_balances.apply_entry(db, db_entry)
         
     await db.commit()
     await db.refresh(db_entry)
@@ -248,6 +251,18 @@ async def create_ledger_entry(
     return result.scalars().first()
     
 # --- REPORTE CONTABLE ---
+# Movimientos por cuenta dentro del rango: primero se filtran los asientos por
+# (tenant_id, transaction_date) —índice ix_ledger_entries_tenant_date— y solo
+# sus líneas se agregan; nunca se recorre el resto del libro.
+RANGE_MOVEMENTS_SQL = """
+    SELECT l.account_id, SUM(l.debit) AS debit, SUM(l.credit) AS credit
+    FROM ledger_entries e
+    JOIN ledger_lines l ON l.entry_id = e.id
+    WHERE e.tenant_id = :tenant_id
+      AND e.transaction_date BETWEEN :start AND :end
+    GROUP BY l.account_id
+"""
+
 async def get_account_balances(
     db: AsyncSession, 
     tenant_id: int, 
@@ -255,11 +270,11 @@ async def get_account_balances(
     end_date: date
 ) -> List[Dict[str, Any]]:
     """
-    Genera el Balance de Comprobación usando SQL Recursivo.
+    Genera el Balance de Comprobación.
     
-    Esta función es crítica para el rendimiento. En lugar de procesar miles
-    de líneas en Python, usa una CTE (Common Table Expression) en PostgreSQL
-    para sumar jerárquicamente los saldos desde las cuentas hijas hasta las padres.
+    Esta función es crítica para el rendimiento. PostgreSQL agrega por cuenta
+    solo las líneas de los asientos del rango y luego se suman jerárquicamente
+    los saldos desde las cuentas hijas hasta las padres con el árbol en memoria.
 
     Args:
         db (AsyncSession): Sesión de base de datos.
@@ -271,52 +286,14 @@ async def get_account_balances(
         List[Dict]: Lista plana de cuentas con sus saldos calculados y jerarquía.
     """
     
-    # Consulta SQL para sumar hijos a padres automáticamente
-    sql = text("""
-    WITH RECURSIVE account_tree AS (
-        -- 1. Caso Base: Cuentas que tienen movimientos directos
-        SELECT 
-            a.id, a.parent_id, a.code, a.name, a.level, a.account_type,
-            COALESCE(SUM(l.debit), 0) as total_debit,
-            COALESCE(SUM(l.credit), 0) as total_credit
-        FROM accounts a
-        LEFT JOIN ledger_lines l ON l.account_id = a.id
-        LEFT JOIN ledger_entries e ON l.entry_id = e.id 
-             AND e.transaction_date BETWEEN :start AND :end
-             AND e.tenant_id = :tenant_id
-        WHERE a.tenant_id = :tenant_id
-        GROUP BY a.id
-        
-        UNION ALL
-        
-        -- 2. Sumar hijos a sus padres
-        SELECT 
-            p.id, p.parent_id, p.code, p.name, p.level, p.account_type,
-            c.total_debit,
-            c.total_credit
-        FROM accounts p
-        JOIN account_tree c ON c.parent_id = p.id
-    )
-    -- 3. Agrupación final para consolidar sumas recursivas
-    SELECT 
-        id, code, name, level, account_type,
-        SUM(total_debit) as final_debit,
-        SUM(total_credit) as final_credit
-    FROM account_tree
-    GROUP BY id, code, name, level, account_type
-    ORDER BY code;
-    """)
-    
-    # Ejecuta la consulta
-    result = await db.execute(sql, {
+    return await _account_tree_balances(db, RANGE_MOVEMENTS_SQL, {
         "tenant_id": tenant_id, 
         "start": start_date, 
         "end": end_date
     })
-    
-    # Convierte a diccionario
-    rows = result.mappings().all()
-    
+
+def _shape_balances(rows) -> List[Dict[str, Any]]:
+    """Calcula el saldo neto según la naturaleza contable y descarta cuentas en cero."""
     final_report = []
     
     # Procesa el saldo neto según la naturaleza contable
@@ -345,6 +322,26 @@ async def get_account_balances(
             
     return final_report
 
+async def _account_tree_balances(db: AsyncSession, movements_sql: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Consolida jerárquicamente (hijas -> padres) los movimientos por cuenta.
+    
+    `movements_sql` debe retornar `account_id, debit, credit` por cuenta (un
+    `GROUP BY account_id` plano, usando `:tenant_id`). La consolidación se hace
+    en memoria con el árbol de cuentas cacheado: una pasada lineal sobre los
+    ancestros precalculados en lugar de una CTE recursiva.
+    """
+    result = await db.execute(text(movements_sql), params)
+    movements = result.all()
+    
+    tenant_id = params["tenant_id"]
+    tree = await account_tree_cache.get(db, tenant_id)
+    if any(row.account_id not in tree for row in movements):
+        # Cuenta creada en otra réplica después de cargar el árbol
+        tree = await account_tree_cache.load(db, tenant_id)
+    
+    return _shape_balances(tree.rollup(movements))
+
 # --- REPORTES FINANCIEROS ---
 async def get_account_balances_at_date(
     db: AsyncSession, 
@@ -354,8 +351,9 @@ async def get_account_balances_at_date(
     """
     Calcula los SALDOS ACUMULADOS (Balance Sheet) hasta una fecha de corte.
     
-    Ideal para el Balance General. Suma todo el histórico de movimientos 
-    desde el inicio de los tiempos hasta la fecha indicada.
+    Ideal para el Balance General. En lugar de recorrer todo el histórico de
+    `ledger_lines`, parte de los snapshots mensuales (`account_period_balances`)
+    y solo suma las líneas del mes de la fecha de corte.
     
     Args:
         db (AsyncSession): Sesión de base de datos.
@@ -365,10 +363,10 @@ async def get_account_balances_at_date(
     Returns:
         List[Dict]: Lista de cuentas con sus saldos acumulados finales.
     """
-    # Usamos una fecha muy antigua como "inicio"
-    start_of_time = date(1900, 1, 1)
-    
-    return await get_account_balances(db, tenant_id, start_of_time, cut_off_date)
+    # Snapshots mensuales hasta el mes anterior + líneas del mes de corte
+    return await _account_tree_balances(
+        db, period_balances.CUMULATIVE_MOVEMENTS_SQL, period_balances.cumulative_params(tenant_id, cut_off_date)
+    )
     
 async def get_period_movements(
     db: AsyncSession, 
@@ -391,4 +389,57 @@ async def get_period_movements(
     Returns:
         List[Dict]: Lista de cuentas con su movimiento neto en ese rango.
     """
-    return await get_account_balances(db, tenant_id, start_date, end_date)
\ No newline at end of file
+    return await get_account_balances(db, tenant_id, start_date, end_date)
+
+def _natural_balance(account_type: str, debit: Decimal, credit: Decimal) -> Decimal:
+    """Saldo según la naturaleza de la cuenta (deudora: Activo/Gasto; acreedora: el resto)."""
+    return debit - credit if account_type in ('ASSET', 'EXPENSE') else credit - debit
+
+async def get_balance_statement(
+    db: AsyncSession,
+    tenant_id: int,
+    start_date: date,
+    end_date: date
+) -> List[Dict[str, Any]]:
+    """
+    Motor único de saldos para los estados financieros.
+    
+    En una sola consulta (snapshots mensuales + líneas de los días sueltos) y una
+    sola consolidación del árbol retorna, por cuenta, el saldo inicial (antes de
+    `start_date`), el movimiento del periodo y el saldo final a `end_date`.
+    
+    Returns:
+        List[Dict]: `code, name, level, type, opening_balance, debit, credit,
+        movement, closing_balance` (solo cuentas con saldo o movimiento).
+    """
+    result = await db.execute(
+        text(period_balances.STATEMENT_MOVEMENTS_SQL),
+        period_balances.statement_params(tenant_id, start_date, end_date)
+    )
+    movements = result.all()
+    
+    tree = await account_tree_cache.get(db, tenant_id)
+    if any(row.account_id not in tree for row in movements):
+        tree = await account_tree_cache.load(db, tenant_id)
+    
+    statement = []
+    for row in tree.rollup(movements, ("opening_debit", "opening_credit", "debit", "credit")):
+        account_type = row['account_type']
+        opening = _natural_balance(account_type, row['opening_debit'], row['opening_credit'])
+        movement = _natural_balance(account_type, row['debit'], row['credit'])
+        closing = opening + movement
+        
+        if opening == 0 and closing == 0 and row['debit'] == 0 and row['credit'] == 0:
+            continue
+        statement.append({
+            "code": row['code'],
+            "name": row['name'],
+            "level": row['level'],
+            "type": account_type,
+            "opening_balance": opening,
+            "debit": row['debit'],
+            "credit": row['credit'],
+            "movement": movement,
+            "closing_balance": closing
+        })
+    return statement
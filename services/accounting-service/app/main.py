@@ -1,26 +1,37 @@
 from datetime import date, timedelta
 from fastapi import FastAPI, Depends, UploadFile, File, HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi.responses import JSONResponse, Response
 from sqlalchemy.orm import selectinload
 from sqlalchemy.future import select
 from contextlib import asynccontextmanager
 from sqlalchemy import func, insert
 import pandas as pd
 import io
-from typing import List
+from typing import List, Optional, Literal
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.ext.asyncio import AsyncSession
 from . import crud, schemas, database, models
 from erp_common.security import RequirePermission, Permissions, UserPayload, oauth2_scheme, get_current_tenant_id
+from erp_common.pagination import paginate
 from .schemas import PaginatedResponse, SeedPucRequest
-from .utils.financial_pdf import FinancialReportGenerator
 from .services.template_engine import AccountingTemplateEngine
+from .services.report_renderer import report_renderer, REPORT_TYPES
+from .services import period_balances
+from .services.account_tree import account_tree_cache
+from .clients import http_client
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     async with database.engine.begin() as conn:
         await conn.run_sync(models.Base.metadata.create_all)
+    await http_client.start()
+    report_renderer.start()
+    # Cambios del plan de cuentas hechos en otras réplicas (invalida el árbol en caché)
+    account_listener = await account_tree_cache.listen(database.engine)
     yield
+    await account_listener.close()
+    report_renderer.close()
+    await http_client.close()
     
 app = FastAPI(title="Accounting Service", root_path="/api/accounting", lifespan=lifespan)
 
@@ -124,6 +135,7 @@ async def import_chart_of_accounts(
             await db.on_conflict_do_nothing()
             await db.execute(stmt)
             await db.commit()
+            await account_tree_cache.changed(db, tenant_id)
     except Exception as e:
         await db.rollback()
         raise HTTPException(500, f"Error procesando archivo: {str(e)}")
@@ -191,6 +203,18 @@ async def create_entry(
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@app.post("/balances/rebuild")
+async def rebuild_period_balances(
+    db: AsyncSession = Depends(database.get_db),
+    user: UserPayload = Depends(RequirePermission(Permissions.ACCOUNTING_MANAGE))
+):
+    """
+    Reconstruye los snapshots mensuales de saldos de la empresa desde los asientos.
+    Solo es necesario si se modificaron `ledger_lines` por fuera del servicio.
+    """
+    await period_balances.rebuild(db, user.tenant_id)
+    return {"message": "Saldos mensuales reconstruidos"}
+
 @app.get("/templates", response_model=List[schemas.EntryTemplate])
 async def get_templates(
     db: AsyncSession = Depends(database.get_db),
@@ -222,11 +246,15 @@ async def get_journal_book(
     end_date: date,
     page: int = 1,
     limit: int = 100,
+    cursor: Optional[str] = None,
+    count: Literal["exact", "estimate"] = "exact",
     db: AsyncSession = Depends(database.get_db),
     user: UserPayload = Depends(RequirePermission(Permissions.ACCOUNTING_MANAGE)) 
 ):
-    """Libro Diario: Lista cronológicamente de todos los asientos"""
-    offset = (page - 1) * limit
+    """
+    Libro Diario: Lista cronológicamente de todos los asientos.
+    Con `cursor` pagina por keyset sobre `(transaction_date, id)`.
+    """
     conditions = [
         models.LedgerEntry.tenant_id == user.tenant_id, 
         models.LedgerEntry.transaction_date >= start_date, 
@@ -235,7 +263,6 @@ async def get_journal_book(
     
     # Conteo rapido
     count_query = select(func.count(models.LedgerEntry.id)).filter(*conditions)
-    total = (await db.execute(count_query)).scalar() or 0
     
     query = (
         select(models.LedgerEntry)
@@ -243,22 +270,18 @@ async def get_journal_book(
             selectinload(models.LedgerEntry.lines).selectinload(models.LedgerLine.account)
         )
         .filter(*conditions)
-        .order_by(models.LedgerEntry.transaction_date, models.LedgerEntry.id)
-        .offset(offset)
-        .limit(limit)
     )
     
-    result = await db.execute(query)
-    
-    return {
-        "data": result.scalars().all(),
-        "meta": {
-            "total": total,
-            "page": page,
-            "limit": limit,
-            "total_pages": (total + limit - 1) // limit if limit > 0 else 0
-        }
-    }
+    return await paginate(
+        db,
+        query,
+        order_by=[models.LedgerEntry.transaction_date, models.LedgerEntry.id],
+        page=page,
+        limit=limit,
+        cursor=cursor,
+        count_mode=count,
+        count_query=count_query
+    )
 
 @app.get("/books/ledger")
 async def get_general_ledger(
@@ -298,9 +321,10 @@ async def get_general_ledger(
 # --- PDF de REPORTES FINANCIEROS ---
 @app.get("/reports/download")
 async def download_financial_report(
-    report_type: str, # 'balance_sheet', 'income_statement', 'equity_changes', 'clear'
+    report_type: str, # 'balance_sheet', 'income_statement', 'equity_changes', 'cash_flow'
     period: str,        # 'Q1', 'Q2', 'Q3', 'Q4', 'S1', 'S2', 'YEAR'
     year: int,
+    mode: Literal["auto", "async"] = "auto",
     db: AsyncSession = Depends(database.get_db),
     tenant_id: int = Depends(get_current_tenant_id),
     token: str = Depends(oauth2_scheme)
@@ -311,9 +335,15 @@ async def download_financial_report(
     - **report_type**: 'balance_sheet' (Balance General), 'income_statement' (Estado de Resultados), etc.
     - **period**: Trimestre (Q1-Q4), Semestre (S1-S2) o Año (YEAR).
     - **year**: Año fiscal del reporte.
+    - **mode**: 'auto' devuelve el PDF si se renderiza en pocos segundos; 'async' siempre encola.
     
-    Retorna un archivo PDF (application/pdf).
+    El render corre en un pool de procesos (no bloquea el servicio). Si el PDF está
+    listo a tiempo se retorna directamente (application/pdf); si no, responde 202 con
+    el `job_id` para consultar en `/reports/jobs/{job_id}`.
     """
+    if report_type not in REPORT_TYPES:
+        raise HTTPException(400, "Tipo de reporte no válido")
+    
     # Obtener Datos de Empresa
     tenant_info = await crud.get_tenant_data(token)
     company_name = tenant_info.get('business_name') if tenant_info else "EMPRESA DEMO"
@@ -336,39 +366,69 @@ async def download_financial_report(
         end_date = date(year, 6, 30)
     elif period == 'S2':
         start_date = date(year, 7, 1); end_date = date(year, 12, 31)
-        
-    # Obtener Datos
-    data = await crud.get_account_balances(db, tenant_id, start_date, end_date)
     
-    generator = FinancialReportGenerator(company_name, rif)
-    filename = f"{tenant_info.get('name')}_{report_type}_{period}_{year}.pdf"
+    filename = f"{tenant_info.get('name') if tenant_info else tenant_id}_{report_type}_{period}_{year}.pdf"
     
-    if report_type == 'balance_sheet':
-        # Para Balance: Saldos Acumulados a la fecha de fin
-        data = await crud.get_account_balances_at_date(db, tenant_id, end_date)
-        pdf = generator.generate_balance_sheet(data, end_date)
-        
-    elif report_type == 'income_statement':
-        # Para Resultados: Movimientos del periodo
-        data = await crud.get_period_movements(db, tenant_id, start_date, end_date)
-        pdf = generator.generate_income_statement(data, start_date, end_date)
-        
-    elif report_type == 'equity_changes':
-        # Para Patrimonio: Saldos acumulados
-        data = await crud.get_account_balances_at_date(db, tenant_id, end_date)
-        pdf = generator.generate_equity_changes(data, start_date, end_date)
-        
-    elif report_type == 'cash_flow':
-        # Para Flujo de Efectivo: Necesitamos AMBOS (Saldos para Activos/Pasivos y Movimientos para Utilidad)
-        balance_data = await crud.get_account_balances_at_date(db, tenant_id, end_date)
-        income_data = await crud.get_period_movements(db, tenant_id, start_date, end_date)
-        pdf = generator.generate_cash_flow(balance_data, income_data, start_date, end_date)
-        
-    else:
-        raise HTTPException(400, "Tipo de reporte no válido")
+    # Obtener Datos (en el event loop); el render va al pool de procesos
+    # Una sola consulta: saldo inicial, movimiento del periodo y saldo final por cuenta
+    data = {
+        "start_date": start_date,
+        "end_date": end_date,
+        "statement": await crud.get_balance_statement(db, tenant_id, start_date, end_date)
+    }
+    
+    try:
+        job = report_renderer.submit(tenant_id, report_type, filename, company_name, rif, data)
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     
-    return StreamingResponse(
-        pdf,
+    if mode == "auto" and await report_renderer.wait(job):
+        return _render_job_response(job)
+    
+    return JSONResponse(
+        status_code=202,
+        content={**job.to_dict(), "status_url": f"/reports/jobs/{job.id}"}
+    )
+
+def _render_job_response(job):
+    if job.status == "FAILED":
+        raise HTTPException(status_code=500, detail=f"No se pudo generar el reporte: {job.error}")
+    return Response(
+        job.content,
         media_type="application/pdf",
-        headers={"Content-Disposition": f"attachment; filename={filename}"}
-    )
\ No newline at end of file
+        headers={"Content-Disposition": f"attachment; filename={job.filename}"}
+    )
+
+@app.get("/reports/jobs/{job_id}")
+async def get_report_job(
+    job_id: str,
+    tenant_id: int = Depends(get_current_tenant_id)
+):
+    """Estado de un reporte encolado (PENDING, DONE o FAILED) y sus tiempos de cola y de render."""
+    job = report_renderer.get(job_id, tenant_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Reporte no encontrado o expirado")
+    return job.to_dict()
+
+@app.get("/reports/jobs/{job_id}/download")
+async def download_report_job(
+    job_id: str,
+    tenant_id: int = Depends(get_current_tenant_id)
+):
+    """Descarga el PDF de un reporte encolado cuando ya terminó."""
+    job = report_renderer.get(job_id, tenant_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Reporte no encontrado o expirado")
+    if job.status == "PENDING":
+        raise HTTPException(status_code=409, detail="El reporte aún se está generando")
+    return _render_job_response(job)
+
+@app.get("/metrics/reports")
+async def read_report_metrics(
+    user: UserPayload = Depends(RequirePermission(Permissions.REPORTS_VIEW))
+):
+    """Métricas de esta réplica: pool de render (cola y tiempos por tipo de reporte) y caché del árbol de cuentas."""
+    return {
+        **report_renderer.stats(),
+        "account_tree_cache": account_tree_cache.stats()
+    }
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Numeric, DateTime, Boolean, Date, ForeignKey, UniqueConstraint
+from sqlalchemy import Column, Integer, String, Numeric, DateTime, Boolean, Date, ForeignKey, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
@@ -74,6 +74,11 @@ class LedgerEntry(Base):
     #Relación con el detalle
     lines = relationship("LedgerLine", back_populates="entry", cascade="all, delete-orphan")
     
+    __table_args__ = (
+        # Libro diario y balances por rango de fechas
+        Index("ix_ledger_entries_tenant_date", "tenant_id", "transaction_date", "id"),
+    )
+    
 class LedgerLine(Base):
     """El detalle del asiento: Qué cuenta se debita o acredita"""
     __tablename__ = "ledger_lines"
@@ -87,6 +92,33 @@ class LedgerLine(Base):
     
     entry = relationship("LedgerEntry", back_populates="lines")
     account = relationship("Account")
+    
+    __table_args__ = (
+        # Movimientos por cuenta (mayor, balances) y líneas por asiento
+        Index("ix_ledger_lines_account_entry", "account_id", "entry_id"),
+        Index("ix_ledger_lines_entry_id", "entry_id"),
+    )
+
+class AccountPeriodBalance(Base):
+    """
+    Snapshot mensual por cuenta: débitos y créditos acumulados del mes.
+    Se actualiza al registrar cada asiento; el saldo a una fecha es la suma de
+    los meses cerrados más el delta de `ledger_lines` del mes en curso.
+    """
+    __tablename__ = "account_period_balances"
+    
+    tenant_id = Column(Integer, primary_key=True)
+    account_id = Column(Integer, ForeignKey("accounts.id"), primary_key=True)
+    period = Column(Date, primary_key=True)            # Primer día del mes
+    
+    debit = Column(Numeric(14, 2), nullable=False, default=0)
+    credit = Column(Numeric(14, 2), nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    __table_args__ = (
+        # Saldos acumulados hasta un mes: filtra por empresa y periodo
+        Index("ix_account_period_balances_tenant_period", "tenant_id", "period"),
+    )
 
 class TransactionType(str, enum.Enum):
     INCOME = "INCOME"   # Entrada (Ventas)
@@ -10,6 +10,8 @@ class MetaData(BaseModel):
     page: int
     limit: int
     total_pages: int
+    next_cursor: Optional[str] = None     # Token para continuar con paginación keyset
+    estimated: bool = False               # True si `total` es una estimación del planificador
 
 class PaginatedResponse(BaseModel, Generic[T]):
     data: List[T]
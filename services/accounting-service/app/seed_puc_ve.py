@@ -3,6 +3,7 @@ import sys
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.dialects.postgresql import insert as pg_insert
 from app.models import Account
+from app.services.account_tree import account_tree_cache
 
 # ==============================================================================
 #  PUC VENEZUELA - BASE COMÚN (NIVEL 4/5 DETALLADO)
@@ -303,6 +304,7 @@ async def seed_puc(db: AsyncSession, tenant_id: int, sector: str = "commerce"):
                          code_to_id_map[row.code] = row.id
 
         await db.commit()
+        await account_tree_cache.changed(db, tenant_id)
         print(f"✅ [SEED] Carga completada exitosamente. Total cuentas disponibles: {len(code_to_id_map)}")
         
     except Exception as e:
@@ -0,0 +1,190 @@
+import logging
+import time
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.future import select
+
+from .. import models
+
+logger = logging.getLogger("accounting-service")
+
+# Canal de Postgres (LISTEN/NOTIFY) por el que se avisan cambios del plan de cuentas
+ACCOUNTS_CHANNEL = "account_changes"
+
+
+class AccountNode:
+    """Cuenta del plan desacoplada de la sesión (segura entre requests)."""
+    __slots__ = ("id", "parent_id", "code", "name", "level", "account_type")
+
+    def __init__(self, row):
+        self.id = row.id
+        self.parent_id = row.parent_id
+        self.code = row.code
+        self.name = row.name
+        self.level = row.level
+        self.account_type = row.account_type
+
+
+class AccountTree:
+    """
+    Plan de cuentas de una empresa en memoria: nodos por id, código -> id y,
+    para cada cuenta, la tupla de ancestros (ella misma incluida) precalculada.
+    """
+
+    def __init__(self, rows: Iterable):
+        self.nodes: Dict[int, AccountNode] = {row.id: AccountNode(row) for row in rows}
+        self.code_to_id: Dict[str, int] = {node.code: node.id for node in self.nodes.values()}
+        self.ancestors: Dict[int, Tuple[int, ...]] = {}
+        for account_id in self.nodes:
+            self._ancestors_of(account_id)
+
+    def _ancestors_of(self, account_id: int) -> Tuple[int, ...]:
+        cached = self.ancestors.get(account_id)
+        if cached is not None:
+            return cached
+        node = self.nodes[account_id]
+        parent_id = node.parent_id
+        # Un padre inexistente (u otro tenant) corta la cadena; un ciclo también
+        if parent_id is None or parent_id not in self.nodes or parent_id == account_id:
+            chain = (account_id,)
+        else:
+            self.ancestors[account_id] = (account_id,)
+            chain = (account_id,) + self._ancestors_of(parent_id)
+        self.ancestors[account_id] = chain
+        return chain
+
+    def __contains__(self, account_id: int) -> bool:
+        return account_id in self.nodes
+
+    def resolve(self, codes: Iterable[str]) -> Dict[str, Optional[int]]:
+        """Ids de los códigos pedidos (None si la cuenta no existe)."""
+        return {code: self.code_to_id.get(code) for code in codes}
+
+    def rollup(self, movements: Iterable, columns: Sequence[str] = ("final_debit", "final_credit")) -> List[dict]:
+        """
+        Consolida filas `(account_id, *valores)` hacia todos los ancestros en una
+        sola pasada lineal. Retorna una fila por cuenta (ordenadas por código)
+        con los datos de la cuenta y un total por cada nombre de `columns`.
+        """
+        zero = Decimal("0")
+        totals: Dict[int, List[Decimal]] = {}
+        for row in movements:
+            account_id = row[0]
+            values = [v if v is not None else zero for v in row[1:]]
+            for ancestor_id in self.ancestors.get(account_id, ()):
+                acc = totals.get(ancestor_id)
+                if acc is None:
+                    totals[ancestor_id] = list(values)
+                else:
+                    for i, value in enumerate(values):
+                        acc[i] += value
+
+        rows = []
+        for account_id, values in totals.items():
+            node = self.nodes[account_id]
+            row = {
+                "id": node.id,
+                "code": node.code,
+                "name": node.name,
+                "level": node.level,
+                "account_type": node.account_type
+            }
+            row.update(zip(columns, values))
+            rows.append(row)
+        rows.sort(key=lambda row: row["code"])
+        return rows
+
+
+class AccountTreeCache:
+    """
+    Caché por empresa del árbol de cuentas con TTL e invalidación explícita.
+
+    El plan de cuentas tiene cientos de filas y cambia muy poco; los reportes
+    solo piden a la DB un `GROUP BY account_id` y consolidan aquí, y el worker
+    resuelve los códigos de sus asientos sin consultar. Quien cree, modifique o
+    importe cuentas debe llamar a `changed`: invalida la caché local y avisa por
+    NOTIFY a los procesos que escuchan (`listen`). El TTL acota cuánto tarda en
+    verse el cambio si se pierde el aviso.
+    """
+
+    def __init__(self, ttl_seconds: float = 300.0):
+        self.ttl = ttl_seconds
+        self._entries: Dict[int, Tuple[float, AccountTree]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, db: AsyncSession, tenant_id: int) -> AccountTree:
+        entry = self._entries.get(tenant_id)
+        if entry is not None and time.monotonic() < entry[0]:
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        return await self.load(db, tenant_id)
+
+    async def load(self, db: AsyncSession, tenant_id: int) -> AccountTree:
+        """Lee el plan de cuentas de la empresa (una consulta) y lo guarda en caché."""
+        result = await db.execute(
+            select(
+                models.Account.id, models.Account.parent_id, models.Account.code,
+                models.Account.name, models.Account.level, models.Account.account_type
+            ).filter(models.Account.tenant_id == tenant_id)
+        )
+        tree = AccountTree(result.all())
+        self._entries[tenant_id] = (time.monotonic() + self.ttl, tree)
+        return tree
+
+    def invalidate(self, tenant_id: Optional[int] = None):
+        """Descarta el árbol de una empresa (o de todas)."""
+        if tenant_id is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(tenant_id, None)
+
+    async def resolve_codes(self, db: AsyncSession, tenant_id: int, codes: Iterable[str]) -> Dict[str, Optional[int]]:
+        """
+        Código -> id de varias cuentas. Si alguna falta recarga el árbol una
+        sola vez (cuenta creada después de cargarlo).
+        """
+        tree = await self.get(db, tenant_id)
+        ids = tree.resolve(codes)
+        if None in ids.values():
+            ids = (await self.load(db, tenant_id)).resolve(ids)
+        return ids
+
+    async def changed(self, db: AsyncSession, tenant_id: int):
+        """Invalida el árbol local y notifica el cambio al resto de procesos."""
+        self.invalidate(tenant_id)
+        try:
+            await db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": ACCOUNTS_CHANNEL, "payload": str(tenant_id)})
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            logger.warning(f"⚠️ No se pudo notificar el cambio de cuentas de la empresa {tenant_id}: {e}")
+
+    async def listen(self, engine: AsyncEngine):
+        """
+        Escucha los avisos de `changed` en una conexión dedicada e invalida el
+        árbol de la empresa notificada. Retorna la conexión (cerrarla al salir).
+        """
+        conn = await engine.connect()
+        raw = await conn.get_raw_connection()
+        await raw.driver_connection.add_listener(ACCOUNTS_CHANNEL, self._on_notify)
+        return conn
+
+    def _on_notify(self, connection, pid, channel, payload):
+        self.invalidate(int(payload) if payload else None)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0
+        }
+
+
+account_tree_cache = AccountTreeCache()
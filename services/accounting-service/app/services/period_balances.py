@@ -0,0 +1,152 @@
+from datetime import date, timedelta
+from typing import Dict
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import models
+
+
+def month_start(day: date) -> date:
+    """Periodo (primer día del mes) al que pertenece una fecha."""
+    return day.replace(day=1)
+
+
+def next_month(day: date) -> date:
+    """Primer día del mes siguiente."""
+    return date(day.year + (day.month == 12), day.month % 12 + 1, 1)
+
+
+# Suma las líneas del asiento al snapshot de su mes (una fila por cuenta)
+APPLY_ENTRY_SQL = text("""
+    INSERT INTO account_period_balances (tenant_id, account_id, period, debit, credit, updated_at)
+    SELECT e.tenant_id, l.account_id, date_trunc('month', e.transaction_date)::date,
+           COALESCE(SUM(l.debit), 0), COALESCE(SUM(l.credit), 0), now()
+    FROM ledger_lines l
+    JOIN ledger_entries e ON e.id = l.entry_id
+    WHERE l.entry_id = :entry_id
+    GROUP BY e.tenant_id, l.account_id, date_trunc('month', e.transaction_date)
+    ON CONFLICT (tenant_id, account_id, period) DO UPDATE SET
+        debit = account_period_balances.debit + EXCLUDED.debit,
+        credit = account_period_balances.credit + EXCLUDED.credit,
+        updated_at = now()
+""")
+
+# Recalcula desde cero los snapshots de una empresa (reparación / carga inicial)
+REBUILD_SQL = text("""
+    INSERT INTO account_period_balances (tenant_id, account_id, period, debit, credit, updated_at)
+    SELECT e.tenant_id, l.account_id, date_trunc('month', e.transaction_date)::date,
+           COALESCE(SUM(l.debit), 0), COALESCE(SUM(l.credit), 0), now()
+    FROM ledger_lines l
+    JOIN ledger_entries e ON e.id = l.entry_id
+    WHERE e.tenant_id = :tenant_id
+    GROUP BY e.tenant_id, l.account_id, date_trunc('month', e.transaction_date)
+""")
+
+# Débitos / créditos acumulados por cuenta hasta :cut_off (inclusive):
+# meses anteriores desde el snapshot + líneas del mes de la fecha de corte.
+CUMULATIVE_MOVEMENTS_SQL = """
+    SELECT account_id, SUM(debit) AS debit, SUM(credit) AS credit
+    FROM (
+        SELECT b.account_id, b.debit, b.credit
+        FROM account_period_balances b
+        WHERE b.tenant_id = :tenant_id AND b.period < :open_period
+        
+        UNION ALL
+        
+        SELECT l.account_id, l.debit, l.credit
+        FROM ledger_entries e
+        JOIN ledger_lines l ON l.entry_id = e.id
+        WHERE e.tenant_id = :tenant_id
+          AND e.transaction_date >= :open_period
+          AND e.transaction_date <= :cut_off
+    ) m
+    GROUP BY account_id
+"""
+
+
+async def apply_entry(db: AsyncSession, entry: models.LedgerEntry):
+    """
+    Registra el asiento en los snapshots mensuales.
+    Debe llamarse antes del commit que guarda el asiento (misma transacción).
+    """
+    await db.flush()
+    await db.execute(APPLY_ENTRY_SQL, {"entry_id": entry.id})
+
+
+async def rebuild(db: AsyncSession, tenant_id: int):
+    """Reconstruye los snapshots de la empresa a partir de `ledger_lines`."""
+    await db.execute(
+        text("DELETE FROM account_period_balances WHERE tenant_id = :tenant_id"),
+        {"tenant_id": tenant_id}
+    )
+    await db.execute(REBUILD_SQL, {"tenant_id": tenant_id})
+    await db.commit()
+
+
+def cumulative_params(tenant_id: int, cut_off: date) -> Dict[str, object]:
+    return {"tenant_id": tenant_id, "open_period": month_start(cut_off), "cut_off": cut_off}
+
+
+# Saldo inicial (antes de :start) y movimiento del periodo por cuenta, en una
+# sola lectura: meses completos desde los snapshots y los días sueltos de los
+# extremos desde `ledger_lines`.
+STATEMENT_MOVEMENTS_SQL = """
+    SELECT account_id,
+           COALESCE(SUM(debit) FILTER (WHERE opening), 0) AS opening_debit,
+           COALESCE(SUM(credit) FILTER (WHERE opening), 0) AS opening_credit,
+           COALESCE(SUM(debit) FILTER (WHERE NOT opening), 0) AS debit,
+           COALESCE(SUM(credit) FILTER (WHERE NOT opening), 0) AS credit
+    FROM (
+        -- Meses anteriores al del inicio: saldo inicial
+        SELECT b.account_id, b.debit, b.credit, true AS opening
+        FROM account_period_balances b
+        WHERE b.tenant_id = :tenant_id AND b.period < :start_month
+        
+        UNION ALL
+        
+        -- Meses completos dentro del periodo: movimiento
+        SELECT b.account_id, b.debit, b.credit, false AS opening
+        FROM account_period_balances b
+        WHERE b.tenant_id = :tenant_id AND b.period >= :full_from AND b.period < :full_to
+        
+        UNION ALL
+        
+        -- Días del mes de inicio (antes o dentro del periodo) y del mes final incompleto
+        SELECT l.account_id, l.debit, l.credit, e.transaction_date < :start AS opening
+        FROM ledger_entries e
+        JOIN ledger_lines l ON l.entry_id = e.id
+        WHERE e.tenant_id = :tenant_id
+          AND (
+                (e.transaction_date >= :start_month AND e.transaction_date < :head_to)
+             OR (e.transaction_date >= :tail_from AND e.transaction_date <= :end)
+          )
+    ) m
+    GROUP BY account_id
+"""
+
+
+def statement_params(tenant_id: int, start: date, end: date) -> Dict[str, object]:
+    """Parámetros de `STATEMENT_MOVEMENTS_SQL`: qué tramo sale de snapshots y cuál de líneas."""
+    start_month = month_start(start)
+    full_from = start if start == start_month else next_month(start_month)
+    end_next = next_month(month_start(end))
+    full_to = end_next if end + timedelta(days=1) == end_next else month_start(end)
+
+    if full_from < full_to:
+        head_to, tail_from = full_from, full_to
+    else:
+        # Sin meses completos en el periodo: todo sale de las líneas
+        full_from = full_to = start_month
+        head_to = tail_from = end + timedelta(days=1)
+
+    return {
+        "tenant_id": tenant_id,
+        "start": start,
+        "end": end,
+        "start_month": start_month,
+        "full_from": full_from,
+        "full_to": full_to,
+        "head_to": head_to,
+        "tail_from": tail_from
+    }
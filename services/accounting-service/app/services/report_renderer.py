@@ -0,0 +1,212 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from ..utils.financial_pdf import FinancialReportGenerator
+
+logger = logging.getLogger("accounting-service")
+
+REPORT_TYPES = ("balance_sheet", "income_statement", "equity_changes", "cash_flow")
+
+
+def render_financial_report(report_type: str, company_name: str, rif: str, data: dict) -> bytes:
+    """
+    Renderiza un estado financiero con ReportLab y retorna los bytes del PDF.
+
+    Se ejecuta en un proceso del pool: recibe solo datos planos (el `statement`
+    de `crud.get_balance_statement`) para que los argumentos se puedan serializar.
+    """
+    generator = FinancialReportGenerator(company_name, rif)
+    statement = data["statement"]
+    if report_type == "balance_sheet":
+        pdf = generator.generate_balance_sheet(statement, data["end_date"])
+    elif report_type == "income_statement":
+        pdf = generator.generate_income_statement(statement, data["start_date"], data["end_date"])
+    elif report_type == "equity_changes":
+        pdf = generator.generate_equity_changes(statement, data["start_date"], data["end_date"])
+    elif report_type == "cash_flow":
+        pdf = generator.generate_cash_flow(statement, data["start_date"], data["end_date"])
+    else:
+        raise ValueError("Tipo de reporte no válido")
+    return pdf.getvalue()
+
+
+def timed_render(report_type: str, company_name: str, rif: str, data: dict):
+    """
+    Ejecuta `render_financial_report` en el proceso del pool y mide solo el render.
+
+    Retorna `(pdf, render_ms, error)`: el tiempo se toma dentro del worker para
+    no contar la espera en la cola del pool.
+    """
+    started = time.perf_counter()
+    try:
+        pdf, error = render_financial_report(report_type, company_name, rif, data), None
+    except Exception as e:
+        pdf, error = None, str(e)
+    return pdf, round((time.perf_counter() - started) * 1000, 1), error
+
+
+@dataclass
+class RenderJob:
+    id: str
+    tenant_id: int
+    report_type: str
+    filename: str
+    status: str = "PENDING"                     # PENDING | DONE | FAILED
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    queue_ms: Optional[float] = None            # Espera hasta que un proceso del pool lo toma
+    render_ms: Optional[float] = None           # Render en el proceso del pool
+    error: Optional[str] = None
+    content: Optional[bytes] = field(default=None, repr=False)
+    task: Optional[asyncio.Task] = field(default=None, repr=False)
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "report_type": self.report_type,
+            "filename": self.filename,
+            "queue_ms": self.queue_ms,
+            "render_ms": self.render_ms,
+            "error": self.error
+        }
+
+
+class ReportRenderService:
+    """
+    Render de estados financieros en un pool de procesos acotado.
+
+    ReportLab (platypus) es CPU puro: renderizarlo en el event loop congela
+    todas las peticiones de la réplica. Aquí cada render es un job en el pool;
+    el endpoint espera `inline_timeout` segundos y si el PDF está listo lo
+    devuelve directo, si no entrega el id del job para consultarlo luego.
+
+    - La cola está acotada (`max_pending`): si se llena se rechaza el job.
+    - Los jobs terminados se conservan `ttl` segundos (desde que terminan) en memoria de la réplica.
+    - Guarda métricas de tiempo de cola y de render por tipo de reporte.
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        max_pending: Optional[int] = None,
+        inline_timeout: Optional[float] = None,
+        ttl: int = 900
+    ):
+        self.max_workers = max_workers or int(os.getenv("REPORT_RENDER_WORKERS", "2"))
+        self.max_pending = max_pending or int(os.getenv("REPORT_RENDER_MAX_PENDING", "20"))
+        self.inline_timeout = inline_timeout if inline_timeout is not None else float(os.getenv("REPORT_INLINE_TIMEOUT", "3"))
+        self.ttl = ttl
+        self.jobs: Dict[str, RenderJob] = {}
+        self.metrics: Dict[str, dict] = {}
+        self.rejected = 0
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def start(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            logger.info(f"🖨️ Pool de render de reportes iniciado ({self.max_workers} procesos).")
+
+    def close(self):
+        for job in self.jobs.values():
+            if job.task and not job.task.done():
+                job.task.cancel()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    @property
+    def pending(self) -> int:
+        return sum(1 for job in self.jobs.values() if job.status == "PENDING")
+
+    def submit(self, tenant_id: int, report_type: str, filename: str, company_name: str, rif: str, data: dict) -> RenderJob:
+        """Encola un render. Lanza RuntimeError si la cola está llena."""
+        self._purge()
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise RuntimeError("Hay demasiados reportes en cola, intente de nuevo en unos segundos.")
+
+        self.start()
+        job = RenderJob(id=uuid.uuid4().hex, tenant_id=tenant_id, report_type=report_type, filename=filename)
+        job.task = asyncio.create_task(self._run(job, company_name, rif, data))
+        self.jobs[job.id] = job
+        return job
+
+    async def wait(self, job: RenderJob, timeout: Optional[float] = None) -> bool:
+        """Espera el job hasta `timeout` (sin cancelarlo). Retorna True si ya terminó."""
+        try:
+            await asyncio.wait_for(asyncio.shield(job.task), timeout=self.inline_timeout if timeout is None else timeout)
+        except asyncio.TimeoutError:
+            pass
+        return job.status != "PENDING"
+
+    def get(self, job_id: str, tenant_id: int) -> Optional[RenderJob]:
+        self._purge()
+        job = self.jobs.get(job_id)
+        if job is None or job.tenant_id != tenant_id:
+            return None
+        return job
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.max_workers,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "rejected": self.rejected,
+            "timings_ms": self.metrics
+        }
+
+    async def _run(self, job: RenderJob, company_name: str, rif: str, data: dict):
+        loop = asyncio.get_running_loop()
+        submitted = time.perf_counter()
+        try:
+            job.content, job.render_ms, job.error = await loop.run_in_executor(
+                self._pool, timed_render, job.report_type, company_name, rif, data
+            )
+        except Exception as e:
+            # Fallo del pool (proceso caído, pool cerrado): no hubo render medido
+            job.error = str(e)
+        finally:
+            elapsed_ms = (time.perf_counter() - submitted) * 1000
+            job.queue_ms = round(max(elapsed_ms - (job.render_ms or 0.0), 0.0), 1)
+            job.status = "FAILED" if job.error else "DONE"
+            job.finished_at = time.time()
+            if job.error:
+                logger.error(f"❌ Error renderizando reporte {job.report_type} ({job.id}): {job.error}")
+            self._record(job)
+
+    def _record(self, job: RenderJob):
+        m = self.metrics.setdefault(job.report_type, {
+            "count": 0, "failed": 0, "total_ms": 0.0, "max_ms": 0.0, "last_ms": 0.0,
+            "queue_total_ms": 0.0, "queue_max_ms": 0.0
+        })
+        m["count"] += 1
+        if job.status == "FAILED":
+            m["failed"] += 1
+        render_ms = job.render_ms or 0.0
+        m["total_ms"] = round(m["total_ms"] + render_ms, 1)
+        m["max_ms"] = max(m["max_ms"], render_ms)
+        m["last_ms"] = render_ms
+        m["avg_ms"] = round(m["total_ms"] / m["count"], 1)
+        m["queue_total_ms"] = round(m["queue_total_ms"] + job.queue_ms, 1)
+        m["queue_max_ms"] = max(m["queue_max_ms"], job.queue_ms)
+        m["queue_avg_ms"] = round(m["queue_total_ms"] / m["count"], 1)
+
+    def _purge(self):
+        """Elimina de memoria los jobs terminados hace más de `ttl` segundos."""
+        limit = time.time() - self.ttl
+        expired = [
+            job_id for job_id, job in self.jobs.items()
+            if job.finished_at is not None and job.finished_at < limit
+        ]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+
+report_renderer = ReportRenderService()
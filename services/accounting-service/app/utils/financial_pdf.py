@@ -6,7 +6,21 @@ from reportlab.lib.units import inch
 from io import BytesIO
 from datetime import date
 
+def closing_view(statement: list) -> list:
+    """Saldos al cierre del periodo (cuentas con saldo final distinto de cero)."""
+    return [{**x, 'balance': x['closing_balance']} for x in statement if x['closing_balance'] != 0]
+
+def movement_view(statement: list) -> list:
+    """Movimiento neto del periodo (cuentas con débitos o créditos en el rango)."""
+    return [{**x, 'balance': x['movement']} for x in statement if x['debit'] != 0 or x['credit'] != 0]
+
 class FinancialReportGenerator:
+    """
+    Estados financieros en PDF. Todos reciben el mismo `statement` de
+    `crud.get_balance_statement` (saldo inicial, movimiento y saldo final por
+    cuenta) y toman de él la vista que necesitan.
+    """
+
     def __init__(self, company_name: str, rif: str):
         self.company_name = company_name or "EMPRESA DEMO C.A."
         self.rif = rif or "J-00000000-0"
@@ -58,8 +72,9 @@ class FinancialReportGenerator:
         ]))
         return t
 
-    def generate_balance_sheet(self, data: list, end_date: date):
+    def generate_balance_sheet(self, statement: list, end_date: date):
         """Estado de Situación Financiera"""
+        data = closing_view(statement)
         buffer = BytesIO()
         doc = SimpleDocTemplate(buffer, pagesize=LETTER)
         
@@ -121,8 +136,9 @@ class FinancialReportGenerator:
         buffer.seek(0)
         return buffer
 
-    def generate_income_statement(self, data: list, start_date: date, end_date: date):
+    def generate_income_statement(self, statement: list, start_date: date, end_date: date):
         """Estado de Resultados (Ganancias y Pérdidas)"""
+        data = movement_view(statement)
         buffer = BytesIO()
         doc = SimpleDocTemplate(buffer, pagesize=LETTER)
         
@@ -166,32 +182,39 @@ class FinancialReportGenerator:
         buffer.seek(0)
         return buffer
     
-    def generate_equity_changes(self, data: list, start_date: date, end_date: date):
+    def generate_equity_changes(self, statement: list, start_date: date, end_date: date):
+        """Estado de Cambios en el Patrimonio: saldo inicial, movimiento y saldo final"""
         buffer = BytesIO()
         doc = SimpleDocTemplate(buffer, pagesize=LETTER)
         
         self._add_header("Estado de Cambios en el Patrimonio", f"Del {start_date} al {end_date}")
         
         # Filtramos solo cuentas de Patrimonio (Grupo 3) de Nivel 3 o 4 (Movimiento)
-        equity_accs = [x for x in data if x['code'].startswith('3') and x['level'] >= 3]
+        equity_accs = [x for x in statement if x['code'].startswith('3') and x['level'] >= 3]
         
-        table_data = [["CUENTA PATRIMONIAL", "SALDO FINAL"]]
-        total_equity = 0
+        table_data = [["CUENTA PATRIMONIAL", "SALDO INICIAL", "MOVIMIENTO", "SALDO FINAL"]]
+        total_opening = total_movement = total_equity = 0
         
         for acc in equity_accs:
             table_data.append([
                 Paragraph(acc['name'], self.style_cell_normal),
-                "{:,.2f}".format(acc['balance'])
+                "{:,.2f}".format(acc['opening_balance']),
+                "{:,.2f}".format(acc['movement']),
+                "{:,.2f}".format(acc['closing_balance'])
             ])
-            total_equity += acc['balance']
+            total_opening += acc['opening_balance']
+            total_movement += acc['movement']
+            total_equity += acc['closing_balance']
             
         # Total
         table_data.append([
             Paragraph("<b>TOTAL PATRIMONIO AL CIERRE</b>", self.style_cell_total),
+            Paragraph(f"<b>{'{:,.2f}'.format(total_opening)}</b>", self.style_cell_total),
+            Paragraph(f"<b>{'{:,.2f}'.format(total_movement)}</b>", self.style_cell_total),
             Paragraph(f"<b>{'{:,.2f}'.format(total_equity)}</b>", self.style_cell_total)
         ])
         
-        t = self._create_standard_table(table_data, [5.0*inch, 1.5*inch])
+        t = self._create_standard_table(table_data, [3.2*inch, 1.1*inch, 1.1*inch, 1.1*inch])
         self.elements.append(t)
         self._add_signatures()
         
@@ -199,11 +222,13 @@ class FinancialReportGenerator:
         buffer.seek(0)
         return buffer
 
-    def generate_cash_flow(self, balance_data: list, income_data: list, start_date: date, end_date: date):
+    def generate_cash_flow(self, statement: list, start_date: date, end_date: date):
         """
         Genera Flujo de Efectivo basado en variaciones.
-        Requiere datos de: Resultado del periodo + Variaciones de Activos/Pasivos.
+        Resultado del periodo + Variaciones (saldo final - saldo inicial) de Activos/Pasivos.
         """
+        # Resultado del periodo y variaciones de balance salen del mismo movimiento
+        income_data = balance_data = movement_view(statement)
         buffer = BytesIO()
         doc = SimpleDocTemplate(buffer, pagesize=LETTER)
         self._add_header("Estado de Flujos de Efectivo", f"Del {start_date} al {end_date}")
@@ -225,8 +250,7 @@ class FinancialReportGenerator:
         if depreciation > 0:
             table_data.append([Paragraph("Más: Cargos por Depreciación", self.style_cell_normal), "{:,.2f}".format(depreciation), ""])
         
-        # Cambios en Capital de Trabajo (Simplificado: Usamos saldos finales como variación por ser primer año)
-        # En un sistema maduro, esto sería (Saldo Final - Saldo Inicial)
+        # Cambios en Capital de Trabajo: variación del periodo (Saldo Final - Saldo Inicial)
         # Nota: Aumento de Activo RESTA, Aumento de Pasivo SUMA.
         
         # Cuentas por Cobrar (1.01.02 y 1.01.03) -> Aumento RESTA efectivo
@@ -262,7 +286,7 @@ class FinancialReportGenerator:
         table_data.append([Paragraph("<b>AUMENTO (DISMINUCIÓN) NETO DE EFECTIVO</b>", self.style_cell_total), "", "{:,.2f}".format(net_increase)])
         
         # Saldo Caja y Bancos (1.01.01)
-        cash_balance = sum(x['balance'] for x in balance_data if x['code'].startswith('1.01.01'))
+        cash_balance = sum(x['closing_balance'] for x in statement if x['code'].startswith('1.01.01'))
         table_data.append([Paragraph("<b>EFECTIVO AL FINAL DEL PERIODO</b>", self.style_cell_total), "", "{:,.2f}".format(cash_balance)])
 
         t = self._create_standard_table(table_data, [3.5*inch, 1.5*inch, 1.5*inch])
@@ -12,7 +12,9 @@ from tenacity import retry, stop_after_attempt, wait_fixed, retry_if_exception_t
 # Ajuste de path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from app.database import AsyncSessionLocal
-from app.models import LedgerEntry, LedgerLine, Account, PayrollAccountingConfig
+from app.models import LedgerEntry, LedgerLine, PayrollAccountingConfig
+from app.services import period_balances
+from app.services.account_tree import account_tree_cache
 
 RABBITMQ_URL = os.getenv("RABBITMQ_URL")
 
@@ -21,10 +23,10 @@ async def get_rabbitmq_connection():
     print(f"⏳ [Accounting] Conectando a RabbitMQ...", flush=True)
     return await aio_pika.connect_robust(RABBITMQ_URL)
 
-async def get_account_id_by_code(db, code: str, tenant_id: int):
-    result = await db.execute(select(Account).where(Account.code == code, Account.tenant_id == tenant_id))
-    account = result.scalars().first() 
-    return account.id if account else None
+async def get_account_ids_by_code(db, tenant_id: int, *codes: str):
+    """Resuelve códigos del PUC a ids desde la caché del plan de cuentas (sin consultar si ya está cargado)."""
+    ids = await account_tree_cache.resolve_codes(db, tenant_id, codes)
+    return [ids[code] for code in codes]
 
 async def get_payroll_config(db, tenant_id: int):
     """Obtiene la asignación de contabilidad de nómina para el inquilino"""
@@ -75,14 +77,14 @@ async def process_cash_close(data: dict):
         await db.flush()
         
         # --- OBTENER CUENTAS ---
-        # 1. ACTIVO
-        acc_cash = await get_account_id_by_code(db, "1.01.01.001", tenant_id) # Caja Principal
-        acc_bank = await get_account_id_by_code(db, "1.01.01.003", tenant_id) # Banco Nacional
-        acc_ar   = await get_account_id_by_code(db, "1.01.03.001", tenant_id) # Cuentas por Cobrar Clientes
-        
-        # 2. INGRESOS Y PASIVOS
-        acc_sales = await get_account_id_by_code(db, "4.01.01.001", tenant_id) # Ventas Mercancía
-        acc_vat   = await get_account_id_by_code(db, "2.01.02.001", tenant_id) # Débito Fiscal IVA
+        acc_cash, acc_bank, acc_ar, acc_sales, acc_vat = await get_account_ids_by_code(
+            db, tenant_id,
+            "1.01.01.001",  # Caja Principal
+            "1.01.01.003",  # Banco Nacional
+            "1.01.03.001",  # Cuentas por Cobrar Clientes
+            "4.01.01.001",  # Ventas Mercancía
+            "2.01.02.001"   # Débito Fiscal IVA
+        )
         
         lines = []
         
@@ -105,6 +107,7 @@ async def process_cash_close(data: dict):
             
         if lines:
             db.add_all(lines)
+            await period_balances.apply_entry(db, entry)
             await db.commit()
             print(f" [v] ✅ Asiento Global de Cierre #{entry.id} creado.", flush=True)
         else:
@@ -201,6 +204,7 @@ async def process_payroll_calculated(data: dict):
         # Guarda líneas en masa
         if lines:
             db.add_all(lines)
+            await period_balances.apply_entry(db, entry)
             await db.commit()
             print(f" [v] ✅ Entrada de diario de nómina #{entry.id} creada correctamente.", flush=True)
         else:
@@ -241,28 +245,19 @@ async def process_payroll_batch_event(payload):
     
     async with database.AsyncSessionLocal() as db:
         try:
-            # A. CUENTA DE PAGO
-            bank_acc = (await db.execute(select(models.Account).filter_by(code=target_account_code, tenant_id=tenant_id))).scalars().first()
+            bank_acc, salary_acc, ivss_acc, faov_acc, other_liability_acc = await get_account_ids_by_code(
+                db, tenant_id,
+                target_account_code,  # A. Cuenta de pago
+                "6.01.01",            # B. Gasto: Sueldos y Salarios
+                "2.01.03.003",        # C. Pasivo: SSO / IVSS por Pagar
+                "2.01.03.004",        #    Pasivo: FAOV por Pagar
+                "2.01.03.001"         #    Pasivo: Sueldos por Pagar (resto/ISLR si no hay cuenta específica)
+            )
+            contrib_acc = salary_acc
+            
             if not bank_acc:
                 print(f"❌ Cuenta Banco {target_account_code} no existe.")
                 return
-            
-            # B. CUENTAS DE GASTO
-            # 6.01.01.001: Sueldos y Salarios
-            salary_acc = (await db.execute(select(models.Account).filter_by(code="6.01.01", tenant_id=tenant_id))).scalars().first()
-            
-            contrib_acc = salary_acc
-            
-            # C. CUENTAS DE PASIVOS
-            
-            # 2.01.03.003: SSO / IVSS por Pagar
-            ivss_acc = (await db.execute(select(models.Account).filter_by(code="2.01.03.003", tenant_id=tenant_id))).scalars().first()
-            
-            # 2.01.03.004: FAOV por Pagar
-            faov_acc = (await db.execute(select(models.Account).filter_by(code="2.01.03.004", tenant_id=tenant_id))).scalars().first()
-            
-            # 2.01.03.001: Sueldos por Pagar (Para el resto/ISLR si no hay cuenta especifica)
-            other_liability_acc = (await db.execute(select(models.Account).filter_by(code="2.01.03.001", tenant_id=tenant_id))).scalars().first()
 
             if not salary_acc or not ivss_acc or not faov_acc:
                 print("❌ Faltan cuentas del PUC (IVSS o FAOV por pagar).")
@@ -283,27 +278,30 @@ async def process_payroll_batch_event(payload):
             
             # [DEBE] Gasto Sueldos (Bruto)
             if total_expense_salary > 0:
-                db.add(models.LedgerLine(entry_id=entry.id, account_id=salary_acc.id, debit=total_expense_salary, credit=0))
+                db.add(models.LedgerLine(entry_id=entry.id, account_id=salary_acc, debit=total_expense_salary, credit=0))
             
             # [DEBE] Gasto Aportes Patronales
             if total_expense_contrib > 0:
-                db.add(models.LedgerLine(entry_id=entry.id, account_id=contrib_acc.id, debit=total_expense_contrib, credit=0))
+                db.add(models.LedgerLine(entry_id=entry.id, account_id=contrib_acc, debit=total_expense_contrib, credit=0))
                 
             # [HABER] Banco (Salida neta)
             if total_net_pay > 0:
-                db.add(models.LedgerLine(entry_id=entry.id, account_id=bank_acc.id, debit=0, credit=total_net_pay))
+                db.add(models.LedgerLine(entry_id=entry.id, account_id=bank_acc, debit=0, credit=total_net_pay))
             
             # [HABER] Pasivo IVSS (Deuda con el Seguro Social)
             if liability_ivss > 0:
-                db.add(models.LedgerLine(entry_id=entry.id, account_id=ivss_acc.id, debit=0, credit=liability_ivss))
+                db.add(models.LedgerLine(entry_id=entry.id, account_id=ivss_acc, debit=0, credit=liability_ivss))
 
             # [HABER] Pasivo FAOV (Deuda con Banavih)
             if liability_faov > 0:
-                db.add(models.LedgerLine(entry_id=entry.id, account_id=faov_acc.id, debit=0, credit=liability_faov))
+                db.add(models.LedgerLine(entry_id=entry.id, account_id=faov_acc, debit=0, credit=liability_faov))
 
             # [HABER] Otros Pasivos (ISLR, etc)
             if liability_other > 0:
-                db.add(models.LedgerLine(entry_id=entry.id, account_id=other_liability_acc.id, debit=0, credit=liability_other))
+                db.add(models.LedgerLine(entry_id=entry.id, account_id=other_liability_acc, debit=0, credit=liability_other))
+            
+            # Snapshots mensuales de saldos (misma transacción que el asiento)
+            await period_balances.apply_entry(db, entry)
                 
             await db.commit()
             print(f"✅ Asiento de Nómina ID {entry.id} creado con cuentas PUC Venezuela.")
@@ -341,9 +339,15 @@ async def main():
         await queue.bind(exchange, routing_key="payroll.calculated")
         await queue.bind(exchange, routing_key="payroll.batch_paid")
         
+        # Avisos de cambios del plan de cuentas (invalida la caché de códigos)
+        listener = await account_tree_cache.listen(database.engine)
+        
         print("🎧 [Accounting] Escuchando eventos financieros...", flush=True)
-        await queue.consume(process_message)
-        await asyncio.Future()
+        try:
+            await queue.consume(process_message)
+            await asyncio.Future()
+        finally:
+            await listener.close()
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,33 @@
+"""Add composite indexes for ledger queries
+
+Revision ID: a7e3c5d90b14
+Revises: c749d2076464
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7e3c5d90b14'
+down_revision: Union[str, Sequence[str], None] = 'c749d2076464'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Las tablas pueden venir de create_all (que ya crea estos índices): IF NOT EXISTS
+    op.create_index('ix_ledger_entries_tenant_date', 'ledger_entries', ['tenant_id', 'transaction_date', 'id'], if_not_exists=True)
+    op.create_index('ix_ledger_lines_account_entry', 'ledger_lines', ['account_id', 'entry_id'], if_not_exists=True)
+    op.create_index('ix_ledger_lines_entry_id', 'ledger_lines', ['entry_id'], if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_ledger_lines_entry_id', table_name='ledger_lines')
+    op.drop_index('ix_ledger_lines_account_entry', table_name='ledger_lines')
+    op.drop_index('ix_ledger_entries_tenant_date', table_name='ledger_entries')
@@ -0,0 +1,49 @@
+"""Add monthly account balance snapshots
+
+Revision ID: b3f8d2a6c417
+Revises: a7e3c5d90b14
+Create Date: 2026-10-17 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3f8d2a6c417'
+down_revision: Union[str, Sequence[str], None] = 'a7e3c5d90b14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('account_period_balances',
+        sa.Column('tenant_id', sa.Integer(), nullable=False),
+        sa.Column('account_id', sa.Integer(), nullable=False),
+        sa.Column('period', sa.Date(), nullable=False),
+        sa.Column('debit', sa.Numeric(precision=14, scale=2), nullable=False, server_default='0'),
+        sa.Column('credit', sa.Numeric(precision=14, scale=2), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['account_id'], ['accounts.id'], ),
+        sa.PrimaryKeyConstraint('tenant_id', 'account_id', 'period')
+    )
+    op.create_index('ix_account_period_balances_tenant_period', 'account_period_balances', ['tenant_id', 'period'], unique=False)
+
+    # Carga inicial desde el histórico de asientos
+    op.execute("""
+        INSERT INTO account_period_balances (tenant_id, account_id, period, debit, credit, updated_at)
+        SELECT e.tenant_id, l.account_id, date_trunc('month', e.transaction_date)::date,
+               COALESCE(SUM(l.debit), 0), COALESCE(SUM(l.credit), 0), now()
+        FROM ledger_lines l
+        JOIN ledger_entries e ON e.id = l.entry_id
+        GROUP BY e.tenant_id, l.account_id, date_trunc('month', e.transaction_date)
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_account_period_balances_tenant_period', table_name='account_period_balances')
+    op.drop_table('account_period_balances')
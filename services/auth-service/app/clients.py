@@ -0,0 +1,9 @@
+import os
+from erp_common.http_client import ServiceHttpClient
+
+HHRR_SERVICE_URL = os.getenv("HHRR_SERVICE_URL", "http://hhrr-service:8000")
+
+# Pool HTTP compartido por todo el proceso (se abre/cierra en el lifespan).
+# El login hace fail-open si RRHH no responde, así que el timeout es corto.
+http_client = ServiceHttpClient()
+http_client.register("hhrr", HHRR_SERVICE_URL, timeout=3.0, max_retries=1)
@@ -2,16 +2,24 @@ from fastapi import FastAPI, Depends, status, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
+from contextlib import asynccontextmanager
 import os
 
 from erp_common.database import DatabaseManager
 from erp_common.security import get_current_user, UserPayload, RequirePermission, Permissions
 from . import schemas, services, crud
+from .clients import http_client
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 db_manager = DatabaseManager(DATABASE_URL)
 
-app = FastAPI(title="Auth Service", root_path="/api/auth")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await http_client.start()
+    yield
+    await http_client.close()
+
+app = FastAPI(title="Auth Service", root_path="/api/auth", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -1,13 +1,11 @@
 import httpx
-import os
 from fastapi import HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
 
 from erp_common import security
 from . import crud, models, schemas
-
-HHRR_SERVICE_URL = os.getenv("HHRR_SERVICE_URL", "http://hhrr-service:8000")
+from .clients import http_client
 
 class AuthService:
     
@@ -123,14 +121,12 @@ class AuthService:
     @staticmethod
     async def _check_hhrr_access(email: str, tenant_id: int):
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{HHRR_SERVICE_URL}/api/hhrr/access-control/check",
-                    params={"email": email, "tenant_id": tenant_id},
-                    timeout=3.0
-                )
-                if response.status_code == 200 and response.json().get("allowed") is False:
-                    raise HTTPException(status_code=403, detail="Acceso denegado: Fuera de horario laboral.")
+            response = await http_client.get(
+                "hhrr", "/api/hhrr/access-control/check",
+                params={"email": email, "tenant_id": tenant_id}
+            )
+            if response.status_code == 200 and response.json().get("allowed") is False:
+                raise HTTPException(status_code=403, detail="Acceso denegado: Fuera de horario laboral.")
         except httpx.RequestError:
             print(f"⚠️ Warning: HHRR Service inalcanzable. Fail-open.")
             
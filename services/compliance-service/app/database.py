@@ -0,0 +1,13 @@
+import os
+from erp_common.database import DatabaseManager, Base
+
+# URL de conexión
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+# Inicialización de Manager común
+db_manager = DatabaseManager(DATABASE_URL)
+
+# Exporta las variables que la app espera
+engine = db_manager.engine
+Base = Base
+AsyncSessionLocal = db_manager.session_factory
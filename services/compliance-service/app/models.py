@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime
+from sqlalchemy.sql import func
+from .database import Base
+
+class ProcessedEvent(Base):
+    """
+    Eventos de finance ya procesados por el worker fiscal (por `event_id`).
+    
+    El relay entrega al-menos-una-vez: el id se reserva en la misma transacción
+    que guarda el resultado fiscal, así un reenvío (tras un reinicio o en otra
+    réplica del consumidor) no procesa la factura dos veces.
+    """
+    __tablename__ = "processed_events"
+    
+    event_id = Column(String(64), primary_key=True)
+    routing_key = Column(String, nullable=False)
+    invoice_id = Column(Integer, nullable=True)
+    result = Column(Text, nullable=True)            # Respuesta del adaptador fiscal (JSON)
+    processed_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -3,13 +3,34 @@ import json
 import os
 import sys
 import aio_pika
+from sqlalchemy import update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from tenacity import retry, stop_after_attempt, wait_fixed, retry_if_exception_type
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from app.adapters.compliance_ve import VEAdapter
+from app.database import AsyncSessionLocal, engine
+from app.models import Base, ProcessedEvent
 
 RABBITMQ_URL = os.getenv("RABBITMQ_URL")
 
+# Versiones del evento `invoice.created` que este worker entiende
+SUPPORTED_INVOICE_CREATED_VERSIONS = {1}
+
+async def claim_event(db, event_id: str, routing_key: str, invoice_id=None) -> bool:
+    """
+    Reserva el `event_id` en `processed_events` (dentro de la transacción en curso).
+    Retorna False si ya se había procesado: el relay de finance entrega
+    al-menos-una-vez y el mismo evento puede llegar otra vez.
+    """
+    claimed = await db.execute(
+        pg_insert(ProcessedEvent)
+        .values(event_id=event_id, routing_key=routing_key, invoice_id=invoice_id)
+        .on_conflict_do_nothing(index_elements=["event_id"])
+        .returning(ProcessedEvent.event_id)
+    )
+    return claimed.first() is not None
+
 @retry(stop=stop_after_attempt(15), wait=wait_fixed(5), retry=retry_if_exception_type(Exception))
 async def get_rabbitmq_connection():
     print(f"⏳ [Compliance] Conectando a RabbitMQ...", flush=True)
@@ -24,19 +45,48 @@ def get_adapter(country_code="VE"):
 async def process_message(message: aio_pika.IncomingMessage):
     async with message.process():
         try:
-            data = json.loads(message.body)
-            print(f"📥 [Compliance] Procesando factura para impuestos...", flush=True)
+            envelope = json.loads(message.body)
+            event_id = envelope.get("event_id") or message.message_id
+            
+            # Sobre versionado {event_id, event_type, version, data}; payload plano si es legado
+            data = envelope.get("data", envelope) if "event_id" in envelope else envelope
+            version = envelope.get("version")
+            if version is not None and version not in SUPPORTED_INVOICE_CREATED_VERSIONS:
+                print(f"⚠️ [Compliance] Versión de evento no soportada: {version}", flush=True)
+                return
             
-            # Nota: Si el adaptador es síncrono (no usa await), se ejecuta directo.
-            # Si consume mucho CPU, idealmente se usaría run_in_executor, pero por ahora está bien así.
-            adapter = VEAdapter()
-            result = adapter.process_invoice(data)
+            async with AsyncSessionLocal() as db:
+                if event_id:
+                    if not await claim_event(db, event_id, message.routing_key, data.get("id")):
+                        print(f"♻️ [Compliance] Evento duplicado {event_id}, se omite.", flush=True)
+                        return
+                
+                print(f"📥 [Compliance] Procesando factura para impuestos...", flush=True)
+                
+                # Nota: Si el adaptador es síncrono (no usa await), se ejecuta directo.
+                # Si consume mucho CPU, idealmente se usaría run_in_executor, pero por ahora está bien así.
+                adapter = VEAdapter()
+                result = adapter.process_invoice(data)
+                
+                # El resultado se guarda con la reserva del evento: si algo falla antes
+                # del commit, el id queda libre y un reenvío vuelve a procesarlo
+                if event_id:
+                    await db.execute(
+                        update(ProcessedEvent)
+                        .where(ProcessedEvent.event_id == event_id)
+                        .values(result=json.dumps(result, default=str))
+                    )
+                await db.commit()
             
             print(f"✅ [Compliance] Resultado: {result}", flush=True)
         except Exception as e:
             print(f"❌ [Compliance] Error: {e}", flush=True)
 
 async def main():
+    # Tabla de eventos procesados (el worker no tiene migraciones propias)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    
     connection = await get_rabbitmq_connection()
     async with connection:
         channel = await connection.channel()
@@ -2,6 +2,7 @@ from typing import Optional, Dict, Any
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy import func, or_
+from erp_common.pagination import paginate
 from . import models, schemas
 
 async def get_customers(
@@ -9,12 +10,15 @@ async def get_customers(
     tenant_id: int, 
     page: int = 1, 
     limit: int = 50, 
-    search: Optional[str] = None
+    search: Optional[str] = None,
+    cursor: Optional[str] = None,
+    count_mode: str = "exact"
 ) -> Dict[str, Any]:
     """
     Obtiene el listado paginado de clientes de una empresa.
 
-    Optimizado para contar IDs en lugar de filas completas.
+    Optimizado para contar IDs en lugar de filas completas. Con `cursor`
+    pagina por keyset sobre `(name, id)` en lugar de OFFSET.
 
     Args:
         db (AsyncSession): Sesión de base de datos.
@@ -22,12 +26,12 @@ async def get_customers(
         page (int): Número de página.
         limit (int): Registros por página.
         search (str, optional): Filtro por nombre, email o documento fiscal.
+        cursor (str, optional): Token `meta.next_cursor` de la página anterior.
+        count_mode (str): 'exact' (COUNT) o 'estimate' (estimación del planificador).
 
     Returns:
         Dict: Estructura con 'data' (lista) y 'meta' (paginación).
     """
-    offset = (page - 1) * limit
-    
     # Condiciones base (Multi-tenancy seguro)
     conditions = [
         models.Customer.tenant_id == tenant_id, 
@@ -46,32 +50,18 @@ async def get_customers(
 
     # 1. Conteo Rápido (Count ID)
     count_query = select(func.count(models.Customer.id)).filter(*conditions)
-    total_result = await db.execute(count_query)
-    total = total_result.scalar() or 0
     
     # 2. Obtener Datos
-    query = (
-        select(models.Customer)
-        .filter(*conditions)
-        .order_by(models.Customer.name.asc())
-        .offset(offset)
-        .limit(limit)
+    return await paginate(
+        db,
+        select(models.Customer).filter(*conditions),
+        order_by=[models.Customer.name, models.Customer.id],
+        page=page,
+        limit=limit,
+        cursor=cursor,
+        count_mode=count_mode,
+        count_query=count_query
     )
-    result = await db.execute(query)
-    data = result.scalars().all()
-    
-    # Cálculo seguro de páginas
-    total_pages = (total + limit - 1) // limit if limit > 0 else 0
-    
-    return {
-        "data": data,
-        "meta": {
-            "total": total,
-            "page": page,
-            "limit": limit,
-            "total_pages": total_pages
-        }
-    }
 
 async def get_customer_by_tax_id(db: AsyncSession, tenant_id: int, tax_id: str):
     """Busca un cliente por su documento fiscal dentro de la misma empresa."""
@@ -1,6 +1,7 @@
 from fastapi import FastAPI, Depends, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional, Literal
 from . import crud, schemas, database, models
 from erp_common.security import RequirePermission, Permissions, UserPayload
 from .schemas import PaginatedResponse
@@ -34,6 +35,8 @@ async def read_customers(
     page: int = 1,
     limit: int = 50,
     search: str = None,
+    cursor: Optional[str] = None,
+    count: Literal["exact", "estimate"] = "exact",
     db: AsyncSession = Depends(database.get_db),
     user: UserPayload = Depends(RequirePermission(Permissions.CUSTOMER_READ)) 
 ):
@@ -42,8 +45,12 @@ async def read_customers(
     
     Devuelve una lista paginada de clientes pertenecientes a la empresa del usuario.
     Permite filtrar por nombre, email o documento fiscal.
+    Para recorrer listas largas, enviar `cursor` (de `meta.next_cursor`) en lugar de `page`.
     """
-    return await crud.get_customers(db, tenant_id=user.tenant_id, page=page, limit=limit, search=search)
+    return await crud.get_customers(
+        db, tenant_id=user.tenant_id, page=page, limit=limit, search=search,
+        cursor=cursor, count_mode=count
+    )
 
 @app.post("/customers", response_model=schemas.CustomerResponse, status_code=201)
 async def create_customer(
@@ -0,0 +1,13 @@
+import os
+from erp_common.http_client import ServiceHttpClient
+
+# URLs de otros microservicios (Leídas del ENV o defaults de Docker)
+INVENTORY_SERVICE_URL = os.getenv("INVENTORY_SERVICE_URL", "http://inventory-service:8000")
+AUTH_URL = os.getenv("AUTH_SERVICE_URL", "http://auth-service:8000")
+CRM_URL = os.getenv("CRM_SERVICE_URL", "http://crm-service:8000")
+
+# Pool HTTP compartido por todo el proceso (se abre/cierra en el lifespan)
+http_client = ServiceHttpClient()
+http_client.register("inventory", INVENTORY_SERVICE_URL, timeout=5.0)
+http_client.register("crm", CRM_URL, timeout=3.0)
+http_client.register("auth", AUTH_URL, timeout=3.0)
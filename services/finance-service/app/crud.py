@@ -1,27 +1,26 @@
-import httpx
 import logging
-import os
 import asyncio
+import re
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
-from sqlalchemy import func, String, extract, desc, and_, cast, or_, extract
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy import func, String, extract, desc, and_, cast, or_, case, update
 from typing import Optional, Dict, Any, List
-from datetime import datetime, date
+from datetime import datetime, date, timezone
 from decimal import Decimal
 from . import models, schemas
-from .events import publish_event
+from .events import enqueue_event, outbox_relay
 from jose import jwt
 from erp_common.security import SECRET_KEY, ALGORITHM, UserPayload
+from erp_common.pagination import paginate
 from .models import FinanceSettings
+from .clients import http_client
+from .services.rate_cache import rate_cache
+from .services.settings_cache import settings_cache
 
 logger = logging.getLogger(__name__)
 
-# URLs de otros microservicios (Leídas del ENV o defaults de Docker)
-INVENTORY_SERVICE_URL = os.getenv("INVENTORY_SERVICE_URL", "http://inventory-service:8000")
-AUTH_URL = os.getenv("AUTH_SERVICE_URL", "http://auth-service:8000")
-CRM_URL = os.getenv("CRM_SERVICE_URL", "http://crm-service:8000")
-
 # --- UTILIDADES ---
 def round_money(amount: Decimal) -> Decimal:
     """Redondea un monto a 2 decimales."""
@@ -37,23 +36,40 @@ def get_user_from_token(token: str):
         return None, None
 
 # ---- HELPERS PARA DATOS EXTERNOS ----
-async def get_product_details(product_id: int, token: str):
+PRODUCT_BATCH_LIMIT = 500
+
+async def get_products_details(product_ids: List[int], token: str) -> Dict[int, dict]:
+    """
+    Consulta en lote los productos en Inventario (`POST /products/batch`).
+    Retorna un mapa {product_id: producto}; los IDs no encontrados no aparecen.
+    """
+    unique_ids = list(dict.fromkeys(int(pid) for pid in product_ids))
+    if not unique_ids:
+        return {}
+    
     headers = {"Authorization": f"Bearer {token}"}
-    url = f"{INVENTORY_SERVICE_URL}/api/inventory/products/{product_id}"
-    async with httpx.AsyncClient() as client:
+    
+    async def fetch_chunk(ids: List[int]) -> Dict[int, dict]:
         try:
-            resp = await client.get(url, headers=headers)
+            resp = await http_client.post(
+                "inventory", "/api/inventory/products/batch",
+                json={"ids": ids}, headers=headers, idempotent=True
+            )
             if resp.status_code == 200:
-                data = resp.json()
-                # Debug: Ver qué llega realmente
-                logger.info(f"📦 Payload recibido para producto {product_id}: {data}") 
-                return data
+                return {int(p["id"]): p for p in resp.json()}
             else:
-                logger.warning(f"⚠️ Inventario devolvió {resp.status_code} para ID {product_id}")
-                return None
+                logger.warning(f"⚠️ Inventario devolvió {resp.status_code} para el lote {ids}")
+                return {}
         except Exception as e:
             logger.error(f"Error Inventory: {e}")
-            return None
+            return {}
+    
+    # Inventario acepta hasta PRODUCT_BATCH_LIMIT IDs por llamada
+    chunks = [unique_ids[i:i + PRODUCT_BATCH_LIMIT] for i in range(0, len(unique_ids), PRODUCT_BATCH_LIMIT)]
+    product_map: Dict[int, dict] = {}
+    for result in await asyncio.gather(*[fetch_chunk(chunk) for chunk in chunks]):
+        product_map.update(result)
+    return product_map
 
 # --- INTEGRACIONES EXTERNAS (HTTP) ---
         
@@ -65,54 +81,126 @@ async def get_customer_details(search_term: str, token: str):
     if not search_term: return None
     
     headers = {"Authorization": f"Bearer {token}"}
-    async with httpx.AsyncClient() as client:
-        try:
-            resp = await client.get(f"{CRM_URL}/api/crm/customers?search={search_term}&limit=1", headers=headers)
-            if resp.status_code == 200:
-                data = resp.json().get("data", [])
-                if data:
-                    return data[0] # Retornamos el primer cliente encontrado
-            return None
-        except Exception as e:
-            logger.error(f"Error buscando cliente en CRM: {e}")
-            return None
+    try:
+        resp = await http_client.get(
+            "crm", "/api/crm/customers",
+            params={"search": search_term, "limit": 1}, headers=headers
+        )
+        if resp.status_code == 200:
+            data = resp.json().get("data", [])
+            if data:
+                return data[0] # Retornamos el primer cliente encontrado
+        return None
+    except Exception as e:
+        logger.error(f"Error buscando cliente en CRM: {e}")
+        return None
 
 async def get_tenant_data(token: str):
     """Obtiene los datos fiscales de la empresa desde Auth"""
-    async with httpx.AsyncClient() as client:
-        try:
-            resp = await client.get(f"{AUTH_URL}/tenant/me", headers={"Authorization": f"Bearer {token}"})
-            return resp.json() if resp.status_code == 200 else None
-        except Exception as e:
-            logger.error(f"Error Auth: {e}")
-            return None
+    try:
+        resp = await http_client.get("auth", "/tenant/me", headers={"Authorization": f"Bearer {token}"})
+        return resp.json() if resp.status_code == 200 else None
+    except Exception as e:
+        logger.error(f"Error Auth: {e}")
+        return None
         
+async def allocate_document_numbers(db: AsyncSession, tenant_id: int, doc_type: str, count: int = 1) -> int:
+    """
+    Reserva `count` números correlativos consecutivos para la empresa y retorna el primero.
+    
+    Usa `INSERT ... ON CONFLICT DO UPDATE ... RETURNING` sobre `document_sequences`:
+    la fila del tenant queda bloqueada hasta el commit, serializando solo a los
+    terminales de la misma empresa. Si la transacción hace rollback el número no se consume.
+    """
+    stmt = pg_insert(models.DocumentSequence).values(
+        tenant_id=tenant_id,
+        doc_type=doc_type,
+        last_value=count
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[models.DocumentSequence.tenant_id, models.DocumentSequence.doc_type],
+        set_={"last_value": models.DocumentSequence.last_value + count}
+    ).returning(models.DocumentSequence.last_value)
+    
+    last_value = (await db.execute(stmt)).scalar_one()
+    return last_value - count + 1
+
 async def get_next_invoice_number(db: AsyncSession, tenant_id: int) -> int:
-    """Calcula el siguiente número correlativo para la empresa"""
-    query = select(func.max(models.Invoice.invoice_number)).filter(models.Invoice.tenant_id == tenant_id)
-    result = await db.execute(query)
-    max_num = result.scalar()
-    return (max_num or 0) + 1
+    """Reserva el siguiente número correlativo de factura para la empresa"""
+    return await allocate_document_numbers(db, tenant_id, "INVOICE")
 
-async def get_latest_rate(db: AsyncSession, currency_from: str = "USD", currency_to: str = "VES"):
-    """Busca la tasa más reciente guardada por el Scheduler"""
-    query = (
-        select(models.ExchangeRate)
-        .filter(
-            models.ExchangeRate.currency_from == currency_from,
-            models.ExchangeRate.currency_to == currency_to
-        )
-        .order_by(models.ExchangeRate.acquired_at.desc())
-        .limit(1)
+# --- RESUMEN DIARIO DE VENTAS ---
+PENDING_STATUSES = ("ISSUED", "PARTIALLY_PAID")
+
+def _rollup_day(created_at: Optional[datetime]) -> date:
+    """Día (UTC) al que pertenece una factura en el resumen diario."""
+    if created_at is None:
+        return datetime.utcnow().date()
+    if created_at.tzinfo is not None:
+        created_at = created_at.astimezone(timezone.utc)
+    return created_at.date()
+
+async def apply_sales_rollup(
+    db: AsyncSession,
+    tenant_id: int,
+    day: date,
+    sales_usd: Decimal = Decimal(0),
+    invoice_count: int = 0,
+    pending_usd: Decimal = Decimal(0)
+):
+    """Suma los deltas al resumen del día con un UPSERT (misma transacción que la factura)."""
+    stmt = pg_insert(models.DailySalesRollup).values(
+        tenant_id=tenant_id,
+        day=day,
+        sales_usd=sales_usd,
+        invoice_count=invoice_count,
+        pending_usd=pending_usd
     )
-    result = await db.execute(query)
-    return result.scalars().first()
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[models.DailySalesRollup.tenant_id, models.DailySalesRollup.day],
+        set_={
+            "sales_usd": models.DailySalesRollup.sales_usd + stmt.excluded.sales_usd,
+            "invoice_count": models.DailySalesRollup.invoice_count + stmt.excluded.invoice_count,
+            "pending_usd": models.DailySalesRollup.pending_usd + stmt.excluded.pending_usd
+        }
+    )
+    await db.execute(stmt)
+
+async def track_invoice_status(db: AsyncSession, invoice: models.Invoice, old_status: Optional[str], new_status: str):
+    """
+    Refleja en el resumen diario una factura nueva (`old_status=None`) o un cambio de estado.
+    """
+    total = invoice.total_usd or Decimal(0)
+    
+    def sales_of(status):
+        return total if status is not None and status != "VOID" else Decimal(0)
+    
+    def pending_of(status):
+        return total if status in PENDING_STATUSES else Decimal(0)
+    
+    sales_delta = sales_of(new_status) - sales_of(old_status)
+    pending_delta = pending_of(new_status) - pending_of(old_status)
+    count_delta = 1 if old_status is None else 0
+    
+    if sales_delta or pending_delta or count_delta:
+        await apply_sales_rollup(
+            db, invoice.tenant_id, _rollup_day(invoice.created_at),
+            sales_usd=sales_delta, invoice_count=count_delta, pending_usd=pending_delta
+        )
+
+async def get_latest_rate(db: AsyncSession, currency_from: str = "USD", currency_to: str = "VES"):
+    """Tasa más reciente guardada por el Scheduler (servida desde la caché en memoria)."""
+    return await rate_cache.get(db, currency_from, currency_to)
 
 async def get_finance_settings(db: AsyncSession, tenant_id: int):
     """
-    Obtiene la configuración del tenant.
+    Obtiene la configuración del tenant (desde la caché si está vigente).
     Si no existe, crea una configuración por defecto.
     """
+    cached = settings_cache.get(tenant_id)
+    if cached is not None:
+        return cached
+    
     # Intenta buscar la configuración existente
     stmt = select(FinanceSettings).where(FinanceSettings.tenant_id == tenant_id)
     result = await db.execute(stmt)
@@ -129,7 +217,7 @@ async def get_finance_settings(db: AsyncSession, tenant_id: int):
         await db.commit()
         await db.refresh(settings)
         
-    return settings
+    return settings_cache.set(settings)
 
 # --- PAGO ---
 async def create_payment(db: AsyncSession, payment: schemas.PaymentCreate, tenant_id: int):
@@ -151,8 +239,7 @@ async def create_payment(db: AsyncSession, payment: schemas.PaymentCreate, tenan
         raise ValueError("Factura no encontrada o acceso denegado")
     
     # Obtener tasa
-    rate_q = select(models.ExchangeRate).order_by(desc(models.ExchangeRate.acquired_at)).limit(1)
-    rate_obj = (await db.execute(rate_q)).scalar_one_or_none()
+    rate_obj = await get_latest_rate(db)
     current_rate = rate_obj.rate if rate_obj else Decimal(1)
     
     # Calcular saldos
@@ -198,6 +285,7 @@ async def create_payment(db: AsyncSession, payment: schemas.PaymentCreate, tenan
     
     is_fully_paid = False # Bandera para saber si debemos emitir evento
     
+    old_status = invoice.status
     if new_total_paid >= (invoice.total_usd - Decimal("0.05")):
         invoice.status = "PAID"
         is_fully_paid = True
@@ -205,13 +293,72 @@ async def create_payment(db: AsyncSession, payment: schemas.PaymentCreate, tenan
         invoice.status = "PARTIALLY_PAID"
         
     db.add(invoice) # Actualiza la factura también
+    await track_invoice_status(db, invoice, old_status, invoice.status)
+    
+    if is_fully_paid:
+        # Evento para descontar inventario (Outbox, misma transacción)
+        await db.flush()
+        await db.refresh(db_payment, ["created_at"])
+        enqueue_event(db, "invoice.paid", {
+            "invoice_id": invoice.id,
+            "tenant_id": tenant_id,
+            "total_amount": float(invoice.total_usd),
+            "paid_at": str(db_payment.created_at),
+            "items": [{"product_id": item.product_id, "quantity": item.quantity} for item in invoice.items]
+        })
     
     await db.commit()
     await db.refresh(db_payment)
+    if is_fully_paid:
+        outbox_relay.notify()
     return db_payment, invoice, is_fully_paid
 
 # --- FACTURACIÓN ---
 
+# --- BÚSQUEDA DE FACTURAS ---
+RIF_PREFIX_PATTERN = re.compile(r"^[VEJGPC]-?\d", re.IGNORECASE)
+MAX_INVOICE_NUMBER = 2_147_483_647
+
+def invoice_search_condition(search: str):
+    """
+    Traduce el parámetro `search` a una condición que pueda usar índices.
+
+    - Solo dígitos: número de factura exacto (índice único por empresa) o
+      número de control / cédula contenidos (trigramas), p. ej. "123" encuentra
+      el control 00-000123.
+    - Prefijo de RIF (V-, E-, J-, G-, P-, C-): prefijo del RIF, o el nombre del
+      cliente (p. ej. "G4S" o "V8 Motors" también son nombres).
+    - Texto libre: ILIKE sobre nombre, RIF y número de control, servido por
+      los índices GIN `gin_trgm_ops`. Ya no se castea `invoice_number` a texto,
+      que obligaba a recorrer todas las facturas de la empresa.
+    """
+    term = search.strip()
+    
+    if term.isdigit():
+        options = [
+            models.Invoice.control_number.ilike(f"%{term}%"),
+            models.Invoice.customer_rif.ilike(f"%{term}%")
+        ]
+        if int(term) <= MAX_INVOICE_NUMBER:
+            options.append(models.Invoice.invoice_number == int(term))
+        return or_(*options)
+    
+    if RIF_PREFIX_PATTERN.match(term):
+        # El RIF puede estar guardado con o sin guion (J-1234... / J1234...)
+        digits = term[1:].lstrip("-")
+        prefixes = {f"{term[0]}-{digits}", f"{term[0]}{digits}"}
+        return or_(
+            models.Invoice.customer_name.ilike(f"%{term}%"),
+            *[models.Invoice.customer_rif.ilike(f"{p}%") for p in prefixes]
+        )
+    
+    search_term = f"%{term}%"
+    return or_(
+        models.Invoice.customer_name.ilike(search_term),
+        models.Invoice.customer_rif.ilike(search_term),
+        models.Invoice.control_number.ilike(search_term)
+    )
+
 async def get_invoices(
     db: AsyncSession, 
     tenant_id: int,
@@ -222,29 +369,23 @@ async def get_invoices(
     created_by_id: Optional[int] = None,
     only_pending_close: bool = False,
     date_start: Optional[datetime] = None,
-    date_end: Optional[datetime] = None
+    date_end: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    count_mode: str = "exact"
 ) -> Dict[str, Any]:
     """
     Lista facturas con paginación y búsqueda.
     Optimizado para contar IDs en lugar de subqueries.
+    Con `cursor` pagina por keyset sobre `(created_at, id)`.
     """
-    offset = (page - 1) * limit
     conditions = [models.Invoice.tenant_id == tenant_id]
     
     # Filtros Dinámicos
     if status:
         conditions.append(models.Invoice.status == status)
         
-    if search:
-        search_term = f"%{search}%"
-        conditions.append(
-            or_(
-                models.Invoice.customer_name.ilike(search_term),
-                models.Invoice.customer_rif.ilike(search_term),
-                cast(models.Invoice.invoice_number, String).ilike(search_term),
-                models.Invoice.control_number.ilike(search_term)
-            )
-        )
+    if search and search.strip():
+        conditions.append(invoice_search_condition(search))
     
     # Filtros de seguridad y negocio
     if created_by_id:
@@ -264,103 +405,49 @@ async def get_invoices(
     
     # Contar Rapido
     count_query = select(func.count(models.Invoice.id)).filter(*conditions)
-    total_result = await db.execute(count_query)
-    total = total_result.scalar() or 0
     
-    # Ordenar y Paginar
-    query = (
-        select(models.Invoice)
-        .filter(*conditions)
-        .order_by(models.Invoice.created_at.desc())
-        .offset(offset)
-        .limit(limit)
+    # Ordenar y Paginar (OFFSET o keyset según `cursor`)
+    return await paginate(
+        db,
+        select(models.Invoice).filter(*conditions),
+        order_by=[models.Invoice.created_at, models.Invoice.id],
+        descending=True,
+        page=page,
+        limit=limit,
+        cursor=cursor,
+        count_mode=count_mode,
+        count_query=count_query
     )
-    
-    result = await db.execute(query)
-    data = result.scalars().all()
-    
-    # Cálculo total de páginas
-    total_pages = (total + limit - 1) // limit if limit > 0 else 0
-    
-    return {
-        "data": data,
-        "meta": {
-            "total": total,
-            "page": page,
-            "limit": limit,
-            "total_pages": total_pages
-        }
-    }
 
-async def create_invoice(
-    db: AsyncSession, 
-    invoice_data: schemas.InvoiceCreate, 
-    tenant_id: int, 
-    token: str,
+def build_invoice(
+    invoice_data: schemas.InvoiceCreate,
+    tenant_id: int,
     user_id: int,
-    user_role: str
+    user_role: str,
+    tenant_data: dict,
+    customer_data: dict,
+    product_map: Dict[int, dict],
+    tax_rate: Decimal,
+    exchange_rate: Decimal,
+    reserved_stock: Optional[Dict[int, Decimal]] = None
 ) -> models.Invoice:
     """
-    Emite una nueva factura de venta.
+    Arma la factura (items, pago inicial, totales y snapshots) sin tocar la DB.
+    La numeración se asigna después con `assign_invoice_number`.
 
-    Realiza las siguientes acciones en una transacción atómica:
-    1. Obtiene datos fiscales de la empresa (Auth) y del cliente (CRM).
-    2. Consulta precios y stock de productos en paralelo (Inventory).
-    3. Calcula subtotales, impuestos y totales en divisa y moneda local.
-    4. Si el método de pago es de contado, registra el pago y marca como PAGADA.
-    5. Guarda Snapshots de todos los datos para auditoría fiscal.
-    6. Dispara eventos a RabbitMQ para contabilidad e inventario.
+    `reserved_stock` acumula lo ya comprometido por otras facturas del mismo lote,
+    para que la validación de stock no apruebe más de lo disponible.
     """
-    
-    # 1. Obtener Datos Externos en Paralelo
-    # Lanza las peticiones a microservicios simultáneamente
-    tasks = [
-        get_tenant_data(token),
-        get_customer_details(invoice_data.customer_tax_id, token) if invoice_data.customer_tax_id else asyncio.sleep(0),
-        *[get_product_details(item.product_id, token) for item in invoice_data.items]
-    ]
-    
-    results = await asyncio.gather(*tasks)
-    
-    tenant_data = results[0]
-    customer_data = results[1] if invoice_data.customer_tax_id else {}
-    product_list = results[2:]
-    
-    # Mapa de productos
-    product_map = {}
-    for p in product_list:
-        if not p: continue
-        
-        actual_product = p.get("data", p) if isinstance(p, dict) else p
-        
-        p_id = actual_product.get("id")
-        if p_id is not None:
-            try:
-                product_map[int(p_id)] = actual_product
-            except ValueError:
-                # Si el ID no es numérico, se guarda como está
-                product_map[p_id] = actual_product
-    
-    if not tenant_data:
-        raise ValueError("Error crítico: No se pudieron obtener datos fiscales de la empresa.")
-    
-    # 2. Configuración Fiscal y Cambiaria
-    settings_q = select(models.FinanceSettings).filter(models.FinanceSettings.tenant_id == tenant_id)
-    settings = (await db.execute(settings_q)).scalar_one_or_none()
-    tax_rate = settings.tax_rate if settings else Decimal(16.00)
-    
-    # Obtener Tasa de Cambio
-    rate_q = select(models.ExchangeRate).order_by(desc(models.ExchangeRate.acquired_at)).limit(1)
-    rate_obj = (await db.execute(rate_q)).scalar_one_or_none()
-    exchange_rate = rate_obj.rate if rate_obj else Decimal(1)
+    reserved_stock = reserved_stock if reserved_stock is not None else {}
     
     # 3. Procesar Items y Totales
     total_base = Decimal(0)
     db_items = []
-    db_event_items = []
+    requested: Dict[int, Decimal] = {}
     
     for item in invoice_data.items:
-        product = product_map.get(int(item.product_id))
+        product_id = int(item.product_id)
+        product = product_map.get(product_id)
         if not product:
             raise ValueError(f"Producto ID {item.product_id} no encontrado en Inventario.")
         
@@ -370,8 +457,9 @@ async def create_invoice(
             stock_available = Decimal(0)
             
         
-        # Validación de Stock
-        if stock_available < item.quantity:
+        # Validación de Stock (descontando lo ya comprometido)
+        requested[product_id] = requested.get(product_id, Decimal(0)) + item.quantity
+        if stock_available - reserved_stock.get(product_id, Decimal(0)) < requested[product_id]:
             raise ValueError(f"Stock insuficiente para '{product['name']}'. Disponibles: {product['stock']}")
         
         # Precio unitario
@@ -395,11 +483,6 @@ async def create_invoice(
             unit_price=unit_price,
             total_price=line_total
         ))
-        
-        db_event_items.append({
-            "product_id": item.product_id,
-            "quantity": float(item.quantity)
-        })
 
     # Cálculos Finales
     tax_amount = round_money(total_base * (tax_rate / 100))
@@ -439,22 +522,19 @@ async def create_invoice(
             notes=invoice_data.payment.notes,
             created_at=date.today()
         ))
-        
-    # 5. Numeración
-    last_inv_q = select(models.Invoice).filter(models.Invoice.tenant_id == tenant_id).order_by(desc(models.Invoice.invoice_number)).limit(1)
-    last_inv = (await db.execute(last_inv_q)).scalar_one_or_none()
-    new_number = (last_inv.invoice_number + 1) if last_inv else 1
+    
+    # Stock comprometido solo si la factura es válida
+    for product_id, quantity in requested.items():
+        reserved_stock[product_id] = reserved_stock.get(product_id, Decimal(0)) + quantity
     
     # 6. Crear Factura
-    new_invoice = models.Invoice(
+    return models.Invoice(
         tenant_id=tenant_id,
         salesperson_id=invoice_data.salesperson_id,
         created_by_user_id=user_id,
         created_by_role=user_role,
         
         # Datos Fiscales
-        invoice_number=new_number,
-        control_number=f"00-{new_number:08d}", # Generador simple de control
         status=status,
         
         # Snapshot Empresa 
@@ -481,10 +561,95 @@ async def create_invoice(
         items=db_items,
         payments=db_payments
     )
+
+def assign_invoice_number(invoice: models.Invoice, number: int):
+    """Asigna el consecutivo fiscal y el número de control derivado."""
+    invoice.invoice_number = number
+    invoice.control_number = f"00-{number:08d}" # Generador simple de control
+
+def enqueue_invoice_events(db: AsyncSession, invoice: models.Invoice):
+    """
+    Registra en el outbox `invoice.created` y, si hubo pago inicial, `invoice.paid`.
+    Es el único punto que emite `invoice.created` (esquema `schemas.InvoiceCreatedEvent`).
+    """
+    # Evento 1: Factura Creada (sobre versionado con event_id)
+    event_data = schemas.InvoiceCreatedEvent.model_validate(invoice).model_dump()
+    enqueue_event(db, "invoice.created", event_data, version=schemas.INVOICE_CREATED_VERSION)
+    
+    # Evento 2: Pago Inmediato
+    if len(invoice.payments) > 0:
+        paid_event = {
+            "invoice_id": invoice.id,
+            "tenant_id": invoice.tenant_id,
+            "total_amount": float(invoice.payments[0].amount),
+            "payment_method": invoice.payments[0].payment_method,
+            "paid_at": str(datetime.utcnow()),
+            "items": event_data["items"], # Reenviamos items para que Inventory sepa qué descontar
+            "origin": "immediate_sale"
+        }
+        enqueue_event(db, "invoice.paid", paid_event)
+
+async def create_invoice(
+    db: AsyncSession, 
+    invoice_data: schemas.InvoiceCreate, 
+    tenant_id: int, 
+    token: str,
+    user_id: int,
+    user_role: str
+) -> models.Invoice:
+    """
+    Emite una nueva factura de venta.
+
+    Realiza las siguientes acciones en una transacción atómica:
+    1. Obtiene datos fiscales de la empresa (Auth) y del cliente (CRM).
+    2. Consulta precios y stock de productos en paralelo (Inventory).
+    3. Calcula subtotales, impuestos y totales en divisa y moneda local.
+    4. Si el método de pago es de contado, registra el pago y marca como PAGADA.
+    5. Guarda Snapshots de todos los datos para auditoría fiscal.
+    6. Dispara eventos a RabbitMQ para contabilidad e inventario.
+    """
+    
+    # 1. Obtener Datos Externos en Paralelo
+    # Lanza las peticiones a microservicios simultáneamente (productos en un solo lote)
+    tasks = [
+        get_tenant_data(token),
+        get_customer_details(invoice_data.customer_tax_id, token) if invoice_data.customer_tax_id else asyncio.sleep(0),
+        get_products_details([item.product_id for item in invoice_data.items], token)
+    ]
+    
+    tenant_data, customer_data, product_map = await asyncio.gather(*tasks)
+    customer_data = customer_data or {}
+    
+    if not tenant_data:
+        raise ValueError("Error crítico: No se pudieron obtener datos fiscales de la empresa.")
+    
+    # 2. Configuración Fiscal y Cambiaria
+    settings = await get_finance_settings(db, tenant_id)
+    
+    # Obtener Tasa de Cambio
+    rate_obj = await get_latest_rate(db)
+    exchange_rate = rate_obj.rate if rate_obj else Decimal(1)
+    
+    # 3-4. Items, totales y pago inicial
+    new_invoice = build_invoice(
+        invoice_data, tenant_id, user_id, user_role,
+        tenant_data, customer_data, product_map, settings.tax_rate, exchange_rate
+    )
+        
+    # 5. Numeración
+    assign_invoice_number(new_invoice, await get_next_invoice_number(db, tenant_id))
     
-    # Guardado Atómico
+    # Guardado Atómico (la factura y sus eventos en la misma transacción)
     db.add(new_invoice)
+    await db.flush() # Genera el ID
+    await db.refresh(new_invoice, ["created_at"])
+    await track_invoice_status(db, new_invoice, None, new_invoice.status)
+    
+    # 7. Registrar Eventos (Outbox)
+    enqueue_invoice_events(db, new_invoice)
+    
     await db.commit()
+    outbox_relay.notify()
     
     result_reload = await db.execute(
         select(models.Invoice)
@@ -492,44 +657,104 @@ async def create_invoice(
         .filter(models.Invoice.id == new_invoice.id)
     )
     new_invoice = result_reload.scalars().first()
+        
+    return new_invoice
+
+async def create_invoices_batch(
+    db: AsyncSession,
+    batch: schemas.InvoiceBatchCreate,
+    tenant_id: int,
+    token: str,
+    user_id: int,
+    user_role: str
+) -> Dict[str, Any]:
+    """
+    Emite un lote de facturas (canal e-commerce) en una sola transacción.
+
+    - Empresa, clientes (uno por RIF distinto) y productos se resuelven una vez por lote.
+    - Cada factura se valida por separado: las inválidas se reportan en `errors`
+      con su posición y no impiden emitir las demás.
+    - Las válidas reciben un rango contiguo de números, se insertan juntas
+      (INSERT multi-fila) y sus eventos salen del outbox en una sola ráfaga.
+    """
+    invoices_in = batch.invoices
+    tax_ids = list(dict.fromkeys(inv.customer_tax_id for inv in invoices_in if inv.customer_tax_id))
+    product_ids = [item.product_id for inv in invoices_in for item in inv.items]
     
-    items_for_event = []
-    for i in new_invoice.items:
-        items_for_event.append({
-            "product_id": i.product_id,
-            "product_name": i.product_name,
-            "quantity": float(i.quantity),
-            "unit_price": float(i.unit_price),  
-            "total_price": float(i.total_price)
-        })
+    # 1. Datos Externos (una sola vez por lote)
+    tenant_data, product_map, *customers = await asyncio.gather(
+        get_tenant_data(token),
+        get_products_details(product_ids, token),
+        *[get_customer_details(tax_id, token) for tax_id in tax_ids]
+    )
+    if not tenant_data:
+        raise ValueError("Error crítico: No se pudieron obtener datos fiscales de la empresa.")
+    customer_map = {tax_id: customer or {} for tax_id, customer in zip(tax_ids, customers)}
     
-    # 7. Disparar Eventos
-    # Evento 1: Factura Creada
-    event_data ={
-        "id": new_invoice.id,
-        "tenant_id": tenant_id,
-        "total_amount": float(new_invoice.total_usd),
-        "currency": new_invoice.currency,
-        "status": new_invoice.status,
-        "date": str(new_invoice.created_at),
-        "items": items_for_event
-    }
-    publish_event("invoice.created", event_data)
+    # 2. Configuración Fiscal y Cambiaria
+    settings = await get_finance_settings(db, tenant_id)
+    rate_obj = await get_latest_rate(db)
+    exchange_rate = rate_obj.rate if rate_obj else Decimal(1)
     
-    # Evento 2: Pago Inmediato
-    if len(db_payments) > 0:
-        paid_event = {
-            "invoice_id": new_invoice.id,
-            "tenant_id": tenant_id,
-            "total_amount": float(db_payments[0].amount),
-            "payment_method": db_payments[0].payment_method,
-            "paid_at": str(datetime.utcnow()),
-            "items": event_data["items"], # Reenviamos items para que Inventory sepa qué descontar
-            "origin": "immediate_sale"
-        }
-        publish_event("invoice.paid", paid_event)
-        
-    return new_invoice
+    # 3. Armar y validar cada factura
+    reserved_stock: Dict[int, Decimal] = {}
+    valid: List[tuple] = []
+    errors = []
+    for index, invoice_data in enumerate(invoices_in):
+        try:
+            invoice = build_invoice(
+                invoice_data, tenant_id, user_id, user_role,
+                tenant_data, customer_map.get(invoice_data.customer_tax_id, {}),
+                product_map, settings.tax_rate, exchange_rate, reserved_stock
+            )
+            valid.append((index, invoice))
+        except ValueError as e:
+            errors.append({"index": index, "error": str(e)})
+    
+    if not valid:
+        return {"created": [], "errors": errors}
+    
+    # 4. Rango contiguo de números para todo el lote
+    first_number = await allocate_document_numbers(db, tenant_id, "INVOICE", count=len(valid))
+    created_at = datetime.now(timezone.utc)
+    for offset, (_, invoice) in enumerate(valid):
+        assign_invoice_number(invoice, first_number + offset)
+        invoice.created_at = created_at
+    
+    # 5. Inserción en bloque (el ORM agrupa los INSERT en sentencias multi-fila)
+    db.add_all([invoice for _, invoice in valid])
+    await db.flush()
+    
+    # Resumen diario: un solo UPSERT con los totales del lote
+    sales = sum((inv.total_usd for _, inv in valid), Decimal(0))
+    pending = sum((inv.total_usd for _, inv in valid if inv.status in PENDING_STATUSES), Decimal(0))
+    await apply_sales_rollup(
+        db, tenant_id, _rollup_day(created_at),
+        sales_usd=sales, invoice_count=len(valid), pending_usd=pending
+    )
+    
+    # 6. Eventos (se publican en ráfaga al hacer commit)
+    for _, invoice in valid:
+        enqueue_invoice_events(db, invoice)
+    
+    await db.commit()
+    outbox_relay.notify()
+    logger.info(f"🧾 Lote de facturas: {len(valid)} emitidas, {len(errors)} rechazadas (empresa {tenant_id}).")
+    
+    return {
+        "created": [
+            {
+                "index": index,
+                "id": invoice.id,
+                "invoice_number": invoice.invoice_number,
+                "control_number": invoice.control_number,
+                "status": invoice.status,
+                "total_usd": invoice.total_usd
+            }
+            for index, invoice in valid
+        ],
+        "errors": errors
+    }
 
 async def get_invoice_by_id(db: AsyncSession, invoice_id: int, tenant_id: int):
     """Busca una factura por ID con sus items cargados."""
@@ -560,11 +785,26 @@ async def set_invoice_void(db: AsyncSession, invoice_id: int, tenant_id: int):
     if invoice.status == 'PAID' or invoice.status == 'PARTIALLY_PAID':
         raise ValueError("No se puede anular una factura que ya tiene pagos. Debe realizar una Nota de Crédito.")
         
+    old_status = invoice.status
     invoice.status = 'VOID'
+    await track_invoice_status(db, invoice, old_status, invoice.status)
+    
+    # Evento para revertir inventario y contabilidad (Outbox, misma transacción)
+    enqueue_event(db, "invoice.voided", {
+        "invoice_id": invoice.id,
+        "tenant_id": tenant_id,
+        "items": [{"product_id": i.product_id, "quantity": i.quantity} for i in invoice.items]
+    })
+    
     await db.commit()
     await db.refresh(invoice)
+    outbox_relay.notify()
     return invoice   
 
+# Agrupación de métodos de pago para el Cierre de Caja
+USD_TRANSFER_METHODS = ["ZELLE", "USDT", "PAYPAL", "TRANSFER"]
+VES_CARD_METHODS = ["DEBIT_CARD", "BIOPAGO", "PAGO_MOVIL"]
+
 async def create_cash_close(
     db: AsyncSession, 
     close_data: schemas.CashCloseCreate, 
@@ -573,160 +813,146 @@ async def create_cash_close(
 ) -> models.CashClose:
     """
     Genera el Cierre de Caja (Z) pulido.
-    """
-    
-    # 1. Buscar Facturas Pendientes
-    stm_invoices = select(models.Invoice).options(
-        selectinload(models.Invoice.payments)
-    ).filter(
-        models.Invoice.tenant_id == tenant_id,
-        models.Invoice.status.in_(["PAID", "PARTIALLY_PAID", "ISSUED"]), 
-        models.Invoice.cash_close_id.is_(None),
-        models.Invoice.status != "VOID"
-    )
     
-    result = await db.execute(stm_invoices)
-    invoices = result.scalars().all()
-    
-    if not invoices:
-        raise ValueError("No hay movimientos pendientes para cerrar caja.")
-
-    # 2. Inicializar Acumuladores
-    summary = {
-        "sales_usd": Decimal(0), "tax_usd": Decimal(0),
-        "sales_ves": Decimal(0), "tax_ves": Decimal(0),
-        
-        "cash_usd": Decimal(0), "card_usd": Decimal(0), "transfer_usd": Decimal(0),
-        "cash_ves": Decimal(0), "card_ves": Decimal(0), "transfer_ves": Decimal(0),
-        
-        # Equivalentes para contabilidad (USD)
-        "cash_ves_equiv": Decimal(0),      
-        "card_ves_equiv": Decimal(0),
-        "transfer_ves_equiv": Decimal(0),
-
-        "credit_usd": Decimal(0), "credit_ves": Decimal(0)
-    }
-    
-    min_date = datetime.utcnow()
-    max_date = datetime.utcnow()
+    Todo el cálculo ocurre en PostgreSQL con memoria constante:
+    1. Un único `UPDATE ... WHERE cash_close_id IS NULL` marca (y bloquea) las facturas abiertas.
+    2. Una agregación sobre esas facturas calcula ventas, impuestos, crédito y rango de fechas.
+    3. Una agregación agrupada por moneda y método calcula los cobros.
+    """
+    Invoice, Payment = models.Invoice, models.Payment
     
-    if invoices:
-        min_date = invoices[-1].created_at 
-        max_date = invoices[0].created_at
-
-    for inv in invoices:
-        # --- A. VENTAS ---
-        summary["sales_usd"] += inv.subtotal_usd
-        summary["tax_usd"] += inv.tax_amount_usd
-        
-        # Calculamos el valor teórico en Bs de la venta usando la tasa de la factura
-        rate = inv.exchange_rate or Decimal(1)
-        summary["sales_ves"] += (inv.subtotal_usd * rate)
-        summary["tax_ves"] += (inv.tax_amount_usd * rate)
-
-        # --- B. COBROS ---
-        paid_amount_usd_accum = Decimal(0) # Para calcular crédito restante
-        
-        for p in inv.payments:
-            
-            # --- PAGOS EN DOLARES ---
-            if p.currency == "USD":
-                paid_amount_usd_accum += p.amount
-                
-                if p.payment_method == "CASH": 
-                    summary["cash_usd"] += p.amount
-                elif p.payment_method in ["ZELLE", "USDT", "PAYPAL", "TRANSFER"]: 
-                    summary["transfer_usd"] += p.amount
-                else: 
-                    summary["card_usd"] += p.amount
-            
-            # --- PAGOS EN BOLIVARES ---
-            elif p.currency == "VES":
-                # Calculamos cuánto representa esto en USD para restar a la deuda y para Contabilidad
-                # Usamos la tasa guardada en el pago, si no existe, la de la factura
-                p_rate = p.exchange_rate if p.exchange_rate else rate
-                val_in_usd = p.amount / p_rate
-                
-                paid_amount_usd_accum += val_in_usd
-                
-                if p.payment_method == "CASH": 
-                    summary["cash_ves"] += p.amount # Suma directa de Bs
-                    summary["cash_ves_equiv"] += val_in_usd # Equivalente $
-                elif p.payment_method in ["DEBIT_CARD", "BIOPAGO", "PAGO_MOVIL"]: 
-                    summary["card_ves"] += p.amount
-                    summary["card_ves_equiv"] += val_in_usd
-                else: 
-                    summary["transfer_ves"] += p.amount
-                    summary["transfer_ves_equiv"] += val_in_usd
-
-        # --- C. CREDITO (CUENTAS POR COBRAR) ---
-        # El crédito es el Total Factura - Lo que se ha logrado pagar (convertido a base USD)
-        remaining_balance = inv.total_usd - paid_amount_usd_accum
-        
-        # Pequeño margen de tolerancia por decimales (0.05)
-        if remaining_balance > Decimal("0.05"):
-            summary["credit_usd"] += remaining_balance
-            summary["credit_ves"] += (remaining_balance * rate)
-
-    # 3. Calcular Diferencias (Sobrante / Faltante)
-    # Dolares
-    total_system_cash_usd = summary["cash_usd"]
-    diff_usd = close_data.declared_cash_usd - total_system_cash_usd
-    
-    # Bolivares
-    total_system_cash_ves = summary["cash_ves"]
-    diff_ves = close_data.declared_cash_ves - total_system_cash_ves
-
-    # 4. Crear Objeto Cierre
+    # 1. Crear el cierre (necesitamos su ID para marcar las facturas)
+    now = datetime.utcnow()
     cash_close = models.CashClose(
         tenant_id=tenant_id,
         user_id=user_id,
-        period_start=min_date,
-        period_end=max_date,
-        
-        # Totales Sistema USD
-        total_sales_usd=summary["sales_usd"],
-        total_tax_usd=summary["tax_usd"],
-        
-        total_cash_usd=summary["cash_usd"],
-        total_debit_card_usd=summary["card_usd"],
-        total_transfer_usd=summary["transfer_usd"],
-        total_credit_sales_usd=summary["credit_usd"],
-        
-        # Totales Sistema VES
-        total_sales_ves=summary["sales_ves"],
-        total_tax_ves=summary["tax_ves"],
-        
-        total_cash_ves=summary["cash_ves"],
-        total_debit_card_ves=summary["card_ves"],
-        total_transfer_ves=summary["transfer_ves"],
-        total_credit_sales_ves=summary["credit_ves"],
-        
-        # Declarado (Lo que contó el cajero)
-        declared_cash_usd=close_data.declared_cash_usd,
-        declared_cash_ves=close_data.declared_cash_ves,
-        declared_card_usd=close_data.declared_card_usd,
-        declared_card_ves=close_data.declared_card_ves,
-        
-        # Diferencias
-        difference_usd=diff_usd,
-        difference_ves=diff_ves,
-        
+        period_start=now,
+        period_end=now,
         notes=close_data.notes
     )
-    
     db.add(cash_close)
     await db.flush() # Genera el ID
     
-    # 5. Actualizar Facturas (Cerrarlas)
-    for inv in invoices:
-        inv.cash_close_id = cash_close.id
-        db.add(inv)
-        
-    await db.commit()
-    await db.refresh(cash_close)
+    # 2. Cerrar las Facturas Pendientes en una sola sentencia
+    stamp = (
+        update(Invoice)
+        .where(
+            Invoice.tenant_id == tenant_id,
+            Invoice.status.in_(["PAID", "PARTIALLY_PAID", "ISSUED"]),
+            Invoice.cash_close_id.is_(None)
+        )
+        .values(cash_close_id=cash_close.id)
+        .execution_options(synchronize_session=False)
+    )
+    stamped = (await db.execute(stamp)).rowcount
+    
+    if not stamped:
+        raise ValueError("No hay movimientos pendientes para cerrar caja.")
+    
+    # Tasa de la factura (si no hay, 1) y tasa del pago (si no hay, la de la factura)
+    inv_rate = func.coalesce(func.nullif(Invoice.exchange_rate, 0), 1)
+    pay_rate = func.coalesce(func.nullif(Payment.exchange_rate, 0), inv_rate)
+    amount_usd = case(
+        (Payment.currency == "USD", Payment.amount),
+        (Payment.currency == "VES", Payment.amount / pay_rate),
+        else_=0
+    )
     
-    # 6. Evento para Contabilidad
+    # 3. Ventas, impuestos y crédito (Cuentas por Cobrar)
+    # El crédito es el Total Factura - Lo que se ha logrado pagar (convertido a base USD)
+    paid_sq = (
+        select(Payment.invoice_id, func.sum(amount_usd).label("paid_usd"))
+        .join(Invoice, Invoice.id == Payment.invoice_id)
+        .where(Invoice.tenant_id == tenant_id, Invoice.cash_close_id == cash_close.id)
+        .group_by(Payment.invoice_id)
+        .subquery()
+    )
+    remaining = Invoice.total_usd - func.coalesce(paid_sq.c.paid_usd, 0)
+    has_credit = remaining > Decimal("0.05") # Pequeño margen de tolerancia por decimales
+    
+    sales_q = (
+        select(
+            func.coalesce(func.sum(Invoice.subtotal_usd), 0).label("sales_usd"),
+            func.coalesce(func.sum(Invoice.tax_amount_usd), 0).label("tax_usd"),
+            func.coalesce(func.sum(Invoice.subtotal_usd * inv_rate), 0).label("sales_ves"),
+            func.coalesce(func.sum(Invoice.tax_amount_usd * inv_rate), 0).label("tax_ves"),
+            func.coalesce(func.sum(case((has_credit, remaining), else_=0)), 0).label("credit_usd"),
+            func.coalesce(func.sum(case((has_credit, remaining * inv_rate), else_=0)), 0).label("credit_ves"),
+            func.min(Invoice.created_at).label("period_start"),
+            func.max(Invoice.created_at).label("period_end")
+        )
+        .select_from(Invoice)
+        .outerjoin(paid_sq, paid_sq.c.invoice_id == Invoice.id)
+        .where(Invoice.tenant_id == tenant_id, Invoice.cash_close_id == cash_close.id)
+    )
+    sales = (await db.execute(sales_q)).one()
+    
+    # 4. Cobros por moneda y método
+    bucket = case(
+        (and_(Payment.currency == "USD", Payment.payment_method == "CASH"), "cash_usd"),
+        (and_(Payment.currency == "USD", Payment.payment_method.in_(USD_TRANSFER_METHODS)), "transfer_usd"),
+        (Payment.currency == "USD", "card_usd"),
+        (and_(Payment.currency == "VES", Payment.payment_method == "CASH"), "cash_ves"),
+        (and_(Payment.currency == "VES", Payment.payment_method.in_(VES_CARD_METHODS)), "card_ves"),
+        (Payment.currency == "VES", "transfer_ves"),
+        else_=None
+    ).label("bucket")
+    
+    payments_q = (
+        select(
+            bucket,
+            func.sum(Payment.amount).label("amount"),
+            func.sum(amount_usd).label("amount_usd")
+        )
+        .join(Invoice, Invoice.id == Payment.invoice_id)
+        .where(Invoice.tenant_id == tenant_id, Invoice.cash_close_id == cash_close.id)
+        .group_by(bucket)
+    )
+    collected = {
+        row.bucket: (row.amount or Decimal(0), row.amount_usd or Decimal(0))
+        for row in (await db.execute(payments_q)).all()
+        if row.bucket
+    }
+    
+    def amount_of(key: str) -> Decimal:
+        return collected.get(key, (Decimal(0), Decimal(0)))[0]
+    
+    def usd_equiv_of(key: str) -> Decimal:
+        return collected.get(key, (Decimal(0), Decimal(0)))[1]
+    
+    # 5. Completar el Cierre
+    cash_close.period_start = sales.period_start or now
+    cash_close.period_end = sales.period_end or now
+    
+    # Totales Sistema USD
+    cash_close.total_sales_usd = sales.sales_usd
+    cash_close.total_tax_usd = sales.tax_usd
+    cash_close.total_cash_usd = amount_of("cash_usd")
+    cash_close.total_debit_card_usd = amount_of("card_usd")
+    cash_close.total_transfer_usd = amount_of("transfer_usd")
+    cash_close.total_credit_sales_usd = sales.credit_usd
+    
+    # Totales Sistema VES
+    cash_close.total_sales_ves = sales.sales_ves
+    cash_close.total_tax_ves = sales.tax_ves
+    cash_close.total_cash_ves = amount_of("cash_ves")
+    cash_close.total_debit_card_ves = amount_of("card_ves")
+    cash_close.total_transfer_ves = amount_of("transfer_ves")
+    cash_close.total_credit_sales_ves = sales.credit_ves
+    
+    # Declarado (Lo que contó el cajero)
+    cash_close.declared_cash_usd = close_data.declared_cash_usd
+    cash_close.declared_cash_ves = close_data.declared_cash_ves
+    cash_close.declared_card_usd = close_data.declared_card_usd
+    cash_close.declared_card_ves = close_data.declared_card_ves
+    
+    # Diferencias (Sobrante / Faltante)
+    cash_close.difference_usd = close_data.declared_cash_usd - cash_close.total_cash_usd
+    cash_close.difference_ves = close_data.declared_cash_ves - cash_close.total_cash_ves
+    
+    # 6. Evento para Contabilidad (Outbox, misma transacción)
+    await db.flush()
+    await db.refresh(cash_close, ["created_at"])
     event_payload = {
         "tenant_id": tenant_id,
         "cash_close_id": cash_close.id,
@@ -742,24 +968,26 @@ async def create_cash_close(
             "collected_bank_usd": float(cash_close.total_debit_card_usd + cash_close.total_transfer_usd),
             
             # Equivalentes de lo cobrado en Bs (Para sumar al Debe en Libros USD)
-            "collected_cash_ves_equiv": float(summary["cash_ves_equiv"]),
-            "collected_bank_ves_equiv": float(summary["card_ves_equiv"] + summary["transfer_ves_equiv"]),
+            "collected_cash_ves_equiv": float(usd_equiv_of("cash_ves")),
+            "collected_bank_ves_equiv": float(usd_equiv_of("card_ves") + usd_equiv_of("transfer_ves")),
             
             "sales_on_credit_usd": float(cash_close.total_credit_sales_usd)
         }
     }
     
-    publish_event("finance.cash_close_created", event_payload)
+    enqueue_event(db, "finance.cash_close_created", event_payload)
+    
+    await db.commit()
+    await db.refresh(cash_close)
+    outbox_relay.notify()
     
     return cash_close
 
 # --- GESTION DE COTIZACIONES ---
 async def get_next_quote_number(db: AsyncSession, tenant_id: int) -> str:
-    """Genera el siguiente número correlativo para cotizaciones (Ej: COT-00005)."""
-    query = select(models.Quote.id).filter(models.Quote.tenant_id == tenant_id).order_by(desc(models.Quote.id)).limit(1)
-    result = await db.execute(query)
-    last_id = result.scalar() or 0
-    return f"COT-{last_id + 1:05d}"
+    """Reserva el siguiente número correlativo para cotizaciones (Ej: COT-00005)."""
+    next_num = await allocate_document_numbers(db, tenant_id, "QUOTE")
+    return f"COT-{next_num:05d}"
 
 async def create_quote(db: AsyncSession, quote_in: schemas.QuoteCreate, tenant_id: int, token: str) -> models.Quote:
     """
@@ -778,17 +1006,13 @@ async def create_quote(db: AsyncSession, quote_in: schemas.QuoteCreate, tenant_i
         customer = {"name": "Cliente Nuevo", "rif": quote_in.customer_tax_id, "email": "", "address": "", "phone": ""}
         
     # Obtener Configuracién Fiscal
-    settings_q = select(models.FinanceSettings).filter(models.FinanceSettings.tenant_id == tenant_id)
-    settings = (await db.execute(settings_q)).scalar_one_or_none()
+    settings = await get_finance_settings(db, tenant_id)
     
-    tax_percentage = settings.tax_rate if settings else Decimal(16.00)    
+    tax_percentage = settings.tax_rate
     tax_rate = tax_percentage / 100    
     
     # Procesar Items (Precios y Totales)
-    import asyncio
-    product_tasks = [get_product_details(item.product_id, token) for item in quote_in.items]
-    products_results = await asyncio.gather(*product_tasks)
-    product_map = {p['id']: p for p in products_results if p}
+    product_map = await get_products_details([item.product_id for item in quote_in.items], token)
     
     db_items = []
     total_base = Decimal(0)
@@ -875,10 +1099,11 @@ async def get_quotes(
     page: int = 1,
     limit: int = 20,
     search: Optional[str] = None,
-    status: Optional[str] = None
+    status: Optional[str] = None,
+    cursor: Optional[str] = None,
+    count_mode: str = "exact"
 ):
-    """Lista las cotizaciones con filtros."""
-    offset = (page - 1) * limit
+    """Lista las cotizaciones con filtros (keyset sobre `id` si se envía `cursor`)."""
     conditions = [models.Quote.tenant_id == tenant_id]
     
     if status:
@@ -897,31 +1122,19 @@ async def get_quotes(
     
     # Contar Rapido
     count_query = select(func.count(models.Quote.id)).filter(*conditions)
-    total_res = await db.execute(count_query)
-    total = total_res.scalar() or 0
     
     # Consulta de Datos
-    query = (
-        select(models.Quote)
-        .options(selectinload(models.Quote.items))
-        .filter(*conditions)
-        .order_by(models.Quote.id.desc())
-        .offset(offset)
-        .limit(limit)
+    return await paginate(
+        db,
+        select(models.Quote).options(selectinload(models.Quote.items)).filter(*conditions),
+        order_by=[models.Quote.id],
+        descending=True,
+        page=page,
+        limit=limit,
+        cursor=cursor,
+        count_mode=count_mode,
+        count_query=count_query
     )
-    
-    result = await db.execute(query)
-    data = result.scalars().all()
-    
-    return {
-        "data": data,
-        "meta": {
-            "total": total,
-            "page": page,
-            "limit": limit,
-            "total_pages": (total + limit - 1) // limit if limit > 0 else 0
-        }
-    } 
 
 async def convert_quote_to_invoice(db: AsyncSession, quote_in: int, user: UserPayload, token: str):
     """Convierte una Cotización en Factura Real"""
@@ -981,51 +1194,28 @@ async def get_sales_total_by_employee(db: AsyncSession, tenant_id: int, employee
     return total if total is not None else Decimal(0)
 
 async def get_dashboard_metrics(db: AsyncSession, tenant_id: int):
-    """Calcula KPIs del día."""
+    """Calcula KPIs del día desde el resumen diario (una sola consulta)."""
     today = datetime.utcnow().date()
     start_of_month = today.replace(day=1)
+    R = models.DailySalesRollup
     
-    # Ventas de Hoy
-    query_today = select(
-        func.sum(models.Invoice.total_usd)).filter(
-        models.Invoice.tenant_id == tenant_id,
-        models.Invoice.status != "VOID", # Ignorar anuladas
-        func.date(models.Invoice.created_at) == today
-    )
-    result_today = await db.execute(query_today)
-    today_sales = result_today.scalar() or 0
+    query = select(
+        # Ventas de Hoy (sin anuladas) y Conteo Facturas Hoy
+        func.coalesce(func.sum(case((R.day == today, R.sales_usd), else_=0)), 0).label("today_sales"),
+        func.coalesce(func.sum(case((R.day == today, R.invoice_count), else_=0)), 0).label("count_today"),
+        # Ventas del Mes
+        func.coalesce(func.sum(case((R.day >= start_of_month, R.sales_usd), else_=0)), 0).label("month_sales"),
+        # Por Cobrar (Facturas ISSUED o PARTIALLY_PAID)
+        func.coalesce(func.sum(R.pending_usd), 0).label("pending_balance")
+    ).filter(R.tenant_id == tenant_id)
     
-    # Conteo Facturas Hoy
-    query_count = select(func.count(models.Invoice.id)).filter(
-        models.Invoice.tenant_id == tenant_id,
-        func.date(models.Invoice.created_at) == today
-    )
-    result_count = await db.execute(query_count)
-    count_today = result_count.scalar() or 0
-    
-    # Ventas del Mes
-    query_month = select(func.sum(models.Invoice.total_usd)).filter(
-        models.Invoice.tenant_id == tenant_id,
-        models.Invoice.status != "VOID",
-        models.Invoice.created_at >= start_of_month
-    )
-    result_month = await db.execute(query_month)
-    month_sales = result_month.scalar() or 0
-    
-    # Por Cobrar (Facturas ISSUED o PARTIALLY_PAID)
-    # Nota: es aproximado. Sumaremos el total de facturas no pagadas completamente
-    query_pending = select(func.sum(models.Invoice.total_usd)).filter(
-        models.Invoice.tenant_id == tenant_id,
-        models.Invoice.status.in_(["ISSUED", "PARTIALLY_PAID"])
-    )
-    result_pending = await db.execute(query_pending)
-    pending_balance = result_pending.scalar() or 0
+    row = (await db.execute(query)).one()
     
     return {
-        "today_sales": today_sales,
-        "total_invoices_today": count_today,
-        "month_sales": month_sales,
-        "pending_balance": pending_balance
+        "today_sales": row.today_sales,
+        "total_invoices_today": row.count_today,
+        "month_sales": row.month_sales,
+        "pending_balance": row.pending_balance
     }
 
 async def get_sales_report_by_method(db: AsyncSession, tenant_id: int):
@@ -1066,31 +1256,34 @@ async def get_sales_report_by_method(db: AsyncSession, tenant_id: int):
     return report_data
 
 async def get_sales_compatison(db: AsyncSession, tenant_id: int):
-    """Compara ventas mes a mes (Año actual vs Año anterior)."""
+    """Compara ventas mes a mes (Año actual vs Año anterior) desde el resumen diario."""
     today = date.today()
     current_year = today.year
     last_year = current_year - 1
+    R = models.DailySalesRollup
     
-    # Función auxiliar para consultar un año específico
-    async def get_year_data(year_val):
-        query = (
-            select(
-                extract('month', models.Invoice.created_at).label('month'),
-                func.sum(models.Invoice.total_usd).label('total')
-            )
-            .filter(
-                models.Invoice.tenant_id == tenant_id,
-                models.Invoice.status != 'VOID',
-                extract('year', models.Invoice.created_at) == year_val
-            )
-            .group_by('month')
-            .order_by('month')
+    year_col = extract('year', R.day)
+    month_col = extract('month', R.day)
+    query = (
+        select(
+            year_col.label('year'),
+            month_col.label('month'),
+            func.sum(R.sales_usd).label('total')
         )
-        result = await db.execute(query)
-        return {int(row.month): float(row.total) for row in result.all()}
+        .filter(
+            R.tenant_id == tenant_id,
+            R.day >= date(last_year, 1, 1),
+            R.day <= date(current_year, 12, 31)
+        )
+        .group_by(year_col, month_col)
+    )
+    result = await db.execute(query)
     
-    current_data = await get_year_data(current_year)
-    last_year_data = await get_year_data(last_year)
+    data = {last_year: {}, current_year: {}}
+    for row in result.all():
+        data[int(row.year)][int(row.month)] = float(row.total)
+    current_data = data[current_year]
+    last_year_data = data[last_year]
     
     # Formatear respuesta cominada para Chart.js
     combined_data = []
@@ -1103,4 +1296,4 @@ async def get_sales_compatison(db: AsyncSession, tenant_id: int):
             "last_year": last_year_data.get(i, 0.0)
         })
         
-    return combined_data
\ No newline at end of file
+    return combined_data
@@ -1,42 +1,33 @@
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Request, Response, BackgroundTasks
 from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
 from contextlib import asynccontextmanager
-from typing import Optional
+from typing import Optional, Literal
 from datetime import date, datetime, time
 import logging
 
-# Scheduler
-from apscheduler.schedulers.background import BackgroundScheduler
-
 # Imports Locales
 from . import crud, schemas, database, models
-from .services import exchange
-from .database import engine, SyncSessionLocal
-from .events import publish_event
+from .services import exchange, export, sales_book
+from .services.rate_cache import rate_cache, rate_listener
+from .services.settings_cache import settings_cache
+from .services.pdf_cache import pdf_cache, etag_matches
+from .services.invoice_pdf_batch import invoice_pdf_batch
+from .database import engine, AsyncSessionLocal
+from .events import publisher, outbox_relay
+from .clients import http_client
 
 # Imports Comunes
 from erp_common.security import oauth2_scheme, RequirePermission, Permissions, UserPayload
 from .schemas import (PaginatedResponse, InvoiceSummary, SalesTotalResponse, FinanceSettingsRead, InvoiceResponse)
-from .utils.pdf_generator import generate_invoice_pdf
 
 # Logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("finance-service")
 
-# --- SCHEDULER (Segundo Plano) ---
-def run_exchange_rate_job():
-    """Tarea programada para actualizar la tasa del BCV."""
-    logger.info("⏰ [SCHEDULER] Iniciando tarea de tasa cambiaria...")
-    try:
-        with SyncSessionLocal() as db:
-            exchange.fetch_and_store_rate(db)
-            logger.info("⏰ [SCHEDULER] Tarea finalizada con éxito.")
-    except Exception as e:
-        logger.error(f"❌ [SCHEDULER] Falló la tarea: {e}")
-    
+# --- TAREA DE TASA CAMBIARIA (Segundo Plano) ---
+exchange_rate_job = exchange.ExchangeRateJob(AsyncSessionLocal, exchange.get_rate_source(), interval_hours=6)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -44,17 +35,41 @@ async def lifespan(app: FastAPI):
     async with engine.begin() as conn:
         await conn.run_sync(models.Base.metadata.create_all)
         
-    # 2. Iniciar el Scheduler
-    scheduler = BackgroundScheduler()
-    scheduler.add_job(run_exchange_rate_job, 'interval', hours=6)
-    scheduler.add_job(run_exchange_rate_job) # Ejecutar ya al inicio
-    scheduler.start()
-    logger.info("⏰ Scheduler iniciado.")
+    # 2. Pool HTTP hacia otros microservicios
+    await http_client.start()
+    
+    # 3. Publicador de eventos (conexión y canales persistentes)
+    try:
+        await publisher.start()
+    except Exception as e:
+        # No bloqueamos el arranque: el publicador reintenta al primer evento
+        logger.error(f"❌ No se pudo conectar el publicador de eventos: {e}")
+    
+    # 4. Relay del Outbox (publica en segundo plano los eventos confirmados en DB)
+    await outbox_relay.start()
+    
+    # 5. Caché de tasas: carga inicial y escucha de actualizaciones de otras réplicas
+    async with AsyncSessionLocal() as db:
+        await rate_cache.load(db)
+    await rate_listener.start()
+    
+    # 6. Tarea de tasa cambiaria (se ejecuta ya al inicio y luego cada 6 horas)
+    await exchange_rate_job.start()
+    logger.info("⏰ Tarea de tasa cambiaria iniciada.")
+    
+    # 7. Pool de procesos para renderizar tickets PDF
+    pdf_cache.start()
     
     yield 
     
-    # 3. Apagado
-    scheduler.shutdown()
+    # 8. Apagado
+    await exchange_rate_job.stop()
+    await rate_listener.stop()
+    invoice_pdf_batch.close()
+    pdf_cache.close()
+    await outbox_relay.stop()
+    await http_client.close()
+    await publisher.close()
 
 # --- Configuración de FastAPI ---
 app = FastAPI(
@@ -82,11 +97,16 @@ async def read_invoices(
     search: Optional[str] = None,
     start_date: date = None,
     end_date: date = None,
+    cursor: Optional[str] = None,
+    count: Literal["exact", "estimate"] = "exact",
     db: AsyncSession = Depends(database.get_db), 
     user: UserPayload = Depends(RequirePermission(Permissions.INVOICE_READ))
 ):
     """
     Lista facturas con visibilidad basada en roles.
+    
+    Para historial profundo, enviar `cursor` (tomado de `meta.next_cursor`) en lugar de `page`;
+    `count=estimate` evita el conteo exacto.
     """
     # Definir Roles con privilegios
     MANAGERS = ["OWNER", "ADMIN", "SALES_SUPERVISOR"]
@@ -119,7 +139,85 @@ async def read_invoices(
         created_by_id=filter_user_id,
         only_pending_close=filter_pending_close,
         date_start=filter_start,
-        date_end=filter_end
+        date_end=filter_end,
+        cursor=cursor,
+        count_mode=count
+    )
+
+@app.post("/invoices/batch", response_model=schemas.InvoiceBatchResponse)
+async def create_invoices_batch(
+    batch: schemas.InvoiceBatchCreate,
+    db: AsyncSession = Depends(database.get_db),
+    user: UserPayload = Depends(RequirePermission(Permissions.INVOICE_CREATE)),
+    token: str = Depends(oauth2_scheme)
+):
+    """
+    **Emitir Facturas en Lote**
+    
+    Pensado para canales que envían pedidos en ráfagas (e-commerce). Resuelve empresa,
+    clientes y productos una sola vez, numera el lote con un rango contiguo y registra
+    todos los eventos en el outbox en una sola transacción.
+    
+    Las facturas inválidas (stock, producto inexistente) se devuelven en `errors` con
+    su posición (`index`) y no impiden emitir las demás.
+    """
+    user_id_int = int(user.user_id) if user.user_id else 0
+    try:
+        return await crud.create_invoices_batch(db, batch, tenant_id=user.tenant_id, token=token, user_id=user_id_int, user_role=user.role)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/invoices/pdf-batch", response_model=schemas.InvoicePdfBatchJob, status_code=202)
+async def create_invoice_pdf_batch(
+    payload: schemas.InvoicePdfBatchRequest,
+    user: UserPayload = Depends(RequirePermission(Permissions.INVOICE_READ))
+):
+    """
+    **Exportar Tickets en Lote**
+    
+    Encola la exportación de los tickets PDF de todas las facturas del filtro
+    (rango de fechas y estado opcional) en un ZIP o en un único PDF concatenado.
+    Retorna el job; el avance se consulta en `/invoices/pdf-batch/{job_id}`.
+    """
+    if payload.end_date < payload.start_date:
+        raise HTTPException(status_code=400, detail="La fecha final no puede ser anterior a la inicial.")
+    try:
+        job = await invoice_pdf_batch.submit(
+            user.tenant_id, payload.start_date, payload.end_date, payload.status, payload.format
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return job.to_dict()
+
+@app.get("/invoices/pdf-batch/{job_id}", response_model=schemas.InvoicePdfBatchJob)
+async def read_invoice_pdf_batch(
+    job_id: str,
+    user: UserPayload = Depends(RequirePermission(Permissions.INVOICE_READ))
+):
+    """Progreso de una exportación de tickets (facturas procesadas / total)."""
+    job = invoice_pdf_batch.get(job_id, user.tenant_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Exportación no encontrada o expirada")
+    return job.to_dict()
+
+@app.get("/invoices/pdf-batch/{job_id}/download")
+async def download_invoice_pdf_batch(
+    job_id: str,
+    user: UserPayload = Depends(RequirePermission(Permissions.INVOICE_READ))
+):
+    """Descarga por bloques el ZIP / PDF de una exportación terminada."""
+    job = invoice_pdf_batch.get(job_id, user.tenant_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Exportación no encontrada o expirada")
+    if job.status == "FAILED":
+        raise HTTPException(status_code=500, detail=f"La exportación falló: {job.error}")
+    if job.status != "DONE":
+        raise HTTPException(status_code=409, detail="La exportación aún está en curso")
+    
+    return StreamingResponse(
+        export.iter_file_chunks(job.path),
+        media_type="application/zip" if job.format == "zip" else "application/pdf",
+        headers={"Content-Disposition": f"attachment; filename={job.filename}"}
     )
 
 @app.get("/invoices/{invoice_id}", response_model=schemas.InvoiceResponse)
@@ -136,6 +234,7 @@ async def get_invoice_by_id(
 @app.post("/invoices", response_model=InvoiceResponse, status_code=201)
 async def create_invoice(
     invoice: schemas.InvoiceCreate, 
+    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(database.get_db), 
     user: UserPayload = Depends(RequirePermission(Permissions.INVOICE_CREATE)),
     token: str = Depends(oauth2_scheme)
@@ -145,45 +244,48 @@ async def create_invoice(
     
     Crea una nueva factura de venta. 
     Se comunica con el servicio de Inventario para verificar items y precios (opcional).
-    Envía un evento a RabbitMQ (`invoice.created`) al finalizar.
+    Registra el evento `invoice.created` en el outbox; el relay lo publica en RabbitMQ.
+    El ticket PDF se pre-renderiza en segundo plano tras responder.
     """
     user_id_int = int(user.user_id) if user.user_id else 0
     new_invoice = await crud.create_invoice(db, invoice, tenant_id=user.tenant_id, token=token, user_id=user_id_int, user_role=user.role)
     
-    invoice_dict = {
-        "id": new_invoice.id,
-        "amount": str(new_invoice.total_usd),
-        "total_usd": str(new_invoice.total_usd),
-        "currency": new_invoice.currency,
-        "customer_rif": new_invoice.customer_rif,
-        "items": [{"product_id": i.product_id, "quantity": i.quantity} for i in new_invoice.items]
-    }
-    publish_event("invoice.created", invoice_dict)
+    background_tasks.add_task(pdf_cache.prerender, new_invoice.id, user.tenant_id)
     
     return new_invoice
 
 @app.get("/invoices/{invoice_id}/pdf")
 async def get_invoice_pdf(
     invoice_id: int,
+    request: Request,
     db: AsyncSession = Depends(database.get_db),
     user: UserPayload = Depends(RequirePermission(Permissions.INVOICE_READ))
 ):
     """
     **Descargar PDF de Factura**
     
-    Genera un PDF en formato ticket (térmico) para imprimir.
-    Retorna un stream de bytes (application/pdf).
+    Retorna el ticket (térmico) en PDF para imprimir.
+    El ticket se renderiza una sola vez y se sirve desde caché con `ETag`;
+    si el cliente envía `If-None-Match` con el mismo ETag se responde 304 sin cuerpo.
     """
+    etag = await pdf_cache.get_etag(db, invoice_id, user.tenant_id)
+    if etag and etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    
     invoice = await crud.get_invoice_by_id(db, invoice_id, user.tenant_id)
     if not invoice:
         raise HTTPException(status_code=404, detail="Factura no encontrada")
     
-    pdf_buffer = generate_invoice_pdf(invoice_data=invoice, items=invoice.items)
+    etag, content = await pdf_cache.get_or_render(db, invoice)
     
-    return StreamingResponse(
-        pdf_buffer,
+    return Response(
+        content,
         media_type="application/pdf",
-        headers={"Content-Disposition": f"attachment; filename=factura_{invoice.id}.pdf"}
+        headers={
+            "ETag": etag,
+            "Cache-Control": "private, max-age=86400",
+            "Content-Disposition": f"attachment; filename=factura_{invoice.id}.pdf"
+        }
     )
     
 @app.post("/invoices/{invoice_id}/void", response_model=schemas.InvoiceResponse)
@@ -199,15 +301,7 @@ async def void_invoice(
     el inventario y la contabilidad.
     """
     try: 
-        invoice = await crud.set_invoice_void(db, invoice_id, user.tenant_id)
-        
-        event_data = {
-            "invoice_id": invoice.id,
-            "tenant_id": user.tenant_id,
-            "items": [{"product_id": i.product_id, "quantity": i.quantity} for i in invoice.items]
-        }
-        publish_event("invoice.voided", event_data)
-        return invoice
+        return await crud.set_invoice_void(db, invoice_id, user.tenant_id)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -226,17 +320,6 @@ async def create_payment(
     """
     try:
         new_payment, invoice, is_fully_paid = await crud.create_payment(db, payment, tenant_id=user.tenant_id)
-        
-        if is_fully_paid:
-            event_data = {
-                "invoice_id": invoice.id,
-                "tenant_id": user.tenant_id,
-                "total_amount": float(invoice.total_usd),
-                "paid_at": str(new_payment.created_at),
-                "items": [{"product_id": item.product_id, "quantity": item.quantity} for item in invoice.items]
-            }
-            publish_event("invoice.paid", event_data)
-        
         return new_payment
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -285,6 +368,8 @@ async def list_quotes(
     limit: int = 20,
     search: Optional[str] = None,
     status: Optional[str] = None,
+    cursor: Optional[str] = None,
+    count: Literal["exact", "estimate"] = "exact",
     db: AsyncSession = Depends(database.get_db),
     user: UserPayload = Depends(RequirePermission(Permissions.QUOTE_READ))
 ):
@@ -292,8 +377,12 @@ async def list_quotes(
     **Listar Cotizaciones**
     
     Muestra el historial de presupuestos emitidos.
+    Admite paginación por `cursor` (ver `meta.next_cursor`).
     """
-    return await crud.get_quotes(db, tenant_id=user.tenant_id, page=page, limit=limit, search=search, status=status)
+    return await crud.get_quotes(
+        db, tenant_id=user.tenant_id, page=page, limit=limit, search=search, status=status,
+        cursor=cursor, count_mode=count
+    )
 
 @app.post("/quotes/{quote_id}/convert", response_model=schemas.InvoiceResponse)
 async def convert_quote(
@@ -326,12 +415,19 @@ async def read_settings(
     """
     return await crud.get_finance_settings(db, user.tenant_id)
 
+@app.get("/metrics/cache")
+async def read_cache_metrics(
+    user: UserPayload = Depends(RequirePermission(Permissions.REPORTS_VIEW))
+):
+    """Métricas de aciertos/fallos de las cachés en memoria de esta réplica."""
+    return {
+        "finance_settings": settings_cache.stats()
+    }
+
 @app.get("/exchange-rate")
 async def get_current_rate(db: AsyncSession = Depends(database.get_db)):
     """Obtiene la última tasa de cambio registrada en el sistema."""
-    query = select(models.ExchangeRate).order_by(models.ExchangeRate.acquired_at.desc()).limit(1)
-    result = await db.execute(query)
-    rate = result.scalars().first()
+    rate = await crud.get_latest_rate(db)
     
     if not rate:
         return {"status": "No data", "message": "Aún no hay tasas registradas."}
@@ -370,6 +466,94 @@ async def read_sales_over_time(
     """Gráfico comparativo de ventas Año Actual vs Año Anterior."""
     return await crud.get_sales_compatison(db, user.tenant_id)
 
+@app.get("/exports/{dataset}")
+async def export_dataset(
+    dataset: Literal["invoices", "payments"],
+    start_date: date,
+    end_date: date,
+    format: Literal["csv", "xlsx"] = "csv",
+    status: Optional[str] = None,
+    user: UserPayload = Depends(RequirePermission(Permissions.REPORTS_VIEW))
+):
+    """
+    **Exportar Facturas / Pagos**
+    
+    Descarga todas las facturas (o pagos) del periodo en CSV o XLSX, p. ej. para armar
+    el Libro de Ventas del SENIAT. Las filas se leen con un cursor del servidor y se
+    escriben a medida que llegan: la memoria no depende del tamaño del periodo.
+    """
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="La fecha final no puede ser anterior a la inicial.")
+    
+    sheet_name, columns = export.DATASETS[dataset]
+    headers = [header for header, _ in columns]
+    query = export.build_export_query(dataset, user.tenant_id, start_date, end_date, status)
+    filename = f"{dataset}_{start_date}_{end_date}.{format}"
+    
+    if format == "xlsx":
+        content = export.stream_xlsx(AsyncSessionLocal, query, headers, sheet_name)
+        media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    else:
+        content = export.stream_csv(AsyncSessionLocal, query, headers)
+        media_type = "text/csv; charset=utf-8"
+    
+    return StreamingResponse(
+        content,
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+@app.get("/reports/sales-book/{year}/{month}", response_model=schemas.SalesBookSnapshotResponse)
+async def read_sales_book(
+    year: int,
+    month: int,
+    db: AsyncSession = Depends(database.get_db),
+    user: UserPayload = Depends(RequirePermission(Permissions.REPORTS_VIEW))
+):
+    """
+    **Libro de Ventas (Resumen)**
+    
+    Retorna el Libro de Ventas congelado del mes. La primera consulta de un mes cerrado
+    lo genera; las siguientes leen el snapshot sin recorrer las facturas.
+    """
+    try:
+        return await sales_book.get_or_create_sales_book(db, user.tenant_id, year, month)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/reports/sales-book/{year}/{month}/download")
+async def download_sales_book(
+    year: int,
+    month: int,
+    format: Literal["csv", "pdf"] = "csv",
+    db: AsyncSession = Depends(database.get_db),
+    user: UserPayload = Depends(RequirePermission(Permissions.REPORTS_VIEW))
+):
+    """
+    **Descargar Libro de Ventas**
+    
+    Descarga el detalle del snapshot en CSV o PDF, leído por cursor y enviado en streaming.
+    """
+    try:
+        snapshot = await sales_book.get_or_create_sales_book(db, user.tenant_id, year, month)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    filename = f"libro_ventas_{snapshot.period:%Y_%m}.{format}"
+    if format == "pdf":
+        content = sales_book.stream_sales_book_pdf(AsyncSessionLocal, snapshot)
+        media_type = "application/pdf"
+    else:
+        headers = [header for header, _ in sales_book.SALES_BOOK_COLUMNS]
+        content = export.stream_csv(AsyncSessionLocal, sales_book.sales_book_lines_query(snapshot.id), headers)
+        media_type = "text/csv; charset=utf-8"
+    
+    return StreamingResponse(
+        content,
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
 @app.get("/reports/sales-total", response_model=SalesTotalResponse)
 async def get_sales_total_for_payroll(
     employee_id: int,
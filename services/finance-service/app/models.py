@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Numeric, Boolean, DateTime, ForeignKey, Text, Date
+from sqlalchemy import Column, Integer, String, Numeric, Boolean, DateTime, ForeignKey, Text, Date, Index, UniqueConstraint, LargeBinary, and_
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
@@ -16,6 +16,32 @@ class FinanceSettings(Base):
     default_currency = Column(String, default="USD")
     tax_rate = Column(Numeric(5, 2), default=16.00) # IVA por defecto
     
+class DocumentSequence(Base):
+    """
+    Contador correlativo por empresa y tipo de documento (INVOICE, QUOTE).
+    Se incrementa con un único UPSERT que bloquea solo la fila del tenant,
+    así la numeración es O(1) y sin huecos (un rollback deshace el incremento).
+    """
+    __tablename__ = "document_sequences"
+    
+    tenant_id = Column(Integer, primary_key=True)
+    doc_type = Column(String(20), primary_key=True)
+    last_value = Column(Integer, nullable=False, default=0)
+    
+class DailySalesRollup(Base):
+    """
+    Resumen diario de ventas por empresa, mantenido incrementalmente al crear,
+    cobrar o anular facturas. Alimenta el dashboard y la comparativa interanual
+    sin recorrer la tabla de facturas.
+    """
+    __tablename__ = "daily_sales_rollups"
+    
+    tenant_id = Column(Integer, primary_key=True)
+    day = Column(Date, primary_key=True)                            # Fecha (UTC) de emisión de las facturas
+    sales_usd = Column(Numeric(14, 2), nullable=False, default=0)   # Total de facturas no anuladas
+    invoice_count = Column(Integer, nullable=False, default=0)      # Facturas emitidas (incluye anuladas)
+    pending_usd = Column(Numeric(14, 2), nullable=False, default=0) # Total de facturas ISSUED / PARTIALLY_PAID
+    
 class CashClose(Base):
     """
     Representa el Cierre de Caja diario o por turno.
@@ -74,7 +100,7 @@ class Invoice(Base):
     __tablename__ = "invoices"
     
     id = Column(Integer, primary_key=True, index=True)              # ID interno Global
-    tenant_id = Column(Integer, index=True, nullable=False)         # Empresa que creo la Factura
+    tenant_id = Column(Integer, nullable=False)         # Empresa que creo la Factura
     salesperson_id = Column(Integer, nullable=True, index=True)     # ID de empleado quien hizo la venta
     created_by_user_id = Column(Integer, nullable=False)            # El usuario que registró la factura
     
@@ -120,6 +146,16 @@ class Invoice(Base):
     items = relationship("InvoiceItem", back_populates="invoice")
     payments = relationship("Payment", back_populates="invoice")
     
+    __table_args__ = (
+        UniqueConstraint("tenant_id", "invoice_number", name="uq_invoices_tenant_invoice_number"),
+        # Listados por empresa (y por estado) ordenados por fecha
+        Index("ix_invoices_tenant_created_at", "tenant_id", "created_at", "id"),
+        Index("ix_invoices_tenant_status_created_at", "tenant_id", "status", "created_at"),
+        # Cierre de caja: facturas por cierre y facturas aún sin cerrar
+        Index("ix_invoices_tenant_cash_close", "tenant_id", "cash_close_id"),
+        Index("ix_invoices_tenant_open", "tenant_id", "created_by_user_id", postgresql_where=cash_close_id.is_(None)),
+    )
+    
 class InvoiceItem(Base):
     """Detalle de productos o servicios dentro de una factura."""
     __tablename__ = "invoice_items"
@@ -140,7 +176,7 @@ class Payment(Base):
     __tablename__ = "payments"
     
     id = Column(Integer, primary_key=True, index=True)
-    invoice_id = Column(Integer, ForeignKey("invoices.id"), nullable=False)
+    invoice_id = Column(Integer, ForeignKey("invoices.id"), nullable=False, index=True)
     
     amount = Column(Numeric(10, 2), nullable=False) # Monto pagado
     currency = Column(String(3), default="USD")     # Moneda del pago
@@ -207,6 +243,10 @@ class Quote(Base):
     # Relaciones
     items = relationship("QuoteItem", back_populates="quote", cascade="all, delete-orphan")
     
+    __table_args__ = (
+        UniqueConstraint("tenant_id", "quote_number", name="uq_quotes_tenant_quote_number"),
+    )
+    
 class QuoteItem(Base):
     """Items de una cotización."""
     __tablename__ = "quote_items"
@@ -222,4 +262,98 @@ class QuoteItem(Base):
     unit_price = Column(Numeric(12, 2))
     total_price = Column(Numeric(12, 2))
     
-    quote = relationship("Quote", back_populates="items")
\ No newline at end of file
+    quote = relationship("Quote", back_populates="items")
+    
+class OutboxEvent(Base):
+    """
+    Outbox transaccional de eventos de dominio.
+    Se escribe en la misma transacción que la factura/pago/cierre y un relay en
+    segundo plano lo publica en RabbitMQ (entrega al-menos-una-vez).
+    """
+    __tablename__ = "outbox_events"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    event_id = Column(String(32), nullable=True, unique=True)       # Se publica como message_id (deduplicación)
+    routing_key = Column(String, nullable=False)                    # Ej: invoice.paid
+    payload = Column(Text, nullable=False)                          # JSON ya serializado
+    attempts = Column(Integer, default=0, nullable=False)           # Intentos fallidos de publicación
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    published_at = Column(DateTime(timezone=True), nullable=True)   # NULL = pendiente
+    dead_at = Column(DateTime(timezone=True), nullable=True)        # Agotó los intentos: ya no se reintenta
+    
+    __table_args__ = (
+        # Índice parcial: el relay solo recorre los pendientes
+        Index("ix_outbox_events_pending", "id", postgresql_where=and_(published_at.is_(None), dead_at.is_(None))),
+        Index("ix_outbox_events_published_at", "published_at", postgresql_where=published_at.isnot(None)),
+    )
+    
+class SalesBookSnapshot(Base):
+    """
+    Libro de Ventas de un mes, congelado al generarse (inmutable).
+    Guarda los totales del periodo; el detalle vive en `SalesBookLine`.
+    """
+    __tablename__ = "sales_book_snapshots"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    tenant_id = Column(Integer, nullable=False)
+    period = Column(Date, nullable=False)                           # Primer día del mes
+    generated_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    # Snapshot de la empresa (tomado de las facturas del periodo)
+    company_name = Column(String, nullable=True)
+    company_rif = Column(String, nullable=True)
+    
+    invoice_count = Column(Integer, nullable=False, default=0)
+    total_base_ves = Column(Numeric(16, 2), nullable=False, default=0)
+    total_tax_ves = Column(Numeric(16, 2), nullable=False, default=0)
+    total_ves = Column(Numeric(16, 2), nullable=False, default=0)
+    total_usd = Column(Numeric(14, 2), nullable=False, default=0)
+    
+    lines = relationship("SalesBookLine", back_populates="snapshot", order_by="SalesBookLine.line_number")
+    
+    __table_args__ = (
+        UniqueConstraint("tenant_id", "period", name="uq_sales_book_tenant_period"),
+    )
+    
+class SalesBookLine(Base):
+    """Renglón del Libro de Ventas (una factura, anuladas incluidas en cero)."""
+    __tablename__ = "sales_book_lines"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    snapshot_id = Column(Integer, ForeignKey("sales_book_snapshots.id"), nullable=False)
+    line_number = Column(Integer, nullable=False)                   # Nº de operación dentro del libro
+    
+    invoice_date = Column(Date, nullable=False)
+    invoice_number = Column(Integer, nullable=False)
+    control_number = Column(String, nullable=True)
+    customer_name = Column(String)
+    customer_rif = Column(String)
+    status = Column(String, nullable=False)
+    
+    exchange_rate = Column(Numeric(12, 4))
+    base_ves = Column(Numeric(16, 2), nullable=False, default=0)    # Base imponible
+    tax_ves = Column(Numeric(16, 2), nullable=False, default=0)     # IVA
+    total_ves = Column(Numeric(16, 2), nullable=False, default=0)   # Total con IVA
+    total_usd = Column(Numeric(14, 2), nullable=False, default=0)
+    paid_usd = Column(Numeric(14, 2), nullable=False, default=0)    # Cobrado al cierre del periodo
+    
+    snapshot = relationship("SalesBookSnapshot", back_populates="lines")
+    
+    __table_args__ = (
+        Index("ix_sales_book_lines_snapshot_line", "snapshot_id", "line_number"),
+    )
+    
+class InvoicePdf(Base):
+    """
+    Caché del ticket PDF renderizado de una factura.
+    La clave incluye la versión de plantilla: al cambiar el diseño se regeneran solos.
+    """
+    __tablename__ = "invoice_pdfs"
+    
+    invoice_id = Column(Integer, ForeignKey("invoices.id"), primary_key=True)
+    template_version = Column(String(20), primary_key=True)
+    tenant_id = Column(Integer, nullable=False)
+    etag = Column(String(64), nullable=False)                       # SHA-256 del contenido
+    content = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
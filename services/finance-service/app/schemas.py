@@ -1,7 +1,7 @@
 from pydantic import BaseModel, ConfigDict, Field, computed_field
 from decimal import Decimal
 from datetime import datetime, date
-from typing import List, Optional, Generic, TypeVar
+from typing import List, Literal, Optional, Generic, TypeVar
 
 T = TypeVar("T")
 
@@ -11,6 +11,8 @@ class MetaData(BaseModel):
     page: int
     limit: int
     total_pages: int
+    next_cursor: Optional[str] = None     # Token para continuar con paginación keyset
+    estimated: bool = False               # True si `total` es una estimación del planificador
     
 class PaginatedResponse(BaseModel, Generic[T]):
     data: List[T]
@@ -69,6 +71,41 @@ class InvoiceCreate(BaseModel):
     items: List[InvoiceItemCreate] = Field(..., min_items=1, description="Lista de productos a facturar")
     payment: Optional[InvoicePaymentCreate] = Field(None, description="Datos del pago inicial (si existe)")
 
+class InvoiceBatchCreate(BaseModel):
+    invoices: List[InvoiceCreate] = Field(..., min_length=1, max_length=500, description="Facturas a emitir en un solo lote")
+
+class InvoiceBatchCreated(BaseModel):
+    index: int                      # Posición en el lote recibido
+    id: int
+    invoice_number: int
+    control_number: Optional[str] = None
+    status: str
+    total_usd: Decimal
+
+class InvoiceBatchError(BaseModel):
+    index: int
+    error: str
+
+class InvoiceBatchResponse(BaseModel):
+    created: List[InvoiceBatchCreated]
+    errors: List[InvoiceBatchError]
+
+class InvoicePdfBatchRequest(BaseModel):
+    start_date: date
+    end_date: date
+    status: Optional[str] = None
+    format: Literal["zip", "pdf"] = "zip"   # ZIP con un ticket por factura o un único PDF
+
+class InvoicePdfBatchJob(BaseModel):
+    job_id: str
+    status: str
+    format: str
+    filename: str
+    total: int
+    done: int
+    progress: float
+    error: Optional[str] = None
+
 class PaymentCreate(BaseModel):
     invoice_id: int
     currency: str
@@ -276,4 +313,50 @@ class SalesTotalResponse(BaseModel):
     employee_id: int
     total_sales_usd: Decimal
     period_start: date
-    period_end: date
\ No newline at end of file
+    period_end: date
+
+class SalesBookSnapshotResponse(BaseModel):
+    """Resumen del Libro de Ventas congelado de un mes."""
+    id: int
+    period: date
+    generated_at: datetime
+    company_name: Optional[str] = None
+    company_rif: Optional[str] = None
+    invoice_count: int
+    total_base_ves: Decimal
+    total_tax_ves: Decimal
+    total_ves: Decimal
+    total_usd: Decimal
+    
+    model_config = ConfigDict(from_attributes=True)
+
+# --- EVENTOS DE DOMINIO ---
+# Contrato del evento `invoice.created` (campo `data` del sobre). Cambios
+# incompatibles suben `INVOICE_CREATED_VERSION` para que los consumidores lo detecten.
+INVOICE_CREATED_VERSION = 1
+
+class InvoiceEventItem(BaseModel):
+    product_id: int
+    product_name: str
+    quantity: Decimal
+    unit_price: Decimal
+    total_price: Decimal
+    model_config = ConfigDict(from_attributes=True)
+
+class InvoiceCreatedEvent(BaseModel):
+    id: int
+    tenant_id: int
+    invoice_number: int
+    control_number: Optional[str] = None
+    status: str
+    currency: str
+    exchange_rate: Optional[Decimal] = None
+    subtotal_usd: Decimal
+    tax_amount_usd: Decimal
+    total_usd: Decimal
+    amount_ves: Optional[Decimal] = None
+    customer_name: Optional[str] = None
+    customer_rif: Optional[str] = None
+    created_at: datetime
+    items: List[InvoiceEventItem]
+    model_config = ConfigDict(from_attributes=True)
@@ -1,8 +1,16 @@
-import requests
+import asyncio
+import json
+import os
+import httpx
 import logging
+from abc import ABC, abstractmethod
 from decimal import Decimal
-from sqlalchemy.orm import Session
+from datetime import datetime, timezone
+from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
 from .. import models
+from ..events import enqueue_event, outbox_relay
+from .rate_cache import rate_cache, CachedRate, RATE_UPDATED_EVENT
 
 logger = logging.getLogger(__name__)
 
@@ -10,41 +18,144 @@ logger = logging.getLogger(__name__)
 API_URL = "https://api.dolarvzla.com/public/exchange-rate"
 CAMPO_NAME = "current" # Nombre del campo que especifica la Tasa BCV en la API
 
-def fetch_and_store_rate(db: Session):
+# --- FUENTES DE TASA ---
+class RateSource(ABC):
     """
-    Consulta la API externa para obtener la tasa BCV/Paralela y la guarda.
-    
-    Esta función se ejecuta en un Hilo (Thread) separado por APScheduler,
-    por lo que usa una `Session` síncrona de SQLAlchemy.
+    Clase base abstracta. Define qué debe saber hacer CUALQUIER fuente de tasa cambiaria.
+    """
+    name: str = "BASE"
+
+    @abstractmethod
+    async def fetch_rate(self) -> Optional[Decimal]:
+        """Devuelve la tasa USD/VES vigente o None si la fuente no la trae."""
+        pass
+
+class DolarVzlaRateSource(RateSource):
+    """Tasa BCV publicada por la API pública de DolarVzla."""
+    name = "API_EXTERNA"
+
+    def __init__(self, url: str = API_URL, timeout: float = 10.0):
+        self.url = url
+        self.timeout = timeout
+
+    async def fetch_rate(self) -> Optional[Decimal]:
+        async with httpx.AsyncClient(timeout=self.timeout) as client:
+            response = await client.get(self.url)
+            response.raise_for_status() # Lanza error si es 404 o 500
+
+        rate_value = (response.json().get(CAMPO_NAME) or {}).get('usd')
+        return Decimal(str(rate_value)) if rate_value else None
+
+class FileRateSource(RateSource):
+    """
+    Lee la tasa de un archivo JSON local (desarrollo, pruebas o contingencia).
+    Acepta el mismo formato de la API (`{"current": {"usd": 36.5}}`) o `{"usd": 36.5}`.
+    """
+    name = "ARCHIVO"
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def _read(self) -> Optional[Decimal]:
+        with open(self.path, encoding="utf-8") as f:
+            data = json.load(f)
+        rate_value = (data.get(CAMPO_NAME) or data).get('usd')
+        return Decimal(str(rate_value)) if rate_value else None
+
+    async def fetch_rate(self) -> Optional[Decimal]:
+        return await asyncio.to_thread(self._read)
+
+def get_rate_source() -> RateSource:
+    """Selecciona la fuente según `EXCHANGE_RATE_SOURCE` (api | file)."""
+    source = os.getenv("EXCHANGE_RATE_SOURCE", "api").lower()
+    if source == "file":
+        return FileRateSource(os.getenv("EXCHANGE_RATE_FILE", "rates.json"))
+    return DolarVzlaRateSource()
+
+# --- ACTUALIZACIÓN ---
+async def fetch_and_store_rate(db: AsyncSession, source: RateSource) -> Optional[CachedRate]:
+    """
+    Consulta la fuente de tasa cambiaria y guarda el valor obtenido.
+
+    Corre en el mismo event loop y motor async de la app. Además de guardar
+    la tasa, registra el evento de actualización en el outbox y refresca la
+    caché local.
 
     Args:
-        db (Session): Sesión síncrona de base de datos.
+        db (AsyncSession): Sesión asíncrona de base de datos.
+        source (RateSource): Fuente de la tasa.
     """
     logger.info("🔄 Iniciando actualización de tasa cambiaria...")
-    
+
     try:
-        response = requests.get(API_URL, timeout=10)
-        response.raise_for_status() # Lanza error si es 404 o 500
-        
-        data = response.json()
-        
-        rate_value = data.get(CAMPO_NAME, None).get('usd')
-        
+        rate_value = await source.fetch_rate()
+
         if rate_value:
             # Guardar en DB
             new_rate = models.ExchangeRate(
                 currency_from="USD",
                 currency_to="VES",
-                rate=Decimal(rate_value),
-                source="API_EXTERNA"
+                rate=rate_value,
+                source=source.name,
+                acquired_at=datetime.now(timezone.utc)
             )
             db.add(new_rate)
-            db.commit()
+
+            # Avisar a las demás réplicas (Outbox, misma transacción)
+            cached = CachedRate.from_model(new_rate)
+            enqueue_event(db, RATE_UPDATED_EVENT, cached.to_event())
+            await db.commit()
+            outbox_relay.notify()
+
+            # Caché local: la tasa nueva rige de inmediato en esta réplica
             logger.info(f"✅ Tasa actualizada exitosamente: {rate_value}")
+            return rate_cache.set(cached)
         else:
             logger.warning("⚠️ No se pudo encontrar la tasa en la respuesta JSON.")
-    except requests.RequestException as e:
+    except (httpx.HTTPError, OSError) as e:
         # Si falla internet, NO detenemos la app. Solo logueamos el error.
+        await db.rollback()
         logger.error(f"❌ Error de conexión al obtener tasa: {e}")
     except Exception as e:
-        logger.error(f"❌ Error inesperado actualizando tasa: {e}")
\ No newline at end of file
+        await db.rollback()
+        logger.error(f"❌ Error inesperado actualizando tasa: {e}")
+    return None
+
+class ExchangeRateJob:
+    """
+    Tarea asyncio que actualiza la tasa al arrancar y luego cada `interval_hours`.
+    Reemplaza al BackgroundScheduler: sin hilos ni motor síncrono adicional.
+    """
+
+    def __init__(self, session_factory, source: RateSource, interval_hours: float = 6):
+        self.session_factory = session_factory
+        self.source = source
+        self.interval = interval_hours * 3600
+        self._task: Optional[asyncio.Task] = None
+
+    async def run_once(self) -> Optional[CachedRate]:
+        async with self.session_factory() as db:
+            return await fetch_and_store_rate(db, self.source)
+
+    async def _run(self):
+        while True:
+            logger.info("⏰ [SCHEDULER] Iniciando tarea de tasa cambiaria...")
+            try:
+                await self.run_once()
+            except Exception as e:
+                # Un fallo (p. ej. DB caída) no debe terminar el ciclo de refresco
+                logger.error(f"❌ [SCHEDULER] Error en la tarea de tasa cambiaria: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
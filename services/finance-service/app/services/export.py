@@ -0,0 +1,176 @@
+import asyncio
+import csv
+import io
+import os
+import tempfile
+from datetime import date, datetime, time, timezone
+from decimal import Decimal
+from typing import AsyncIterator, List, Optional, Sequence, Tuple
+
+import xlsxwriter
+from sqlalchemy.future import select
+
+from .. import models
+
+# Filas por lote leídas del cursor del servidor
+EXPORT_BATCH_SIZE = 1000
+# Tamaño de los bloques de archivo (XLSX/PDF) enviados al cliente
+FILE_CHUNK_SIZE = 64 * 1024
+# Límites del formato XLSX: filas por hoja (encabezado incluido) y largo del nombre de hoja
+XLSX_MAX_ROWS = 1_048_576
+XLSX_MAX_SHEET_NAME = 31
+
+INVOICE_COLUMNS: List[Tuple[str, object]] = [
+    ("Fecha", models.Invoice.created_at),
+    ("Factura", models.Invoice.invoice_number),
+    ("Control", models.Invoice.control_number),
+    ("Estado", models.Invoice.status),
+    ("Cliente", models.Invoice.customer_name),
+    ("RIF Cliente", models.Invoice.customer_rif),
+    ("Moneda", models.Invoice.currency),
+    ("Tasa", models.Invoice.exchange_rate),
+    ("Base USD", models.Invoice.subtotal_usd),
+    ("IVA USD", models.Invoice.tax_amount_usd),
+    ("Total USD", models.Invoice.total_usd),
+    ("Total VES", models.Invoice.amount_ves),
+]
+
+PAYMENT_COLUMNS: List[Tuple[str, object]] = [
+    ("Fecha", models.Payment.created_at),
+    ("Factura", models.Invoice.invoice_number),
+    ("Cliente", models.Invoice.customer_name),
+    ("RIF Cliente", models.Invoice.customer_rif),
+    ("Método", models.Payment.payment_method),
+    ("Referencia", models.Payment.reference),
+    ("Moneda", models.Payment.currency),
+    ("Tasa", models.Payment.exchange_rate),
+    ("Monto", models.Payment.amount),
+]
+
+DATASETS = {
+    "invoices": ("Facturas", INVOICE_COLUMNS),
+    "payments": ("Pagos", PAYMENT_COLUMNS),
+}
+
+
+def _period_bounds(start_date: date, end_date: date) -> Tuple[datetime, datetime]:
+    return datetime.combine(start_date, time.min), datetime.combine(end_date, time.max)
+
+
+def build_export_query(dataset: str, tenant_id: int, start_date: date, end_date: date, status: Optional[str] = None):
+    """Consulta de columnas planas (sin ORM) para el dataset pedido, ordenada cronológicamente."""
+    _, columns = DATASETS[dataset]
+    start_dt, end_dt = _period_bounds(start_date, end_date)
+    query = select(*[column for _, column in columns])
+
+    if dataset == "invoices":
+        query = query.filter(
+            models.Invoice.tenant_id == tenant_id,
+            models.Invoice.created_at >= start_dt,
+            models.Invoice.created_at <= end_dt
+        )
+        if status:
+            query = query.filter(models.Invoice.status == status)
+        return query.order_by(models.Invoice.created_at, models.Invoice.id)
+
+    query = (
+        query.join(models.Invoice, models.Payment.invoice_id == models.Invoice.id)
+        .filter(
+            models.Invoice.tenant_id == tenant_id,
+            models.Payment.created_at >= start_dt,
+            models.Payment.created_at <= end_dt
+        )
+    )
+    return query.order_by(models.Payment.created_at, models.Payment.id)
+
+
+def _cell(value):
+    """Normaliza un valor para CSV/XLSX (fechas ISO sin zona, decimales como número)."""
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+async def iter_row_batches(session_factory, query, batch_size: int = EXPORT_BATCH_SIZE) -> AsyncIterator[Sequence]:
+    """
+    Recorre la consulta con un cursor del servidor (`stream_results` + `yield_per`):
+    en memoria solo vive un lote de filas a la vez.
+
+    Abre su propia sesión porque el `StreamingResponse` se consume después de
+    que FastAPI cierra las dependencias del request.
+    """
+    async with session_factory() as db:
+        result = await db.stream(query.execution_options(yield_per=batch_size))
+        async for partition in result.partitions():
+            yield partition
+
+
+async def stream_csv(session_factory, query, headers: Sequence[str]) -> AsyncIterator[bytes]:
+    """CSV en UTF-8 con BOM (Excel lo abre con acentos) escrito lote a lote."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(headers)
+    yield ("\ufeff" + buffer.getvalue()).encode("utf-8")
+
+    async for rows in iter_row_batches(session_factory, query):
+        buffer.seek(0)
+        buffer.truncate(0)
+        writer.writerows([[_cell(v) for v in row] for row in rows])
+        yield buffer.getvalue().encode("utf-8")
+
+
+async def stream_xlsx(session_factory, query, headers: Sequence[str], sheet_name: str) -> AsyncIterator[bytes]:
+    """
+    XLSX con `xlsxwriter` en modo `constant_memory`: cada fila se vuelca a disco
+    al escribirse, así la memoria no crece con el número de filas. El formato
+    ZIP solo se puede cerrar al final, por lo que el archivo se arma en un
+    temporal y luego se envía por bloques.
+
+    Una hoja admite `XLSX_MAX_ROWS` filas: al llenarse se continúa en otra
+    ("Ventas (2)", "Ventas (3)"...) con el mismo encabezado.
+    """
+    fd, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    try:
+        workbook = xlsxwriter.Workbook(path, {"constant_memory": True, "tmpdir": tempfile.gettempdir()})
+        bold = workbook.add_format({"bold": True})
+        sheets = 0
+
+        def new_sheet():
+            nonlocal sheets
+            sheets += 1
+            suffix = f" ({sheets})" if sheets > 1 else ""
+            sheet = workbook.add_worksheet(f"{sheet_name[:XLSX_MAX_SHEET_NAME - len(suffix)]}{suffix}")
+            sheet.write_row(0, 0, headers, bold)
+            return sheet
+
+        sheet = new_sheet()
+        row_index = 1
+        async for rows in iter_row_batches(session_factory, query):
+            for row in rows:
+                if row_index == XLSX_MAX_ROWS:
+                    sheet = new_sheet()
+                    row_index = 1
+                sheet.write_row(row_index, 0, [_cell(v) for v in row])
+                row_index += 1
+
+        await asyncio.to_thread(workbook.close)
+
+        async for chunk in iter_file_chunks(path):
+            yield chunk
+    finally:
+        os.remove(path)
+
+
+async def iter_file_chunks(path: str, chunk_size: int = FILE_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """Lee un archivo por bloques sin bloquear el event loop."""
+    with open(path, "rb") as f:
+        while True:
+            chunk = await asyncio.to_thread(f.read, chunk_size)
+            if not chunk:
+                break
+            yield chunk
@@ -0,0 +1,219 @@
+import asyncio
+import io
+import logging
+import os
+import tempfile
+import time
+import uuid
+import zipfile
+from dataclasses import dataclass, field
+from datetime import date, datetime, time as dt_time
+from typing import Dict, List, Optional
+
+from pypdf import PdfWriter
+from sqlalchemy import func
+from sqlalchemy.future import select
+from sqlalchemy.orm import selectinload
+
+from .. import models
+from ..database import AsyncSessionLocal
+from .export import iter_row_batches
+from .pdf_cache import InvoicePdfCache, pdf_cache
+
+logger = logging.getLogger("finance-service")
+
+# Facturas por lote del pipeline (lectura -> render -> escritura)
+BATCH_SIZE = 100
+# El PDF concatenado se arma en memoria al cerrarlo; el ZIP se escribe entrada por entrada
+MAX_INVOICES = {"zip": 20000, "pdf": 2000}
+
+
+@dataclass
+class BatchPdfJob:
+    id: str
+    tenant_id: int
+    format: str
+    filename: str
+    status: str = "PENDING"                     # PENDING | RUNNING | DONE | FAILED
+    total: int = 0
+    done: int = 0
+    error: Optional[str] = None
+    path: Optional[str] = field(default=None, repr=False)
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None             # Cuándo quedó DONE/FAILED (base del TTL)
+    task: Optional[asyncio.Task] = field(default=None, repr=False)
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "format": self.format,
+            "filename": self.filename,
+            "total": self.total,
+            "done": self.done,
+            "progress": round(self.done / self.total, 4) if self.total else (1.0 if self.status == "DONE" else 0.0),
+            "error": self.error
+        }
+
+
+class _ZipArchive:
+    def __init__(self, path: str):
+        self.zf = zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED)
+
+    def add(self, name: str, content: bytes):
+        self.zf.writestr(name, content)
+
+    def close(self):
+        self.zf.close()
+
+
+class _ConcatenatedPdf:
+    def __init__(self, path: str):
+        self.path = path
+        self.writer = PdfWriter()
+
+    def add(self, name: str, content: bytes):
+        self.writer.append(io.BytesIO(content))
+
+    def close(self):
+        with open(self.path, "wb") as f:
+            self.writer.write(f)
+        self.writer.close()
+
+
+class InvoicePdfBatchExporter:
+    """
+    Exporta los tickets de muchas facturas (p. ej. todo un mes para auditoría)
+    en un ZIP o en un único PDF concatenado.
+
+    Cada exportación es un job en segundo plano que recorre las facturas en
+    lotes: los ids se leen con un cursor del servidor, los tickets se toman de
+    `invoice_pdfs` o se renderizan en paralelo en el pool de procesos, y el lote
+    se escribe al archivo temporal mientras se prepara el siguiente. En memoria
+    solo viven dos lotes a la vez; el progreso (`done` / `total`) se consulta
+    por el id del job y el archivo se descarga por bloques al terminar.
+    """
+
+    def __init__(self, session_factory, cache: InvoicePdfCache, max_running: int = 2, max_pending: int = 10, ttl: int = 1800):
+        self.session_factory = session_factory
+        self.cache = cache
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self.jobs: Dict[str, BatchPdfJob] = {}
+        self._slots = asyncio.Semaphore(max_running)
+
+    @staticmethod
+    def build_query(tenant_id: int, start_date: date, end_date: date, status: Optional[str] = None):
+        query = select(models.Invoice.id).filter(
+            models.Invoice.tenant_id == tenant_id,
+            models.Invoice.created_at >= datetime.combine(start_date, dt_time.min),
+            models.Invoice.created_at <= datetime.combine(end_date, dt_time.max)
+        )
+        if status:
+            query = query.filter(models.Invoice.status == status)
+        return query
+
+    async def submit(self, tenant_id: int, start_date: date, end_date: date, status: Optional[str], format: str) -> BatchPdfJob:
+        """Cuenta las facturas del filtro y encola el job. Lanza ValueError si excede los límites."""
+        self._purge()
+        if sum(1 for job in self.jobs.values() if job.status in ("PENDING", "RUNNING")) >= self.max_pending:
+            raise ValueError("Hay demasiadas exportaciones en curso, intente más tarde.")
+
+        query = self.build_query(tenant_id, start_date, end_date, status)
+        async with self.session_factory() as db:
+            total = (await db.execute(select(func.count()).select_from(query.subquery()))).scalar()
+        if total > MAX_INVOICES[format]:
+            raise ValueError(f"El filtro incluye {total} facturas; el máximo para {format.upper()} es {MAX_INVOICES[format]}.")
+
+        job = BatchPdfJob(
+            id=uuid.uuid4().hex,
+            tenant_id=tenant_id,
+            format=format,
+            filename=f"facturas_{start_date}_{end_date}.{format}",
+            total=total
+        )
+        job.task = asyncio.create_task(self._run(job, query.order_by(models.Invoice.invoice_number, models.Invoice.id)))
+        self.jobs[job.id] = job
+        return job
+
+    def get(self, job_id: str, tenant_id: int) -> Optional[BatchPdfJob]:
+        self._purge()
+        job = self.jobs.get(job_id)
+        if job is None or job.tenant_id != tenant_id:
+            return None
+        return job
+
+    def close(self):
+        for job in list(self.jobs.values()):
+            if job.task and not job.task.done():
+                job.task.cancel()
+            self._remove_file(job)
+        self.jobs.clear()
+
+    async def _run(self, job: BatchPdfJob, id_query):
+        async with self._slots:
+            job.status = "RUNNING"
+            fd, job.path = tempfile.mkstemp(suffix=f".{job.format}")
+            os.close(fd)
+            archive = _ZipArchive(job.path) if job.format == "zip" else _ConcatenatedPdf(job.path)
+            pending_write: Optional[asyncio.Task] = None
+            try:
+                async with self.session_factory() as db:
+                    async for rows in iter_row_batches(self.session_factory, id_query, batch_size=BATCH_SIZE):
+                        invoices = await self._load_invoices(db, [row.id for row in rows])
+                        contents = await self.cache.get_or_render_many(db, invoices)
+                        # Libera el mapa de identidad: solo necesitamos los bytes del lote
+                        db.expunge_all()
+
+                        if pending_write is not None:
+                            await pending_write
+                        pending_write = asyncio.create_task(asyncio.to_thread(self._write_batch, job, archive, invoices, contents))
+                    if pending_write is not None:
+                        await pending_write
+
+                await asyncio.to_thread(archive.close)
+                job.finished_at = time.time()
+                job.status = "DONE"
+                logger.info(f"🗂️ Exportación de tickets {job.id} lista: {job.done} facturas ({job.format}).")
+            except asyncio.CancelledError:
+                self._remove_file(job)
+                raise
+            except Exception as e:
+                job.finished_at = time.time()
+                job.status = "FAILED"
+                job.error = str(e)
+                self._remove_file(job)
+                logger.error(f"❌ Error exportando tickets ({job.id}): {e}")
+
+    @staticmethod
+    async def _load_invoices(db, ids: List[int]) -> List[models.Invoice]:
+        result = await db.execute(
+            select(models.Invoice)
+            .options(selectinload(models.Invoice.items))
+            .filter(models.Invoice.id.in_(ids))
+        )
+        by_id = {inv.id: inv for inv in result.scalars().all()}
+        return [by_id[i] for i in ids if i in by_id]
+
+    @staticmethod
+    def _write_batch(job: BatchPdfJob, archive, invoices: List[models.Invoice], contents: Dict[int, bytes]):
+        for inv in invoices:
+            archive.add(f"factura_{inv.invoice_number or inv.id}.pdf", contents[inv.id])
+            job.done += 1
+
+    @staticmethod
+    def _remove_file(job: BatchPdfJob):
+        if job.path and os.path.exists(job.path):
+            os.remove(job.path)
+        job.path = None
+
+    def _purge(self):
+        """Elimina los jobs terminados (y sus archivos) `ttl` segundos después de terminar."""
+        limit = time.time() - self.ttl
+        for job_id, job in list(self.jobs.items()):
+            if job.finished_at is not None and job.finished_at < limit:
+                self._remove_file(job)
+                del self.jobs[job_id]
+
+
+invoice_pdf_batch = InvoicePdfBatchExporter(AsyncSessionLocal, pdf_cache)
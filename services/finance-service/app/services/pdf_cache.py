@@ -0,0 +1,150 @@
+import asyncio
+import hashlib
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm import selectinload
+
+from .. import models
+from ..database import AsyncSessionLocal
+from ..utils.pdf_generator import invoice_ticket_data, render_ticket_pdf
+
+logger = logging.getLogger("finance-service")
+
+# Subir esta versión al cambiar el diseño del ticket (FiscalTicketGenerator)
+TICKET_TEMPLATE_VERSION = "ticket-v1"
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Compara el header `If-None-Match` (lista, comodín o débil) contra el ETag."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+class InvoicePdfCache:
+    """
+    Caché de tickets PDF en la tabla `invoice_pdfs`, compartida por todas las réplicas.
+
+    El contenido del ticket solo depende de datos que no cambian tras emitir la
+    factura (números, cliente, items, totales), así que basta con renderizarlo
+    una vez por versión de plantilla. El render (ReportLab, CPU) corre en un
+    pool de procesos para no bloquear el event loop; el ETag es el SHA-256 del
+    contenido y se puede consultar sin leer el PDF.
+    """
+
+    def __init__(self, session_factory, template_version: str = TICKET_TEMPLATE_VERSION, max_workers: Optional[int] = None):
+        self.session_factory = session_factory
+        self.template_version = template_version
+        self.max_workers = max_workers or int(os.getenv("PDF_RENDER_WORKERS", "2"))
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def start(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def render(self, invoice: models.Invoice) -> bytes:
+        """Renderiza el ticket en el pool de procesos."""
+        self.start()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, render_ticket_pdf, invoice_ticket_data(invoice))
+
+    async def get_etag(self, db: AsyncSession, invoice_id: int, tenant_id: int) -> Optional[str]:
+        """ETag del ticket cacheado (sin cargar el contenido) o None si aún no existe."""
+        query = select(models.InvoicePdf.etag).filter(
+            models.InvoicePdf.invoice_id == invoice_id,
+            models.InvoicePdf.template_version == self.template_version,
+            models.InvoicePdf.tenant_id == tenant_id
+        )
+        etag = (await db.execute(query)).scalar()
+        return f'"{etag}"' if etag else None
+
+    async def get_or_render(self, db: AsyncSession, invoice: models.Invoice) -> Tuple[str, bytes]:
+        """Retorna (ETag, PDF) desde la caché; si falta lo renderiza y lo guarda."""
+        query = select(models.InvoicePdf.etag, models.InvoicePdf.content).filter(
+            models.InvoicePdf.invoice_id == invoice.id,
+            models.InvoicePdf.template_version == self.template_version
+        )
+        cached = (await db.execute(query)).first()
+        if cached:
+            return f'"{cached.etag}"', cached.content
+
+        content = await self.render(invoice)
+        etag = hashlib.sha256(content).hexdigest()
+
+        # Si otra réplica lo guardó primero, conservamos el suyo (mismo contenido)
+        await db.execute(
+            pg_insert(models.InvoicePdf)
+            .values(
+                invoice_id=invoice.id,
+                template_version=self.template_version,
+                tenant_id=invoice.tenant_id,
+                etag=etag,
+                content=content
+            )
+            .on_conflict_do_nothing(index_elements=["invoice_id", "template_version"])
+        )
+        await db.commit()
+        return f'"{etag}"', content
+
+    async def get_or_render_many(self, db: AsyncSession, invoices: List[models.Invoice]) -> Dict[int, bytes]:
+        """
+        Tickets de un lote de facturas: una consulta para los cacheados y los
+        faltantes se renderizan en paralelo en el pool y se guardan en un solo INSERT.
+        """
+        if not invoices:
+            return {}
+        query = select(models.InvoicePdf.invoice_id, models.InvoicePdf.content).filter(
+            models.InvoicePdf.invoice_id.in_([inv.id for inv in invoices]),
+            models.InvoicePdf.template_version == self.template_version
+        )
+        contents = {row.invoice_id: row.content for row in (await db.execute(query)).all()}
+
+        missing = [inv for inv in invoices if inv.id not in contents]
+        if missing:
+            rendered = await asyncio.gather(*[self.render(inv) for inv in missing])
+            await db.execute(
+                pg_insert(models.InvoicePdf)
+                .values([
+                    {
+                        "invoice_id": inv.id,
+                        "template_version": self.template_version,
+                        "tenant_id": inv.tenant_id,
+                        "etag": hashlib.sha256(content).hexdigest(),
+                        "content": content
+                    }
+                    for inv, content in zip(missing, rendered)
+                ])
+                .on_conflict_do_nothing(index_elements=["invoice_id", "template_version"])
+            )
+            await db.commit()
+            contents.update({inv.id: content for inv, content in zip(missing, rendered)})
+        return contents
+
+    async def prerender(self, invoice_id: int, tenant_id: int):
+        """Renderiza en segundo plano el ticket de una factura recién emitida."""
+        try:
+            async with self.session_factory() as db:
+                invoice = (await db.execute(
+                    select(models.Invoice)
+                    .options(selectinload(models.Invoice.items))
+                    .filter(models.Invoice.id == invoice_id, models.Invoice.tenant_id == tenant_id)
+                )).scalars().first()
+                if invoice is not None:
+                    await self.get_or_render(db, invoice)
+        except Exception as e:
+            logger.error(f"❌ Error pre-renderizando ticket de factura {invoice_id}: {e}")
+
+
+pdf_cache = InvoicePdfCache(AsyncSessionLocal)
@@ -0,0 +1,187 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Optional, Tuple
+
+import aio_pika
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from .. import models
+from ..events import RABBITMQ_URL, EXCHANGE_NAME
+
+logger = logging.getLogger("finance-service")
+
+# Evento que emite quien guarda una tasa nueva, para refrescar las demás réplicas
+RATE_UPDATED_EVENT = "finance.exchange_rate_updated"
+
+
+class CachedRate:
+    """Copia inmutable de una fila de `exchange_rates` (no depende de la sesión)."""
+
+    def __init__(self, currency_from: str, currency_to: str, rate: Decimal, source: str, acquired_at: Optional[datetime]):
+        self.currency_from = currency_from
+        self.currency_to = currency_to
+        self.rate = rate
+        self.source = source
+        self.acquired_at = acquired_at
+
+    @classmethod
+    def from_model(cls, obj: models.ExchangeRate) -> "CachedRate":
+        return cls(obj.currency_from, obj.currency_to, Decimal(obj.rate), obj.source, obj.acquired_at)
+
+    def to_event(self) -> dict:
+        return {
+            "currency_from": self.currency_from,
+            "currency_to": self.currency_to,
+            "rate": str(self.rate),
+            "source": self.source,
+            "acquired_at": self.acquired_at.isoformat() if self.acquired_at else None
+        }
+
+    @classmethod
+    def from_event(cls, data: dict) -> "CachedRate":
+        acquired_at = datetime.fromisoformat(data["acquired_at"]) if data.get("acquired_at") else None
+        return cls(data["currency_from"], data["currency_to"], Decimal(str(data["rate"])), data.get("source"), acquired_at)
+
+
+class ExchangeRateCache:
+    """
+    Caché en memoria de la última tasa por par de monedas.
+
+    La tasa solo cambia cuando el job de tasas guarda una nueva (cada 6 horas),
+    así que la facturación no necesita consultarla en cada request. Se llena al
+    arrancar, se actualiza cuando el job guarda una tasa y se sincroniza entre
+    réplicas con el evento `finance.exchange_rate_updated`.
+    
+    Cada par vive como máximo `max_age` segundos: si la réplica se pierde el
+    evento (broker caído, suscripción pendiente) vuelve a leer la DB.
+    """
+
+    def __init__(self, max_age: Optional[float] = None):
+        self.max_age = max_age if max_age is not None else float(os.getenv("RATE_CACHE_MAX_AGE", "600"))
+        self._rates: Dict[Tuple[str, str], CachedRate] = {}
+        self._loaded_at: Dict[Tuple[str, str], float] = {}
+
+    async def get(self, db: AsyncSession, currency_from: str = "USD", currency_to: str = "VES") -> Optional[CachedRate]:
+        """Retorna la tasa vigente; si no está en caché (o venció) la busca en DB."""
+        key = (currency_from, currency_to)
+        cached = self._rates.get(key)
+        if cached is not None and time.monotonic() - self._loaded_at.get(key, 0) < self.max_age:
+            return cached
+        # Si la DB no tiene tasa para el par se conserva la última conocida
+        return await self.load(db, currency_from, currency_to) or cached
+
+    async def load(self, db: AsyncSession, currency_from: str = "USD", currency_to: str = "VES") -> Optional[CachedRate]:
+        """Fuerza la lectura desde DB de la tasa más reciente del par."""
+        query = (
+            select(models.ExchangeRate)
+            .filter(
+                models.ExchangeRate.currency_from == currency_from,
+                models.ExchangeRate.currency_to == currency_to
+            )
+            .order_by(models.ExchangeRate.acquired_at.desc())
+            .limit(1)
+        )
+        obj = (await db.execute(query)).scalars().first()
+        if obj is None:
+            return None
+        return self.set(CachedRate.from_model(obj))
+
+    def set(self, rate: CachedRate) -> CachedRate:
+        """Actualiza el par si la tasa recibida es igual o más reciente que la cacheada."""
+        key = (rate.currency_from, rate.currency_to)
+        current = self._rates.get(key)
+        if current is None or current.acquired_at is None or rate.acquired_at is None or rate.acquired_at >= current.acquired_at:
+            self._rates[key] = rate
+        self._loaded_at[key] = time.monotonic()
+        return self._rates[key]
+
+    def invalidate(self, currency_from: Optional[str] = None, currency_to: Optional[str] = None):
+        """Descarta un par (o toda la caché si no se indica par)."""
+        if currency_from is None:
+            self._rates.clear()
+            self._loaded_at.clear()
+        else:
+            self._rates.pop((currency_from, currency_to), None)
+            self._loaded_at.pop((currency_from, currency_to), None)
+
+
+rate_cache = ExchangeRateCache()
+
+
+class RateListener:
+    """
+    Escucha `finance.exchange_rate_updated` en una cola exclusiva de esta réplica
+    y actualiza la caché local con la tasa recibida.
+
+    Usa su propia conexión robusta: si el broker no está disponible al arrancar
+    reintenta en segundo plano (con backoff) hasta suscribirse, y una vez
+    conectado aio-pika restaura canal, cola y consumidor tras cada reconexión.
+    """
+
+    def __init__(self, url: str, exchange_name: str = EXCHANGE_NAME, retry_interval: float = 5.0, max_retry_interval: float = 60.0):
+        self.url = url
+        self.exchange_name = exchange_name
+        self.retry_interval = retry_interval
+        self.max_retry_interval = max_retry_interval
+        self.connection: Optional[aio_pika.abc.AbstractRobustConnection] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.connection is not None:
+            await self.connection.close()
+            self.connection = None
+
+    async def _run(self):
+        delay = self.retry_interval
+        while True:
+            try:
+                await self._subscribe()
+                logger.info("💱 Suscrito a actualizaciones de tasa.")
+                return
+            except Exception as e:
+                logger.error(f"❌ No se pudo suscribir a actualizaciones de tasa (reintento en {delay:.0f}s): {e}")
+                if self.connection is not None:
+                    try:
+                        await self.connection.close()
+                    except Exception:
+                        pass
+                    self.connection = None
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_retry_interval)
+
+    async def _subscribe(self):
+        self.connection = await aio_pika.connect_robust(self.url)
+        channel = await self.connection.channel()
+        exchange = await channel.declare_exchange(self.exchange_name, aio_pika.ExchangeType.TOPIC, durable=True)
+        queue = await channel.declare_queue(exclusive=True, auto_delete=True)
+        await queue.bind(exchange, routing_key=RATE_UPDATED_EVENT)
+        await queue.consume(self._on_message)
+
+    @staticmethod
+    async def _on_message(message: aio_pika.abc.AbstractIncomingMessage):
+        async with message.process():
+            try:
+                rate = rate_cache.set(CachedRate.from_event(json.loads(message.body)))
+                logger.info(f"💱 Tasa actualizada en caché: {rate.currency_from}/{rate.currency_to} = {rate.rate}")
+            except Exception as e:
+                logger.error(f"❌ Evento de tasa inválido: {e}")
+
+
+rate_listener = RateListener(RABBITMQ_URL)
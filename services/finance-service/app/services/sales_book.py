@@ -0,0 +1,208 @@
+import asyncio
+import logging
+import os
+import tempfile
+from datetime import date, datetime, time, timezone
+from typing import AsyncIterator, List, Optional, Tuple
+
+from sqlalchemy import Integer, case, func, insert, literal
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from .. import models
+from ..utils.sales_book_pdf import SalesBookPdfWriter
+from .export import iter_file_chunks, iter_row_batches
+
+logger = logging.getLogger("finance-service")
+
+Invoice = models.Invoice
+Payment = models.Payment
+Line = models.SalesBookLine
+
+# Columnas del libro (encabezado, columna del renglón) para CSV / PDF
+SALES_BOOK_COLUMNS: List[Tuple[str, object]] = [
+    ("Nº Op.", Line.line_number),
+    ("Fecha", Line.invoice_date),
+    ("RIF", Line.customer_rif),
+    ("Nombre o Razón Social", Line.customer_name),
+    ("Nº Factura", Line.invoice_number),
+    ("Nº Control", Line.control_number),
+    ("Estado", Line.status),
+    ("Tasa", Line.exchange_rate),
+    ("Base Imponible Bs", Line.base_ves),
+    ("IVA Bs", Line.tax_ves),
+    ("Total Bs", Line.total_ves),
+    ("Total USD", Line.total_usd),
+    ("Cobrado USD", Line.paid_usd),
+]
+
+
+def month_bounds(year: int, month: int) -> Tuple[date, date]:
+    """Primer día del mes y primer día del mes siguiente."""
+    if not 1 <= month <= 12:
+        raise ValueError("Mes inválido.")
+    start = date(year, month, 1)
+    end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return start, end
+
+
+def sales_book_lines_query(snapshot_id: int):
+    """Renglones del libro en orden, como columnas planas (para exportar en streaming)."""
+    return (
+        select(*[column for _, column in SALES_BOOK_COLUMNS])
+        .filter(Line.snapshot_id == snapshot_id)
+        .order_by(Line.line_number)
+    )
+
+
+async def get_sales_book(db: AsyncSession, tenant_id: int, period: date) -> Optional[models.SalesBookSnapshot]:
+    query = select(models.SalesBookSnapshot).filter(
+        models.SalesBookSnapshot.tenant_id == tenant_id,
+        models.SalesBookSnapshot.period == period
+    )
+    return (await db.execute(query)).scalars().first()
+
+
+async def generate_sales_book(db: AsyncSession, tenant_id: int, year: int, month: int) -> models.SalesBookSnapshot:
+    """
+    Calcula y congela el Libro de Ventas del mes.
+
+    El detalle se arma con un único `INSERT ... SELECT` sobre facturas y pagos
+    (sin traer filas a Python) y los totales con un único agregado sobre los
+    renglones insertados. Solo se generan meses ya cerrados: una vez creado, el
+    snapshot no se recalcula y los reportes lo leen sin volver a recorrer
+    `invoices`.
+    """
+    start, end = month_bounds(year, month)
+    if end > datetime.now(timezone.utc).date():
+        raise ValueError("El periodo aún no ha cerrado; el Libro de Ventas se genera a partir del mes siguiente.")
+
+    snapshot = models.SalesBookSnapshot(tenant_id=tenant_id, period=start)
+    db.add(snapshot)
+    await db.flush()
+
+    start_dt = datetime.combine(start, time.min)
+    end_dt = datetime.combine(end, time.min)
+
+    # Cobrado por factura hasta el cierre del periodo (convertido a USD)
+    inv_rate = func.coalesce(func.nullif(Invoice.exchange_rate, 0), 1)
+    pay_rate = func.coalesce(func.nullif(Payment.exchange_rate, 0), inv_rate)
+    amount_usd = case(
+        (Payment.currency == "USD", Payment.amount),
+        (Payment.currency == "VES", Payment.amount / pay_rate),
+        else_=0
+    )
+    paid_sq = (
+        select(Payment.invoice_id, func.sum(amount_usd).label("paid_usd"))
+        .join(Invoice, Invoice.id == Payment.invoice_id)
+        .where(
+            Invoice.tenant_id == tenant_id,
+            Invoice.created_at >= start_dt,
+            Invoice.created_at < end_dt,
+            Payment.created_at < end_dt
+        )
+        .group_by(Payment.invoice_id)
+        .subquery()
+    )
+
+    # Las anuladas aparecen en el libro (correlativo fiscal) pero en cero
+    def zero_if_void(expr):
+        return case((Invoice.status == "VOID", 0), else_=func.round(expr, 2))
+
+    lines_select = (
+        select(
+            literal(snapshot.id, Integer),
+            func.row_number().over(order_by=(Invoice.invoice_number, Invoice.id)),
+            func.date(Invoice.created_at),
+            Invoice.invoice_number,
+            Invoice.control_number,
+            Invoice.customer_name,
+            Invoice.customer_rif,
+            Invoice.status,
+            Invoice.exchange_rate,
+            zero_if_void(Invoice.subtotal_usd * inv_rate),
+            zero_if_void(Invoice.tax_amount_usd * inv_rate),
+            zero_if_void(Invoice.amount_ves),
+            zero_if_void(Invoice.total_usd),
+            zero_if_void(func.coalesce(paid_sq.c.paid_usd, 0)),
+        )
+        .select_from(Invoice)
+        .outerjoin(paid_sq, paid_sq.c.invoice_id == Invoice.id)
+        .where(
+            Invoice.tenant_id == tenant_id,
+            Invoice.created_at >= start_dt,
+            Invoice.created_at < end_dt
+        )
+    )
+    await db.execute(
+        insert(Line).from_select(
+            [
+                "snapshot_id", "line_number", "invoice_date", "invoice_number", "control_number",
+                "customer_name", "customer_rif", "status", "exchange_rate",
+                "base_ves", "tax_ves", "total_ves", "total_usd", "paid_usd"
+            ],
+            lines_select
+        )
+    )
+
+    totals = (await db.execute(
+        select(
+            func.count(Line.id).label("count"),
+            func.coalesce(func.sum(Line.base_ves), 0).label("base"),
+            func.coalesce(func.sum(Line.tax_ves), 0).label("tax"),
+            func.coalesce(func.sum(Line.total_ves), 0).label("total_ves"),
+            func.coalesce(func.sum(Line.total_usd), 0).label("total_usd")
+        ).filter(Line.snapshot_id == snapshot.id)
+    )).one()
+
+    company = (await db.execute(
+        select(Invoice.company_name, Invoice.company_rif)
+        .filter(Invoice.tenant_id == tenant_id, Invoice.created_at >= start_dt, Invoice.created_at < end_dt)
+        .order_by(Invoice.id.desc())
+        .limit(1)
+    )).first()
+    if company:
+        snapshot.company_name, snapshot.company_rif = company.company_name, company.company_rif
+    
+    snapshot.invoice_count = totals.count
+    snapshot.total_base_ves = totals.base
+    snapshot.total_tax_ves = totals.tax
+    snapshot.total_ves = totals.total_ves
+    snapshot.total_usd = totals.total_usd
+
+    await db.commit()
+    await db.refresh(snapshot)
+    logger.info(f"📒 Libro de Ventas {start:%Y-%m} generado para empresa {tenant_id}: {totals.count} renglones.")
+    return snapshot
+
+
+async def get_or_create_sales_book(db: AsyncSession, tenant_id: int, year: int, month: int) -> models.SalesBookSnapshot:
+    """Retorna el snapshot del mes; si no existe lo genera (una sola vez)."""
+    start, _ = month_bounds(year, month)
+    snapshot = await get_sales_book(db, tenant_id, start)
+    if snapshot is not None:
+        return snapshot
+    try:
+        return await generate_sales_book(db, tenant_id, year, month)
+    except IntegrityError:
+        # Otra petición lo generó en paralelo: usamos el suyo
+        await db.rollback()
+        return await get_sales_book(db, tenant_id, start)
+
+
+async def stream_sales_book_pdf(session_factory, snapshot: models.SalesBookSnapshot) -> AsyncIterator[bytes]:
+    """PDF del libro armado en un temporal a partir del cursor de renglones y enviado por bloques."""
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    os.close(fd)
+    try:
+        writer = SalesBookPdfWriter(path, snapshot)
+        async for rows in iter_row_batches(session_factory, sales_book_lines_query(snapshot.id)):
+            # ReportLab es CPU: cada lote se dibuja fuera del event loop
+            await asyncio.to_thread(writer.write_rows, rows)
+        await asyncio.to_thread(writer.close)
+
+        async for chunk in iter_file_chunks(path):
+            yield chunk
+    finally:
+        os.remove(path)
@@ -0,0 +1,64 @@
+import time
+from decimal import Decimal
+from typing import Dict, Optional, Tuple
+
+from .. import models
+
+
+class CachedSettings:
+    """Copia de `FinanceSettings` desacoplada de la sesión (segura entre requests)."""
+
+    def __init__(self, obj: models.FinanceSettings):
+        self.id = obj.id
+        self.tenant_id = obj.tenant_id
+        self.enable_salesperson_selection = obj.enable_salesperson_selection
+        self.default_currency = obj.default_currency
+        self.tax_rate = Decimal(obj.tax_rate) if obj.tax_rate is not None else Decimal("16.00")
+
+
+class FinanceSettingsCache:
+    """
+    Caché por empresa de `FinanceSettings` con TTL e invalidación explícita.
+
+    La configuración (IVA, moneda por defecto) cambia pocas veces al año, así que
+    la facturación la lee de memoria. El TTL acota cuánto tarda otra réplica en
+    ver un cambio; quien modifique la configuración debe llamar a `invalidate`.
+    """
+
+    def __init__(self, ttl_seconds: float = 300.0):
+        self.ttl = ttl_seconds
+        self._entries: Dict[int, Tuple[float, CachedSettings]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, tenant_id: int) -> Optional[CachedSettings]:
+        entry = self._entries.get(tenant_id)
+        if entry is not None and time.monotonic() < entry[0]:
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        return None
+
+    def set(self, obj: models.FinanceSettings) -> CachedSettings:
+        cached = CachedSettings(obj)
+        self._entries[cached.tenant_id] = (time.monotonic() + self.ttl, cached)
+        return cached
+
+    def invalidate(self, tenant_id: Optional[int] = None):
+        """Descarta la configuración de una empresa (o de todas)."""
+        if tenant_id is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(tenant_id, None)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0
+        }
+
+
+settings_cache = FinanceSettingsCache()
@@ -4,6 +4,7 @@ from reportlab.lib.units import mm
 from decimal import Decimal
 from datetime import datetime
 import textwrap
+from types import SimpleNamespace
 
 # --- CONFIGURACIÓN ---
 # Ancho estándar de papel térmico (80mm - márgenes)
@@ -23,6 +24,7 @@ class FiscalTicketGenerator:
     Usado para impresoras fiscales o de comandas.
     """
     def __init__(self, buffer, invoice, items=None):
+        self.buffer = buffer
         self.c = canvas.Canvas(buffer, pagesize=(PAGE_WIDTH, MAX_HEIGHT))
         self.invoice = invoice
         self.y = MAX_HEIGHT - 10 # Posición vertical inicial (cursor)
@@ -72,6 +74,19 @@ class FiscalTicketGenerator:
     # --- LÓGICA PRINCIPAL DE GENERACIÓN ---
     
     def generate(self):
+        # 1ª pasada sobre el lienzo "infinito" solo para medir la altura usada
+        # (el canvas no escribe en el buffer hasta `save`)
+        self._draw_ticket()
+        final_height = MAX_HEIGHT - self.y + (10*mm)
+        
+        # 2ª pasada en una sola página del alto exacto del ticket
+        self.c = canvas.Canvas(self.buffer, pagesize=(PAGE_WIDTH, final_height))
+        self.y = final_height - 10
+        self._draw_ticket()
+        self.c.showPage()
+        self.c.save()
+
+    def _draw_ticket(self):
         # 1. ENCABEZADO (SENIAT)
         self._draw_text_center("SENIAT", 8, True)
         self._move_down(2)
@@ -136,7 +151,7 @@ class FiscalTicketGenerator:
         total_base = Decimal(0)
         
         # Iterar productos
-        for item in self.invoice.items:
+        for item in self.items:
             # Nombre producto (wrapppeado)
             name_lines = textwrap.wrap(item.product_name, width=28)
             
@@ -207,19 +222,6 @@ class FiscalTicketGenerator:
         self._draw_line()
         self._draw_text_center("SIN DERECHO A CRÉDITO FISCAL", 8, True)
         self._draw_text_center("(Representación Gráfica)", 7)
-        
-        # --- CIERRE Y RECORTE ---
-        self.c.showPage()
-        
-        # Truco: Calcular altura usada para recortar la página
-        # MAX_HEIGHT (2000) - self.y (donde quedó el cursor) + margen
-        final_height = MAX_HEIGHT - self.y + (10*mm)
-        
-        self.c.setPageSize((PAGE_WIDTH, final_height))
-        # Mover contenido al nuevo origen
-        self.c.translate(0, final_height - MAX_HEIGHT)
-        
-        self.c.save()
 
 # --- FUNCIÓN DE ENTRADA ---
 def generate_invoice_pdf(invoice_data, items):
@@ -234,4 +236,27 @@ def generate_invoice_pdf(invoice_data, items):
     generator.generate()
     
     buffer.seek(0)
-    return buffer
\ No newline at end of file
+    return buffer
+
+
+# --- RENDER FUERA DEL EVENT LOOP ---
+# Campos de la factura que usa el ticket (se copian a un dict para poder
+# enviarlos a un proceso del pool; los objetos ORM no son serializables)
+TICKET_FIELDS = [
+    "invoice_number", "control_number", "created_at",
+    "customer_name", "customer_rif", "customer_address",
+    "total_usd", "tax_amount_usd", "amount_ves", "exchange_rate",
+]
+TICKET_ITEM_FIELDS = ["product_name", "quantity", "unit_price", "total_price"]
+
+def invoice_ticket_data(invoice) -> dict:
+    """Snapshot serializable (pickle) de la factura para `render_ticket_pdf`."""
+    data = {field: getattr(invoice, field, None) for field in TICKET_FIELDS}
+    data["items"] = [{field: getattr(item, field) for field in TICKET_ITEM_FIELDS} for item in invoice.items]
+    return data
+
+def render_ticket_pdf(data: dict) -> bytes:
+    """Genera el ticket a partir de `invoice_ticket_data`. Pensado para correr en un ProcessPoolExecutor."""
+    items = [SimpleNamespace(**item) for item in data["items"]]
+    invoice = SimpleNamespace(**{k: v for k, v in data.items() if k != "items"})
+    return generate_invoice_pdf(invoice_data=invoice, items=items).getvalue()
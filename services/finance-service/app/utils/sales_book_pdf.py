@@ -0,0 +1,111 @@
+from decimal import Decimal
+from reportlab.pdfgen import canvas
+from reportlab.lib.pagesizes import letter, landscape
+from reportlab.lib.units import mm
+
+# --- CONFIGURACIÓN ---
+PAGE_SIZE = landscape(letter)
+MARGIN = 10 * mm
+ROW_HEIGHT = 4.2 * mm
+
+FONT_NORMAL = "Helvetica"
+FONT_BOLD = "Helvetica-Bold"
+FONT_SIZE_S = 6.5
+FONT_SIZE_M = 8
+FONT_SIZE_L = 11
+
+# (Encabezado, ancho en mm, alineación) en el mismo orden que SALES_BOOK_COLUMNS
+COLUMNS = [
+    ("Nº", 10, "R"),
+    ("Fecha", 17, "L"),
+    ("RIF", 24, "L"),
+    ("Nombre o Razón Social", 54, "L"),
+    ("Factura", 15, "R"),
+    ("Control", 20, "L"),
+    ("Estado", 18, "L"),
+    ("Tasa", 14, "R"),
+    ("Base Bs", 22, "R"),
+    ("IVA Bs", 19, "R"),
+    ("Total Bs", 22, "R"),
+    ("Total $", 17, "R"),
+    ("Cobrado $", 17, "R"),
+]
+
+def _fmt(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, Decimal):
+        return f"{value:,.2f}"
+    if hasattr(value, "strftime"):
+        return value.strftime("%d/%m/%Y")
+    return str(value)
+
+class SalesBookPdfWriter:
+    """
+    Libro de Ventas en PDF (carta horizontal), escrito por lotes de renglones.
+    Cada página se cierra al llenarse, así el llamador puede alimentar el
+    documento desde un cursor sin cargar todos los renglones a la vez.
+    """
+    def __init__(self, output, snapshot):
+        self.c = canvas.Canvas(output, pagesize=PAGE_SIZE)
+        self.snapshot = snapshot
+        self.company_name = " - ".join(filter(None, [snapshot.company_name, snapshot.company_rif]))
+        self.width, self.height = PAGE_SIZE
+        self.page = 0
+        self.y = 0
+        self._new_page()
+
+    # --- MÉTODOS AUXILIARES DE DIBUJO ---
+
+    def _new_page(self):
+        if self.page:
+            self.c.showPage()
+        self.page += 1
+        self.y = self.height - MARGIN
+
+        self.c.setFont(FONT_BOLD, FONT_SIZE_L)
+        self.c.drawString(MARGIN, self.y, f"LIBRO DE VENTAS - {self.snapshot.period:%m/%Y}")
+        self.c.setFont(FONT_NORMAL, FONT_SIZE_M)
+        self.c.drawRightString(self.width - MARGIN, self.y, f"Página {self.page}")
+        self.y -= 5 * mm
+        if self.company_name:
+            self.c.drawString(MARGIN, self.y, self.company_name)
+            self.y -= 5 * mm
+
+        self._draw_row([header for header, _, _ in COLUMNS], bold=True)
+        self.c.line(MARGIN, self.y + ROW_HEIGHT - 1 * mm, self.width - MARGIN, self.y + ROW_HEIGHT - 1 * mm)
+
+    def _draw_row(self, values, bold=False):
+        self.c.setFont(FONT_BOLD if bold else FONT_NORMAL, FONT_SIZE_S)
+        x = MARGIN
+        for value, (_, width, align) in zip(values, COLUMNS):
+            text = value if isinstance(value, str) and bold else _fmt(value)
+            max_chars = int(width * 0.75)
+            text = text[:max_chars]
+            if align == "R":
+                self.c.drawRightString(x + width * mm - 1 * mm, self.y, text)
+            else:
+                self.c.drawString(x + 0.5 * mm, self.y, text)
+            x += width * mm
+        self.y -= ROW_HEIGHT
+
+    # --- API ---
+
+    def write_rows(self, rows):
+        for row in rows:
+            if self.y < MARGIN + ROW_HEIGHT:
+                self._new_page()
+            self._draw_row(list(row))
+
+    def close(self):
+        """Dibuja el resumen del periodo y guarda el documento."""
+        if self.y < MARGIN + 4 * ROW_HEIGHT:
+            self._new_page()
+        s = self.snapshot
+        self.y -= ROW_HEIGHT
+        self.c.setFont(FONT_BOLD, FONT_SIZE_M)
+        self.c.drawString(MARGIN, self.y, f"Operaciones: {s.invoice_count}")
+        self.c.drawString(MARGIN + 50 * mm, self.y, f"Base Imponible Bs: {_fmt(s.total_base_ves)}")
+        self.c.drawString(MARGIN + 120 * mm, self.y, f"IVA Bs: {_fmt(s.total_tax_ves)}")
+        self.c.drawString(MARGIN + 175 * mm, self.y, f"Total Bs: {_fmt(s.total_ves)}")
+        self.c.save()
@@ -0,0 +1,65 @@
+"""Add sales book (Libro de Ventas) snapshots
+
+Revision ID: 0a6e2d8b5f43
+Revises: f4d9b1e7c260
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0a6e2d8b5f43'
+down_revision = 'f4d9b1e7c260'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('sales_book_snapshots',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('tenant_id', sa.Integer(), nullable=False),
+        sa.Column('period', sa.Date(), nullable=False),
+        sa.Column('generated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('company_name', sa.String(), nullable=True),
+        sa.Column('company_rif', sa.String(), nullable=True),
+        sa.Column('invoice_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('total_base_ves', sa.Numeric(precision=16, scale=2), nullable=False, server_default='0'),
+        sa.Column('total_tax_ves', sa.Numeric(precision=16, scale=2), nullable=False, server_default='0'),
+        sa.Column('total_ves', sa.Numeric(precision=16, scale=2), nullable=False, server_default='0'),
+        sa.Column('total_usd', sa.Numeric(precision=14, scale=2), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('tenant_id', 'period', name='uq_sales_book_tenant_period')
+    )
+    op.create_index(op.f('ix_sales_book_snapshots_id'), 'sales_book_snapshots', ['id'], unique=False)
+    
+    op.create_table('sales_book_lines',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('snapshot_id', sa.Integer(), nullable=False),
+        sa.Column('line_number', sa.Integer(), nullable=False),
+        sa.Column('invoice_date', sa.Date(), nullable=False),
+        sa.Column('invoice_number', sa.Integer(), nullable=False),
+        sa.Column('control_number', sa.String(), nullable=True),
+        sa.Column('customer_name', sa.String(), nullable=True),
+        sa.Column('customer_rif', sa.String(), nullable=True),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('exchange_rate', sa.Numeric(precision=12, scale=4), nullable=True),
+        sa.Column('base_ves', sa.Numeric(precision=16, scale=2), nullable=False, server_default='0'),
+        sa.Column('tax_ves', sa.Numeric(precision=16, scale=2), nullable=False, server_default='0'),
+        sa.Column('total_ves', sa.Numeric(precision=16, scale=2), nullable=False, server_default='0'),
+        sa.Column('total_usd', sa.Numeric(precision=14, scale=2), nullable=False, server_default='0'),
+        sa.Column('paid_usd', sa.Numeric(precision=14, scale=2), nullable=False, server_default='0'),
+        sa.ForeignKeyConstraint(['snapshot_id'], ['sales_book_snapshots.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_sales_book_lines_id'), 'sales_book_lines', ['id'], unique=False)
+    op.create_index('ix_sales_book_lines_snapshot_line', 'sales_book_lines', ['snapshot_id', 'line_number'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_sales_book_lines_snapshot_line', table_name='sales_book_lines')
+    op.drop_index(op.f('ix_sales_book_lines_id'), table_name='sales_book_lines')
+    op.drop_table('sales_book_lines')
+    op.drop_index(op.f('ix_sales_book_snapshots_id'), table_name='sales_book_snapshots')
+    op.drop_table('sales_book_snapshots')
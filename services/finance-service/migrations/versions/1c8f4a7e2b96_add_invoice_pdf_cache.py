@@ -0,0 +1,33 @@
+"""Add invoice PDF ticket cache
+
+Revision ID: 1c8f4a7e2b96
+Revises: 0a6e2d8b5f43
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1c8f4a7e2b96'
+down_revision = '0a6e2d8b5f43'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('invoice_pdfs',
+        sa.Column('invoice_id', sa.Integer(), nullable=False),
+        sa.Column('template_version', sa.String(length=20), nullable=False),
+        sa.Column('tenant_id', sa.Integer(), nullable=False),
+        sa.Column('etag', sa.String(length=64), nullable=False),
+        sa.Column('content', sa.LargeBinary(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['invoice_id'], ['invoices.id'], ),
+        sa.PrimaryKeyConstraint('invoice_id', 'template_version')
+    )
+
+
+def downgrade():
+    op.drop_table('invoice_pdfs')
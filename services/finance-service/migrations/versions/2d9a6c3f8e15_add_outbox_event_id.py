@@ -0,0 +1,26 @@
+"""Add event_id to outbox events for consumer-side deduplication
+
+Revision ID: 2d9a6c3f8e15
+Revises: 1c8f4a7e2b96
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2d9a6c3f8e15'
+down_revision = '1c8f4a7e2b96'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('outbox_events', sa.Column('event_id', sa.String(length=32), nullable=True))
+    op.create_unique_constraint('outbox_events_event_id_key', 'outbox_events', ['event_id'])
+
+
+def downgrade():
+    op.drop_constraint('outbox_events_event_id_key', 'outbox_events', type_='unique')
+    op.drop_column('outbox_events', 'event_id')
@@ -0,0 +1,42 @@
+"""Add dead-letter state to outbox events
+
+Revision ID: 3e1b7f5a9c24
+Revises: 2d9a6c3f8e15
+Create Date: 2026-10-17 18:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3e1b7f5a9c24'
+down_revision = '2d9a6c3f8e15'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('outbox_events', sa.Column('dead_at', sa.DateTime(timezone=True), nullable=True))
+    
+    # Los eventos descartados salen del índice de pendientes
+    op.drop_index('ix_outbox_events_pending', table_name='outbox_events')
+    op.create_index(
+        'ix_outbox_events_pending', 'outbox_events', ['id'],
+        postgresql_where=sa.text('published_at IS NULL AND dead_at IS NULL')
+    )
+    # Purga por antigüedad de los ya publicados
+    op.create_index(
+        'ix_outbox_events_published_at', 'outbox_events', ['published_at'],
+        postgresql_where=sa.text('published_at IS NOT NULL')
+    )
+
+
+def downgrade():
+    op.drop_index('ix_outbox_events_published_at', table_name='outbox_events')
+    op.drop_index('ix_outbox_events_pending', table_name='outbox_events')
+    op.create_index(
+        'ix_outbox_events_pending', 'outbox_events', ['id'],
+        postgresql_where=sa.text('published_at IS NULL')
+    )
+    op.drop_column('outbox_events', 'dead_at')
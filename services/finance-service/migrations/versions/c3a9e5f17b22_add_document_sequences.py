@@ -0,0 +1,91 @@
+"""Add per-tenant document sequences and unique document numbers
+
+Revision ID: c3a9e5f17b22
+Revises: b1f4c2d8e901
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3a9e5f17b22'
+down_revision = 'b1f4c2d8e901'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    
+    # La numeración anterior (MAX + 1) pudo emitir facturas repetidas en concurrencia.
+    # Son documentos fiscales: no se renumeran automáticamente, se exige corregirlas antes.
+    duplicated = bind.execute(sa.text("""
+        SELECT tenant_id, invoice_number, COUNT(*) AS total
+        FROM invoices
+        GROUP BY tenant_id, invoice_number
+        HAVING COUNT(*) > 1
+        ORDER BY tenant_id, invoice_number
+        LIMIT 20
+    """)).all()
+    if duplicated:
+        detail = ", ".join(f"tenant {row.tenant_id} #{row.invoice_number} (x{row.total})" for row in duplicated)
+        raise RuntimeError(
+            "Hay facturas con número repetido; corríjalas antes de aplicar "
+            f"uq_invoices_tenant_invoice_number: {detail}"
+        )
+    
+    # Cotizaciones repetidas: se conserva la más antigua y las demás reciben
+    # números nuevos a continuación del mayor de la empresa
+    op.execute("""
+        WITH ranked AS (
+            SELECT id, tenant_id,
+                   ROW_NUMBER() OVER (PARTITION BY tenant_id, quote_number ORDER BY id) AS rn
+            FROM quotes
+            WHERE quote_number IS NOT NULL
+        ), extra AS (
+            SELECT id, tenant_id, ROW_NUMBER() OVER (PARTITION BY tenant_id ORDER BY id) AS seq
+            FROM ranked
+            WHERE rn > 1
+        ), base AS (
+            SELECT tenant_id, COALESCE(MAX(substring(quote_number from '[0-9]+$')::int), 0) AS max_num
+            FROM quotes
+            GROUP BY tenant_id
+        )
+        UPDATE quotes q
+        SET quote_number = 'COT-' || lpad((b.max_num + e.seq)::text, GREATEST(5, length((b.max_num + e.seq)::text)), '0')
+        FROM extra e
+        JOIN base b ON b.tenant_id = e.tenant_id
+        WHERE q.id = e.id
+    """)
+    
+    op.create_table('document_sequences',
+        sa.Column('tenant_id', sa.Integer(), nullable=False),
+        sa.Column('doc_type', sa.String(length=20), nullable=False),
+        sa.Column('last_value', sa.Integer(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('tenant_id', 'doc_type')
+    )
+    
+    # Inicializar los contadores con la numeración ya emitida (y depurada)
+    op.execute("""
+        INSERT INTO document_sequences (tenant_id, doc_type, last_value)
+        SELECT tenant_id, 'INVOICE', MAX(invoice_number)
+        FROM invoices
+        GROUP BY tenant_id
+    """)
+    op.execute("""
+        INSERT INTO document_sequences (tenant_id, doc_type, last_value)
+        SELECT tenant_id, 'QUOTE', COALESCE(MAX(substring(quote_number from '[0-9]+$')::int), 0)
+        FROM quotes
+        GROUP BY tenant_id
+    """)
+    
+    op.create_unique_constraint('uq_invoices_tenant_invoice_number', 'invoices', ['tenant_id', 'invoice_number'])
+    op.create_unique_constraint('uq_quotes_tenant_quote_number', 'quotes', ['tenant_id', 'quote_number'])
+
+
+def downgrade():
+    op.drop_constraint('uq_quotes_tenant_quote_number', 'quotes', type_='unique')
+    op.drop_constraint('uq_invoices_tenant_invoice_number', 'invoices', type_='unique')
+    op.drop_table('document_sequences')
@@ -0,0 +1,44 @@
+"""Add daily sales rollups for the dashboard
+
+Revision ID: d5b7a3c94e10
+Revises: c3a9e5f17b22
+Create Date: 2026-10-17 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5b7a3c94e10'
+down_revision = 'c3a9e5f17b22'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('daily_sales_rollups',
+        sa.Column('tenant_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('sales_usd', sa.Numeric(precision=14, scale=2), nullable=False, server_default='0'),
+        sa.Column('invoice_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('pending_usd', sa.Numeric(precision=14, scale=2), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('tenant_id', 'day')
+    )
+    
+    # Backfill con el histórico de facturas (día en UTC)
+    op.execute("""
+        INSERT INTO daily_sales_rollups (tenant_id, day, sales_usd, invoice_count, pending_usd)
+        SELECT
+            tenant_id,
+            (created_at AT TIME ZONE 'UTC')::date,
+            COALESCE(SUM(total_usd) FILTER (WHERE status <> 'VOID'), 0),
+            COUNT(*),
+            COALESCE(SUM(total_usd) FILTER (WHERE status IN ('ISSUED', 'PARTIALLY_PAID')), 0)
+        FROM invoices
+        GROUP BY tenant_id, (created_at AT TIME ZONE 'UTC')::date
+    """)
+
+
+def downgrade():
+    op.drop_table('daily_sales_rollups')
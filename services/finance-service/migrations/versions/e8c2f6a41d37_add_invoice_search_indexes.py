@@ -0,0 +1,40 @@
+"""Add trigram search indexes on invoices
+
+Revision ID: e8c2f6a41d37
+Revises: d5b7a3c94e10
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8c2f6a41d37'
+down_revision = 'd5b7a3c94e10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Índices GIN de trigramas: permiten que ILIKE '%texto%' use índice
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    
+    op.create_index(
+        'ix_invoices_customer_name_trgm', 'invoices', ['customer_name'],
+        postgresql_using='gin', postgresql_ops={'customer_name': 'gin_trgm_ops'}
+    )
+    op.create_index(
+        'ix_invoices_customer_rif_trgm', 'invoices', ['customer_rif'],
+        postgresql_using='gin', postgresql_ops={'customer_rif': 'gin_trgm_ops'}
+    )
+    op.create_index(
+        'ix_invoices_control_number_trgm', 'invoices', ['control_number'],
+        postgresql_using='gin', postgresql_ops={'control_number': 'gin_trgm_ops'}
+    )
+
+
+def downgrade():
+    op.drop_index('ix_invoices_control_number_trgm', table_name='invoices')
+    op.drop_index('ix_invoices_customer_rif_trgm', table_name='invoices')
+    op.drop_index('ix_invoices_customer_name_trgm', table_name='invoices')
@@ -0,0 +1,41 @@
+"""Add composite and partial indexes matched to invoice queries
+
+Revision ID: f4d9b1e7c260
+Revises: e8c2f6a41d37
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f4d9b1e7c260'
+down_revision = 'e8c2f6a41d37'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # (tenant_id, invoice_number) ya lo cubre uq_invoices_tenant_invoice_number
+    op.create_index('ix_invoices_tenant_created_at', 'invoices', ['tenant_id', 'created_at', 'id'], if_not_exists=True)
+    op.create_index('ix_invoices_tenant_status_created_at', 'invoices', ['tenant_id', 'status', 'created_at'], if_not_exists=True)
+    op.create_index('ix_invoices_tenant_cash_close', 'invoices', ['tenant_id', 'cash_close_id'], if_not_exists=True)
+    op.create_index(
+        'ix_invoices_tenant_open', 'invoices', ['tenant_id', 'created_by_user_id'],
+        postgresql_where=sa.text('cash_close_id IS NULL'), if_not_exists=True
+    )
+    op.create_index(op.f('ix_payments_invoice_id'), 'payments', ['invoice_id'], if_not_exists=True)
+    
+    # ix_invoices_tenant_id queda cubierto por los compuestos (prefijo tenant_id).
+    # ix_invoices_cash_close_id se conserva: es el índice propio de la FK.
+    op.drop_index('ix_invoices_tenant_id', table_name='invoices', if_exists=True)
+
+
+def downgrade():
+    op.create_index('ix_invoices_tenant_id', 'invoices', ['tenant_id'], if_not_exists=True)
+    op.drop_index(op.f('ix_payments_invoice_id'), table_name='payments')
+    op.drop_index('ix_invoices_tenant_open', table_name='invoices')
+    op.drop_index('ix_invoices_tenant_cash_close', table_name='invoices')
+    op.drop_index('ix_invoices_tenant_status_created_at', table_name='invoices')
+    op.drop_index('ix_invoices_tenant_created_at', table_name='invoices')
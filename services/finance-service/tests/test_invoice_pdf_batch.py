@@ -0,0 +1,100 @@
+import asyncio
+import io
+import os
+import zipfile
+
+import pytest
+
+pytest.importorskip("reportlab")
+pytest.importorskip("pypdf")
+pytest.importorskip("asyncpg")
+
+from pypdf import PdfReader
+
+from app.services import invoice_pdf_batch as batch_module
+from app.services.invoice_pdf_batch import BatchPdfJob, InvoicePdfBatchExporter
+from app.services.pdf_cache import InvoicePdfCache
+from test_ticket_pdf import make_invoice
+
+
+class FakeResult:
+    def all(self):
+        return []
+
+
+class FakeSession:
+    """Sesión mínima: la caché de tickets está vacía y los INSERT se aceptan."""
+
+    def __init__(self):
+        self.inserts = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, statement):
+        if statement.is_insert:
+            self.inserts += 1
+        return FakeResult()
+
+    async def commit(self):
+        pass
+
+    def expunge_all(self):
+        pass
+
+
+def run_job(monkeypatch, format: str, count: int = 3) -> BatchPdfJob:
+    invoices = {i: make_invoice(i) for i in range(1, count + 1)}
+    session = FakeSession()
+
+    async def fake_batches(session_factory, query, batch_size):
+        ids = list(invoices)
+        for start in range(0, len(ids), 2):
+            yield [type("Row", (), {"id": i}) for i in ids[start:start + 2]]
+
+    async def fake_load(db, ids):
+        return [invoices[i] for i in ids]
+
+    monkeypatch.setattr(batch_module, "iter_row_batches", fake_batches)
+    monkeypatch.setattr(InvoicePdfBatchExporter, "_load_invoices", staticmethod(fake_load))
+
+    cache = InvoicePdfCache(lambda: session, max_workers=1)
+    exporter = InvoicePdfBatchExporter(lambda: session, cache)
+    job = BatchPdfJob(id="job", tenant_id=1, format=format, filename=f"facturas.{format}", total=count)
+
+    async def main():
+        try:
+            await exporter._run(job, id_query=None)
+        finally:
+            cache.close()
+
+    asyncio.run(main())
+    assert session.inserts == 2  # Un INSERT por lote de tickets renderizados
+    return job
+
+
+def test_batch_export_zip(monkeypatch):
+    job = run_job(monkeypatch, "zip")
+    try:
+        assert job.status == "DONE", job.error
+        assert job.done == 3 and job.finished_at is not None
+        with zipfile.ZipFile(job.path) as zf:
+            names = zf.namelist()
+            assert names == ["factura_101.pdf", "factura_102.pdf", "factura_103.pdf"]
+            assert all(zf.read(name).startswith(b"%PDF") for name in names)
+    finally:
+        InvoicePdfBatchExporter._remove_file(job)
+
+
+def test_batch_export_concatenated_pdf(monkeypatch):
+    job = run_job(monkeypatch, "pdf")
+    try:
+        assert job.status == "DONE", job.error
+        with open(job.path, "rb") as f:
+            assert len(PdfReader(io.BytesIO(f.read())).pages) == 3
+    finally:
+        InvoicePdfBatchExporter._remove_file(job)
+        assert not os.path.exists(job.path or "")
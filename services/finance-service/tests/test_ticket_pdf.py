@@ -0,0 +1,54 @@
+from datetime import datetime
+from decimal import Decimal
+from types import SimpleNamespace
+
+import io
+
+import pytest
+
+pytest.importorskip("reportlab")
+pypdf = pytest.importorskip("pypdf")
+
+from app.utils.pdf_generator import invoice_ticket_data, render_ticket_pdf
+
+
+def make_invoice(invoice_id: int = 1, items: int = 2):
+    return SimpleNamespace(
+        id=invoice_id,
+        tenant_id=1,
+        invoice_number=100 + invoice_id,
+        control_number=f"00-{invoice_id:06d}",
+        created_at=datetime(2026, 10, 1, 9, 30),
+        customer_name="Cliente de Prueba C.A.",
+        customer_rif="J-12345678-9",
+        customer_address="Av. Principal, Caracas",
+        total_usd=Decimal("23.20"),
+        tax_amount_usd=Decimal("3.20"),
+        amount_ves=Decimal("928.00"),
+        exchange_rate=Decimal("40.00"),
+        items=[
+            SimpleNamespace(
+                product_name=f"Producto {n} con un nombre bastante largo para partirlo",
+                quantity=Decimal("2"),
+                unit_price=Decimal("5.00"),
+                total_price=Decimal("10.00")
+            )
+            for n in range(items)
+        ]
+    )
+
+
+def test_render_ticket_from_snapshot():
+    pdf = render_ticket_pdf(invoice_ticket_data(make_invoice()))
+    assert pdf.startswith(b"%PDF")
+
+    # Una sola página recortada al alto del contenido (nada queda fuera)
+    pages = pypdf.PdfReader(io.BytesIO(pdf)).pages
+    assert len(pages) == 1
+    text = pages[0].extract_text()
+    assert "SENIAT" in text and "Producto 1" in text and "Gráfica" in text
+
+
+def test_render_ticket_without_items():
+    pdf = render_ticket_pdf(invoice_ticket_data(make_invoice(items=0)))
+    assert pdf.startswith(b"%PDF")
@@ -0,0 +1,11 @@
+import os
+from erp_common.http_client import ServiceHttpClient
+
+# URL interna del servicio de facturacion
+FINANCE_SERVICE_URL = os.getenv("FINANCE_SERVICE", "http://finance-service:8000")
+AUTH_SERVICE_URL = os.getenv("AUTH_SERVICE_URL", "http://auth-service:8000")
+
+# Pool HTTP compartido por todo el proceso (se abre/cierra en el lifespan)
+http_client = ServiceHttpClient()
+http_client.register("finance", FINANCE_SERVICE_URL, timeout=5.0)
+http_client.register("auth", AUTH_SERVICE_URL, timeout=5.0)
@@ -5,7 +5,7 @@ from sqlalchemy.orm import selectinload
 from typing import Optional
 from . import models, schemas
 from datetime import datetime
-import httpx
+from .clients import http_client
 
 async def check_employee_access(db: AsyncSession, email: str, tenant_id: int) -> bool:
     """
@@ -223,20 +223,19 @@ async def update_employee (
     
     if update_data.get("is_active") is False and auth_token:
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    "http://auth-service:8000/api/auth/users/sync-deactivation",
-                    json={"email": db_employee.email, "full_name": "ignore"},
-                    headers={
-                        "Authorization": f"Bearer {auth_token}",
-                        "Content-Type": "application/json"
-                    },
-                    timeout=5.0
-                )
-                if response.status_code == 204:
-                    print("✅ Usuario desactivado correctamente en Auth.")
-                else:
-                    print(f"⚠️ Auth Service respondió: {response.status_code} - {response.text}")
+            response = await http_client.post(
+                "auth", "/api/auth/users/sync-deactivation",
+                json={"email": db_employee.email, "full_name": "ignore"},
+                headers={
+                    "Authorization": f"Bearer {auth_token}",
+                    "Content-Type": "application/json"
+                },
+                idempotent=True
+            )
+            if response.status_code == 204:
+                print("✅ Usuario desactivado correctamente en Auth.")
+            else:
+                print(f"⚠️ Auth Service respondió: {response.status_code} - {response.text}")
                 
         except Exception as e:
             print(f"Error sincronizando desactivación con Auth: {e}")
@@ -13,6 +13,7 @@ from . import crud, schemas, database, models
 from .schemas import PaginatedResponse
 from erp_common.security import RequirePermission, Permissions, UserPayload
 from app.routers import payrolls
+from .clients import http_client
 
 
 # Configuración de Logging
@@ -25,7 +26,9 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 async def lifespan(app: FastAPI):
     async with database.engine.begin() as conn:
         await conn.run_sync(models.Base.metadata.create_all)
+    await http_client.start()
     yield
+    await http_client.close()
     
 app = FastAPI(
     title="HHRR Service",
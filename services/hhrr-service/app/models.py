@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Numeric, Date, Text, JSON, ForeignKey, Time
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Numeric, Date, Text, JSON, ForeignKey, Time, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from .database import Base
@@ -107,6 +107,13 @@ class Payroll(Base):
     status = Column(String, default="DRAFT")                # DRAFT, CALCULATED, PAID
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        # Detección de nóminas duplicadas por empleado y periodo
+        Index("ix_payrolls_tenant_employee_period", "tenant_id", "employee_id", "period_start", "period_end"),
+        # Historial paginado (más recientes primero)
+        Index("ix_payrolls_tenant_period_end", "tenant_id", "period_end", "id"),
+    )
 
 class WorkSchedule(Base):
     """Definición de turnos laborales."""
@@ -2,14 +2,15 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 from sqlalchemy.future import select
-from sqlalchemy import func, or_, desc, delete, cast, String
-from typing import Optional
+from sqlalchemy import or_, delete, cast, String
+from typing import Optional, Literal
 from .. import schemas
 from app.database import get_db
 from app.models import Payroll, Employee
 from app.services.payroll_engine import create_bulk_payrolls, process_bulk_payment
 from datetime import date
 from erp_common.security import RequirePermission, Permissions, UserPayload
+from erp_common.pagination import paginate
 
 router = APIRouter(prefix="/payrolls", tags=["Payrolls"])
 
@@ -21,13 +22,15 @@ async def get_payrolls(
     status: Optional[str] = None,     # Filtro opcional: 'PAID', 'DRAFT', etc.
     period_start: Optional[date] = None,
     period_end: Optional[date] = None,
+    cursor: Optional[str] = None,
+    count: Literal["exact", "estimate"] = "exact",
     db: AsyncSession = Depends(get_db),
     user: UserPayload = Depends(RequirePermission(Permissions.PAYROLL_PROCESS))
 ):
     """
     Obtiene el historial de nóminas con paginación, búsqueda y filtros.
+    Con `cursor` pagina por keyset sobre `(period_end, id)`.
     """
-    offset = (page - 1) * limit
     
     stmt = select(Payroll).join(Payroll.employee)
     
@@ -57,33 +60,17 @@ async def get_payrolls(
     
     
     
-    # Conteo rápido
-    count_query = select(func.count(Payroll.id)).filter(*conditions)
-    total_result = await db.execute(count_query)
-    total = total_result.scalar() or 0
-    
-    # Obtener Datos
-    query = (
-        stmt
-        .filter(*conditions)
-        .options(selectinload(Payroll.employee))
-        .order_by(desc(Payroll.period_end), desc(Payroll.id))
-        .offset(offset)
-        .limit(limit)
+    # Conteo y datos (el conteo se deriva de la consulta para respetar el JOIN con empleado)
+    return await paginate(
+        db,
+        stmt.filter(*conditions).options(selectinload(Payroll.employee)),
+        order_by=[Payroll.period_end, Payroll.id],
+        descending=True,
+        page=page,
+        limit=limit,
+        cursor=cursor,
+        count_mode=count
     )
-    
-    result = await db.execute(query)
-    data = result.scalars().all()
-    
-    return {
-        "data": data,
-        "meta": {
-            "total": total,
-            "page": page,
-            "limit": limit,
-            "total_pages": (total + limit - 1) // limit if limit > 0 else 0
-        }
-    }
 
 @router.post("/bulk-pay", status_code=status.HTTP_200_OK)
 async def bulk_pay_payrolls(
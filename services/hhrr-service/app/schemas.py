@@ -12,6 +12,8 @@ class MetaData(BaseModel):
     page: int
     limit: int
     total_pages: int
+    next_cursor: Optional[str] = None     # Token para continuar con paginación keyset
+    estimated: bool = False               # True si `total` es una estimación del planificador
     monthly_payroll: Optional[float] = 0.0
 
 class PaginatedResponse(BaseModel, Generic[T]):
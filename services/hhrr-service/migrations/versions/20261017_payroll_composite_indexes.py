@@ -0,0 +1,28 @@
+"""payroll_composite_indexes
+
+Revision ID: 2b7d4e9a1c08
+Revises: 1a2b3c4d5e6f
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '2b7d4e9a1c08'
+down_revision = '1a2b3c4d5e6f'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Duplicados por empleado/periodo en el cálculo masivo de nómina
+    op.create_index(
+        'ix_payrolls_tenant_employee_period', 'payrolls',
+        ['tenant_id', 'employee_id', 'period_start', 'period_end'], if_not_exists=True
+    )
+    # Historial paginado por periodo
+    op.create_index('ix_payrolls_tenant_period_end', 'payrolls', ['tenant_id', 'period_end', 'id'], if_not_exists=True)
+
+def downgrade():
+    op.drop_index('ix_payrolls_tenant_period_end', table_name='payrolls')
+    op.drop_index('ix_payrolls_tenant_employee_period', table_name='payrolls')
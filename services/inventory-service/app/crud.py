@@ -1,7 +1,9 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import func, or_
-from typing import Optional, Dict, Any
+from sqlalchemy import func, or_, any_, bindparam, Integer
+from sqlalchemy.dialects.postgresql import ARRAY
+from typing import Optional, Dict, Any, List
+from erp_common.pagination import paginate
 from . import models, schemas
 
 async def get_product_by_sku(db: AsyncSession, sku: str, tenant_id: int):
@@ -19,15 +21,16 @@ async def get_products(
     page: int = 1, 
     limit: int = 50,
     search: Optional[str] = None,
-    category: Optional[str] = None
+    category: Optional[str] = None,
+    cursor: Optional[str] = None,
+    count_mode: str = "exact"
 ) -> Dict[str, Any]:
     """
     Lista productos con paginación.
     Permite buscar por Nombre O por SKU.
+    Con `cursor` pagina por keyset sobre `(name, id)`.
     """
     
-    offset = (page - 1) * limit
-    
     # Condiciones base
     conditions = [
         models.Product.tenant_id == tenant_id,
@@ -49,33 +52,18 @@ async def get_products(
         
     # 1. Conteo optimizado
     count_query = select(func.count(models.Product.id)).filter(*conditions)
-    total_result = await db.execute(count_query)
-    total = total_result.scalar() or 0
     
     # 2. Obtener Datos
-    query = (
-        select(models.Product)
-        .filter(*conditions)
-        .order_by(models.Product.name.asc())
-        .offset(offset)
-        .limit(limit)
+    return await paginate(
+        db,
+        select(models.Product).filter(*conditions),
+        order_by=[models.Product.name, models.Product.id],
+        page=page,
+        limit=limit,
+        cursor=cursor,
+        count_mode=count_mode,
+        count_query=count_query
     )
-    result = await db.execute(query)
-    data = result.scalars().all()
-    
-    # Calcular Páginas
-    total_pages = (total + limit - 1) // limit if limit > 0 else 0
-
-    
-    return {
-        "data": data,
-        "meta": {
-            "total": total,
-            "page": page, 
-            "limit": limit,
-            "total_pages": total_pages
-        }
-    }
 
 async def get_product_by_id(db: AsyncSession, product_id: int, tenant_id: int):
     """Busca un producto por ID dentro de la empresa."""
@@ -86,6 +74,25 @@ async def get_product_by_id(db: AsyncSession, product_id: int, tenant_id: int):
     result = await db.execute(query)
     return result.scalars().first()
 
+async def get_products_by_ids(db: AsyncSession, product_ids: List[int], tenant_id: int):
+    """
+    Busca varios productos por ID en una sola consulta.
+    
+    Usa `WHERE id = ANY(:ids)` con un único parámetro de tipo arreglo,
+    así el plan de la consulta no cambia con la cantidad de IDs.
+    """
+    unique_ids = list(dict.fromkeys(product_ids))
+    if not unique_ids:
+        return []
+    
+    ids_param = bindparam("ids", unique_ids, type_=ARRAY(Integer))
+    query = select(models.Product).filter(
+        models.Product.id == any_(ids_param),
+        models.Product.tenant_id == tenant_id
+    )
+    result = await db.execute(query)
+    return result.scalars().all()
+
 async def create_product(db: AsyncSession, product: schemas.ProductCreate, tenant_id: int):
     db_product = models.Product(
         **product.model_dump(),
@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import List, Optional, Literal
 from fastapi import FastAPI, Depends, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -38,6 +38,8 @@ async def read_products(
     limit: int = 50,
     search: Optional[str] = None,
     category: Optional[str] = None,
+    cursor: Optional[str] = None,
+    count: Literal["exact", "estimate"] = "exact",
     db: AsyncSession = Depends(database.get_db),
     user: UserPayload = Depends(RequirePermission(Permissions.PRODUCT_READ))   
 ):
@@ -46,8 +48,12 @@ async def read_products(
     
     Obtiene el catálogo de productos paginado.
     El filtro `search` busca por Nombre o SKU.
+    Admite paginación por `cursor` (ver `meta.next_cursor`).
     """
-    return await crud.get_products(db, tenant_id=user.tenant_id, page=page, limit=limit, search=search, category=category)
+    return await crud.get_products(
+        db, tenant_id=user.tenant_id, page=page, limit=limit, search=search, category=category,
+        cursor=cursor, count_mode=count
+    )
 
 @app.post("/products", response_model=schemas.ProductResponse, status_code=201)
 async def create_product(
@@ -72,6 +78,21 @@ async def create_product(
     
     return await crud.create_product(db, product, tenant_id=user.tenant_id)
 
+@app.post("/products/batch", response_model=List[schemas.ProductResponse])
+async def read_products_batch(
+    batch: schemas.ProductBatchRequest,
+    db: AsyncSession = Depends(database.get_db),
+    user: UserPayload = Depends(RequirePermission(Permissions.PRODUCT_READ))
+):
+    """
+    **Consultar Productos en Lote**
+    
+    Devuelve los productos de la empresa cuyos IDs vengan en `ids`, en una sola consulta.
+    Los IDs inexistentes se omiten; el consumidor debe validar los faltantes.
+    Pensado para Finanzas al emitir facturas y cotizaciones.
+    """
+    return await crud.get_products_by_ids(db, batch.ids, user.tenant_id)
+
 @app.get("/categories", response_model=List[schemas.CategorySummary]) 
 async def get_categories(
     db: AsyncSession = Depends(database.get_db),
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Numeric, Boolean
+from sqlalchemy import Column, Integer, String, Numeric, Boolean, DateTime
+from sqlalchemy.sql import func
 from .database import Base
 import enum
 
@@ -33,4 +34,17 @@ class Product(Base):
     
     price = Column(Numeric(10, 2), nullable=False) # Precio unitario en USD
     stock = Column(Numeric(12,), default=0) # Cantidad disponible
-    is_active = Column(Boolean, default=True)
\ No newline at end of file
+    is_active = Column(Boolean, default=True)
+
+class ProcessedEvent(Base):
+    """
+    Eventos ya aplicados por el worker (por `event_id` del outbox de finance).
+    
+    El relay entrega al-menos-una-vez: el id se inserta en la misma transacción
+    que el movimiento de stock, así un reenvío no descuenta dos veces.
+    """
+    __tablename__ = "processed_events"
+    
+    event_id = Column(String(64), primary_key=True)
+    routing_key = Column(String, nullable=False)
+    processed_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -12,6 +12,8 @@ class MetaData(BaseModel):
     page: int
     limit: int
     total_pages: int
+    next_cursor: Optional[str] = None     # Token para continuar con paginación keyset
+    estimated: bool = False               # True si `total` es una estimación del planificador
     
 class PaginatedResponse(BaseModel, Generic[T]):
     """Respuesta genérica paginada."""
@@ -54,4 +56,8 @@ class ProductResponse(ProductBase):
     id: int
     is_active: bool
     
-    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
+
+class ProductBatchRequest(BaseModel):
+    """IDs de productos a consultar en lote."""
+    ids: List[int] = Field(..., min_length=1, max_length=500, description="IDs de productos (máx. 500)")
@@ -30,10 +30,28 @@ async def get_rabbitmq_connection():
     print(f"✅ [Inventory] Conectado exitosamente.", flush=True)
     return connection
 
-def update_stock(items, action="decrease"):
-    """Actualiza el stock en la DB de forma atómica"""
+def update_stock(items, action="decrease", event_id=None, routing_key=None):
+    """
+    Actualiza el stock en la DB de forma atómica.
+    Si el evento trae `event_id` se registra en `processed_events` en la misma
+    transacción: un reenvío del mismo evento se omite sin tocar el stock.
+    """
     with SessionLocal() as db:
         try:
+            if event_id:
+                claimed = db.execute(
+                    text("""
+                        INSERT INTO processed_events (event_id, routing_key) VALUES (:event_id, :routing_key)
+                        ON CONFLICT (event_id) DO NOTHING
+                        RETURNING event_id
+                    """),
+                    {"event_id": event_id, "routing_key": routing_key or ""}
+                ).first()
+                if claimed is None:
+                    print(f"♻️ Evento duplicado {event_id}, se omite.", flush=True)
+                    db.rollback()
+                    return
+            
             print(f"📦 Procesando stock ({action})...", flush=True)
             for item in items:
                 sign = '-' if action == 'decrease' else '+'
@@ -54,10 +72,12 @@ async def process_message(message: aio_pika.IncomingMessage):
             
             # Soporte para estructura plana o anidada en 'data'
             items = body.get("items") or body.get("data", {}).get("items")
+            # Id del evento del outbox (message_id o el sobre versionado)
+            event_id = message.message_id or body.get("event_id")
             
             if items:
                 if routing_key == "invoice.paid":
-                    update_stock(items, action="decrease")
+                    update_stock(items, action="decrease", event_id=event_id, routing_key=routing_key)
         except Exception as e:
             print(f"❌ Error procesando mensaje: {e}", flush=True)
 
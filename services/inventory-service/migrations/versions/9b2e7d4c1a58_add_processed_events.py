@@ -0,0 +1,27 @@
+"""Add processed_events for idempotent stock updates
+
+Revision ID: 9b2e7d4c1a58
+Revises: f22a6c12ff53
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '9b2e7d4c1a58'
+down_revision: Union[str, Sequence[str], None] = 'f22a6c12ff53'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    op.create_table('processed_events',
+        sa.Column('event_id', sa.String(length=64), nullable=False),
+        sa.Column('routing_key', sa.String(), nullable=False),
+        sa.Column('processed_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('event_id')
+    )
+
+def downgrade() -> None:
+    op.drop_table('processed_events')